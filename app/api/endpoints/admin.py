@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.db.session import get_async_db
+from app.services.job_queue import active_job, enqueue, lock_kind
+from app.services.categorizer import get_categorizer, reload_rules
+from app.services.detectors import detector_stats
+from app.services.concepts import concept_index, reload_concepts
+from app.services.read_cache import read_cache
+
+router = APIRouter()
+
+@router.post("/scan-all")
+async def scan_all_users(
+    workers: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue a full rescan of every user; poll /api/v1/jobs/{job_id} for the throughput report"""
+    job_id = await enqueue(
+        db, "batch_scan", {"workers": workers, "shard_size": shard_size}, dedupe_key="batch_scan"
+    )
+    await db.commit()
+    return {"status": "queued", "job_id": job_id}
+
+@router.post("/category-rules/reload")
+async def reload_category_rules(db: AsyncSession = Depends(get_async_db)):
+    """Recompile merchant rules from the category_rules table (this process only)"""
+    categorizer = await db.run_sync(reload_rules)
+    return categorizer.stats()
+
+@router.post("/recategorize")
+async def recategorize_transactions(
+    overwrite: bool = False,
+    chunk_size: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue a pass that re-applies the category rules to every stored transaction.
+
+    Progress is reported on the job; follow result.next_job_id until result.done.
+    With overwrite, categories the rules can't produce (manual or OCR) are replaced too.
+    While a pass is queued or running, its job is returned instead: a new request would
+    share its dedupe key and reset the continuation's cursor to the start. The check and
+    the enqueue hold a lock on the kind, so concurrent requests can't both start a pass.
+    """
+    await lock_kind(db, "recategorize")
+    running = await active_job(db, "recategorize")
+    if running is not None:
+        await db.rollback()
+        return {"status": running.status, "job_id": running.id}
+
+    job_id = await enqueue(
+        db, "recategorize", {"overwrite": overwrite, "chunk_size": chunk_size}, dedupe_key="recategorize"
+    )
+    await db.commit()
+    return {"status": "queued", "job_id": job_id}
+
+@router.get("/category-rules/stats")
+def category_rules_stats():
+    return get_categorizer().stats()
+
+@router.get("/detectors")
+def list_detectors():
+    """Registered pattern detectors with their config and this process's run metrics
+    (wall time, rows read, patterns emitted, patterns per row)"""
+    return detector_stats()
+
+@router.post("/concepts/reload")
+async def reload_concept_library(db: AsyncSession = Depends(get_async_db)):
+    """Upsert app/data/concepts.json, embed new or changed concepts and rebuild this process's index"""
+    return await db.run_sync(reload_concepts)
+
+@router.get("/concepts/stats")
+def concept_library_stats():
+    return concept_index.stats()
+
+@router.get("/read-cache/stats")
+def read_cache_stats():
+    """Size and hit/miss/304 counts of this process's per-user read cache"""
+    return read_cache.stats()
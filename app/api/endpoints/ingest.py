@@ -1,27 +1,118 @@
 from fastapi import APIRouter, UploadFile, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.session import get_db
-# from app.services import ocr
-from app.models.allmodels import User, Transaction, Snapshot
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
+from app.models.allmodels import User, Transaction, Snapshot, Job
+from app.schemas.ingest import UploadAccepted, SnapshotStatus, ConfirmDrafts, DraftsConfirmed
+from app.services.ingest import UploadTooLarge, confirm_drafts, remove_spooled, spool_upload
+from app.services.job_queue import enqueue
+import asyncio
 import uuid
-import json
+from typing import Optional
 
 router = APIRouter()
 
-@router.post("/upload")
+ACCEPTED_TYPES = ("image/", "application/pdf")
+
+@router.post("/upload", response_model=UploadAccepted, status_code=202)
 async def upload_screenshot(
     file: UploadFile,
-    db: Session = Depends(get_db)
+    user_id: str,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """(OCR Temporarily Disabled) Upload bank statement"""
-    
-    # Read image (but don't process)
-    _ = await file.read()
-    
-    return {
-        "status": "disabled",
-        "message": "OCR feature is currently disabled due to API library conflict. Please use Manual Input.",
-        "transactions_found": 0,
-        "extracted_data": {"transactions": []}
-    }
\ No newline at end of file
+    """Upload a bank statement (image or PDF) for extraction.
+
+    Returns as soon as the file is on disk; poll /api/v1/ingest/{snapshot_id} until
+    the status is done, review the extracted (unverified) transactions, then confirm
+    them with /api/v1/ingest/{snapshot_id}/confirm.
+    """
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid User ID")
+    content_type = (file.content_type or "").lower()
+    if not content_type.startswith(ACCEPTED_TYPES):
+        raise HTTPException(status_code=415, detail="Upload an image or a PDF statement")
+
+    snapshot_id = uuid.uuid4()
+    try:
+        # Starlette already spooled the body to a temp file; copy it in chunks off the loop
+        path, size = await asyncio.to_thread(spool_upload, file.file, snapshot_id, file.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        await db.execute(
+            pg_insert(User).values(id=user_uuid, email=f"demo_{user_uuid}@budge.app").on_conflict_do_nothing()
+        )
+        job_id = await enqueue(
+            db, "extract_snapshot", {"snapshot_id": str(snapshot_id)}, dedupe_key=f"extract_snapshot:{snapshot_id}"
+        )
+        db.add(Snapshot(
+            id=snapshot_id,
+            user_id=user_uuid,
+            imgpath=path,
+            ocr_res={
+                "status": "queued",
+                "job_id": str(job_id),
+                "filename": file.filename,
+                "content_type": content_type,
+                "bytes": size
+            }
+        ))
+        await db.commit()
+    except Exception:
+        remove_spooled(path)
+        raise
+
+    return UploadAccepted(status="queued", snapshot_id=snapshot_id, job_id=job_id, bytes=size)
+
+@router.get("/{snapshot_id}", response_model=SnapshotStatus)
+async def get_snapshot_status(snapshot_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    """Extraction progress for an upload, with the draft transaction ids once it's done"""
+    snapshot = await db.get(Snapshot, snapshot_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+    meta = snapshot.ocr_res or {}
+    job = await db.get(Job, uuid.UUID(meta["job_id"])) if meta.get("job_id") else None
+    status = SnapshotStatus(
+        snapshot_id=snapshot.id,
+        user_id=snapshot.user_id,
+        status=meta.get("status", "queued"),
+        uploaded_at=snapshot.at_time,
+        job_id=job.id if job else None
+    )
+
+    if meta.get("status") == "done":
+        status.pages = meta.get("pages")
+        status.transactions_found = meta.get("transactions_found", 0)
+        status.skipped = meta.get("skipped", [])
+        status.transaction_ids = (await db.scalars(
+            select(Transaction.id).where(Transaction.snapshot_id == snapshot.id).order_by(Transaction.date, Transaction.id)
+        )).all()
+    elif job is not None:
+        status.status = job.status
+        if job.error:
+            # Last traceback line is the exception itself
+            status.error = job.error.strip().splitlines()[-1]
+    return status
+
+@router.post("/{snapshot_id}/confirm", response_model=DraftsConfirmed)
+async def confirm_snapshot_drafts(
+    snapshot_id: uuid.UUID,
+    body: Optional[ConfirmDrafts] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Verify the extracted drafts (all, or the given transaction_ids) so they count in
+    stats, pattern scans and questions. Drafts already confirmed are left as they are."""
+    snapshot = await db.get(Snapshot, snapshot_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    if (snapshot.ocr_res or {}).get("status") != "done":
+        raise HTTPException(status_code=409, detail="Extraction hasn't finished")
+
+    ids = body.transaction_ids if body is not None else None
+    confirmed = await confirm_drafts(db, snapshot, ids)
+    return DraftsConfirmed(snapshot_id=snapshot.id, confirmed=confirmed)
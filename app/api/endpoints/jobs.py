@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from uuid import UUID
+from app.db.session import get_async_db
+from app.models.allmodels import Job
+from app.services.job_queue import get_jobs
+
+router = APIRouter()
+
+class JobResponse(BaseModel):
+    id: UUID
+    kind: str
+    status: str
+    payload: Optional[Dict[str, Any]]
+    attempts: int
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    run_after: datetime
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/user/{user_id}", response_model=List[JobResponse])
+async def get_user_jobs(user_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Most recent jobs for a user, newest first"""
+    return await get_jobs(db, user_id)
\ No newline at end of file
@@ -1,16 +1,20 @@
 # app/api/endpoints/learning.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
 from app.models.allmodels import DetectedPattern, GeneratedQuestion, ReflectionSession
-from app.services.rag_service import rag_service
-from app.services.question_service import question_generator
-from pydantic import BaseModel
+from app.services.learning_service import get_or_create_question, generate_questions_for_user
+from app.services.llm_cache import llm_cache
+from app.services.read_cache import mark_changed, read_cache
+from pydantic import BaseModel, TypeAdapter
 from uuid import UUID
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 router = APIRouter()
 
+UNANSWERED = TypeAdapter(Dict[str, Any])
+
 class QuestionResponse(BaseModel):
     question_id: UUID
     question_text: str
@@ -19,104 +23,87 @@ class QuestionResponse(BaseModel):
     explanation: str
     context: dict
 
+class BatchQuestionsResponse(BaseModel):
+    created: int
+    skipped: int
+    questions: List[QuestionResponse]
+
 class AnswerSubmission(BaseModel):
     question_id: UUID
     answer_text: str
 
 @router.post("/generate-question/{pattern_id}", response_model=QuestionResponse)
-def generate_question_for_pattern(
+async def generate_question_for_pattern(
     pattern_id: UUID,
     user_id: str,  # TODO: Get from auth
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate a reflection question from a detected pattern"""
     
     # Get pattern
-    pattern = db.query(DetectedPattern).filter(
+    pattern = (await db.scalars(select(DetectedPattern).where(
         DetectedPattern.id == pattern_id,
         DetectedPattern.user_id == user_id
-    ).first()
+    ))).first()
     
     if not pattern:
         raise HTTPException(status_code=404, detail="Pattern not found")
     
-    # Check if question already exists
-    existing = db.query(GeneratedQuestion).filter(
-        GeneratedQuestion.pattern_id == pattern_id,
-        GeneratedQuestion.is_answered == False
-    ).first()
-    
-    if existing:
-        concept = rag_service.retrieve_relevant_concept(
-            db, pattern.bias_mapping, pattern.details
-        )
-        explanation = rag_service.get_explanation(concept, pattern.details)
-        
-        return QuestionResponse(
-            question_id=existing.id,
-            question_text=existing.question_text,
-            pattern_type=pattern.pattern_code,
-            bias_name=pattern.bias_mapping,
-            explanation=explanation,
-            context=existing.context_data
-        )
-    
-    # Retrieve relevant concept
-    concept = rag_service.retrieve_relevant_concept(
-        db, pattern.bias_mapping, pattern.details
-    )
-    
-    if not concept:
-        raise HTTPException(status_code=500, detail="No matching concept found")
-    
-    # Generate question
-    question_text = question_generator.generate_question(
-        pattern_code=pattern.pattern_code,
-        bias_name=pattern.bias_mapping,
-        pattern_details=pattern.details,
-        concept_context=concept
-    )
-    
-    # Generate explanation
-    explanation = rag_service.get_explanation(concept, pattern.details)
-    
-    # Save question
-    db_question = GeneratedQuestion(
-        pattern_id=pattern_id,
-        user_id=user_id,
-        question_text=question_text,
-        question_type="reflection",
-        context_data={
-            "pattern_code": pattern.pattern_code,
-            "bias": pattern.bias_mapping,
-            "concept_id": concept["id"]
-        }
-    )
-    db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
+    question, explanation, created = await get_or_create_question(db, pattern)
     
     return QuestionResponse(
-        question_id=db_question.id,
-        question_text=question_text,
+        question_id=question.id,
+        question_text=question.question_text,
         pattern_type=pattern.pattern_code,
         bias_name=pattern.bias_mapping,
         explanation=explanation,
-        context=pattern.details
+        context=pattern.details if created else question.context_data
+    )
+
+@router.post("/generate-questions", response_model=BatchQuestionsResponse)
+async def generate_questions_for_patterns(
+    user_id: str,  # TODO: Get from auth
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Generate reflection questions for all of the user's patterns that don't have one yet.
+
+    One call replaces a generate-question request per pattern after a scan.
+    """
+    try:
+        uid = UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid User ID")
+
+    created, skipped = await generate_questions_for_user(db, uid, limit)
+    return BatchQuestionsResponse(
+        created=len(created),
+        skipped=skipped,
+        questions=[
+            QuestionResponse(
+                question_id=question.id,
+                question_text=question.question_text,
+                pattern_type=pattern.pattern_code,
+                bias_name=pattern.bias_mapping,
+                explanation=explanation,
+                context=pattern.details
+            )
+            for question, pattern, explanation in created
+        ]
     )
 
 @router.post("/submit-answer")
-def submit_reflection_answer(
+async def submit_reflection_answer(
     submission: AnswerSubmission,
     user_id: str,  # TODO: Get from auth
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """User submits their reflection answer"""
     
-    question = db.query(GeneratedQuestion).filter(
+    question = (await db.scalars(select(GeneratedQuestion).where(
         GeneratedQuestion.id == submission.question_id,
         GeneratedQuestion.user_id == user_id
-    ).first()
+    ))).first()
     
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
@@ -136,8 +123,9 @@ def submit_reflection_answer(
     
     # Mark question as answered
     question.is_answered = True
+    await db.run_sync(mark_changed, [question.user_id])
     
-    db.commit()
+    await db.commit()
     
     return {
         "status": "recorded",
@@ -146,25 +134,38 @@ def submit_reflection_answer(
     }
 
 @router.get("/unanswered-questions")
-def get_unanswered_questions(
+async def get_unanswered_questions(
     user_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all pending reflection questions"""
-    
-    questions = db.query(GeneratedQuestion).filter(
-        GeneratedQuestion.user_id == user_id,
-        GeneratedQuestion.is_answered == False
-    ).all()
-    
-    return {
-        "count": len(questions),
-        "questions": [
-            {
-                "id": q.id,
-                "text": q.question_text,
-                "created_at": q.created_at
-            }
-            for q in questions
-        ]
-    }
\ No newline at end of file
+    """Get all pending reflection questions (cached with an ETag)"""
+    try:
+        uid = UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid User ID")
+
+    async def unanswered(headers):
+        questions = (await db.scalars(select(GeneratedQuestion).where(
+            GeneratedQuestion.user_id == uid,
+            GeneratedQuestion.is_answered == False
+        ))).all()
+
+        return {
+            "count": len(questions),
+            "questions": [
+                {
+                    "id": q.id,
+                    "text": q.question_text,
+                    "created_at": q.created_at
+                }
+                for q in questions
+            ]
+        }
+
+    return await read_cache.respond(request, uid, ("unanswered_questions",), unanswered, UNANSWERED)
+
+@router.get("/cache-stats")
+async def get_llm_cache_stats():
+    """Hit/miss counters for the LLM reply cache"""
+    return llm_cache.stats()
\ No newline at end of file
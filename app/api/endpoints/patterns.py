@@ -1,17 +1,44 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db.session import get_db
-from app.services.pattern_engine import run_pattern_scan
+import logging
+import uuid
+from app.db.session import get_async_db
+from app.models.allmodels import DetectedPattern
+from app.services.pattern_engine import run_pattern_scan, run_incremental_scan
+from app.services.read_cache import read_cache
 from app.schemas.patterns import DetectedPatternResponse
+from pydantic import TypeAdapter
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+PATTERN_LIST = TypeAdapter(List[DetectedPatternResponse])
 
 @router.post("/scan/{user_id}", response_model=List[DetectedPatternResponse])
-def scan_user_patterns(user_id: str, db: Session = Depends(get_db)):
+async def scan_user_patterns(user_id: str, full: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Scan new transactions since the last run (pass full=true to rebuild from scratch)"""
+    try:
+        # The engine is plain sync ORM code; run_sync drives it over the async connection
+        if full:
+            return await db.run_sync(run_pattern_scan, user_id)
+        return await db.run_sync(run_incremental_scan, user_id)
+    except Exception:
+        logger.exception("Pattern scan error")
+        return []
+
+@router.get("/{user_id}", response_model=List[DetectedPatternResponse])
+async def get_user_patterns(user_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Patterns from the last scan (kept current by the background scan job); cached with an ETag"""
     try:
-        patterns = run_pattern_scan(db, user_id)
-        return patterns
-    except Exception as e:
-        print(f"Pattern scan error: {e}")
-        return []
\ No newline at end of file
+        uid = uuid.UUID(user_id)
+    except ValueError:
+        return []
+
+    async def patterns(headers):
+        return (await db.scalars(
+            select(DetectedPattern).where(DetectedPattern.user_id == uid).order_by(DetectedPattern.created_at.asc())
+        )).all()
+
+    return await read_cache.respond(request, uid, ("patterns",), patterns, PATTERN_LIST)
\ No newline at end of file
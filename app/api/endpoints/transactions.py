@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.db.session import get_db
-from app.models.allmodels import User, Transaction, Snapshot
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, cast, delete, func, insert, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db.session import AsyncSessionLocal, get_async_db
+from app.models.allmodels import User, Transaction, Snapshot, DailySpend
+from app.services.pattern_engine import invalidate_scan_state
+from app.services.job_handlers import enqueue_pattern_scan
+from app.services.categorizer import categorize_merchant, categorize_many
+from app.services.read_cache import mark_changed, read_cache
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import AsyncIterator, List, Optional
+from datetime import date, datetime
 import uuid
+import json
+import base64
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class TransactionCreate(BaseModel):
     user_id: str
@@ -27,33 +37,36 @@ class TransactionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkIngestResult(BaseModel):
+    inserted: int
+    failed: int
+    ids: List[uuid.UUID]
+    errors: List[BulkRowError]
+    scan_job_ids: List[uuid.UUID] = []
+
+class StatsBucket(BaseModel):
+    period: date
+    total_spent: float
+    tx_count: int
+
 class DashboardStats(BaseModel):
     total_spent: float
     tx_count: int
     top_category: Optional[str]
     category_breakdown: dict
+    series: Optional[List[StatsBucket]] = None
 
-def categorize_merchant(merchant_name: str) -> str:
-    """Simple keyword-based categorization"""
-    m = merchant_name.lower()
-    if any(x in m for x in ['starbucks', 'coffee', 'cafe', 'restaurant', 'dining', 'burger', 'pizza', 'dunkin', 'mcdonalds']):
-        return "Food & Dining"
-    if any(x in m for x in ['uber', 'lyft', 'taxi', 'gas', 'shell', 'fuel', 'parking', 'metro']):
-        return "Transportation"
-    if any(x in m for x in ['amazon', 'shopping', 'store', 'walmart', 'target', 'myntra', 'flipkart', 'clothing']):
-        return "Shopping"
-    if any(x in m for x in ['netflix', 'spotify', 'movie', 'cinema', 'hulu', 'games']):
-        return "Entertainment"
-    if any(x in m for x in ['bill', 'utility', 'rent', 'electric', 'water', 'internet']):
-        return "Bills & Utilities"
-    if any(x in m for x in ['grocery', 'market', 'foods', 'trader']):
-        return "Groceries"
-    return "Uncategorized"
+TRANSACTION_PAGE = TypeAdapter(List[TransactionResponse])
+DASHBOARD_STATS = TypeAdapter(DashboardStats)
 
 @router.post("/", response_model=TransactionResponse)
-def add_transaction(
+async def add_transaction(
     tx: TransactionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Ensure user exists (hacky check for demo)
     try:
@@ -61,12 +74,12 @@ def add_transaction(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid User ID")
 
-    user = db.query(User).filter(User.id == user_uuid).first()
+    user = await db.get(User, user_uuid)
     if not user:
         # Auto-create if not exists for demo flow
         user = User(id=user_uuid, email=f"demo_{tx.user_id}@budge.app")
         db.add(user)
-        db.commit()
+        await db.commit()
     
     # Auto-categorize if not provided
     category = tx.category
@@ -83,82 +96,349 @@ def add_transaction(
         verified=True
     )
     db.add(db_tx)
-    db.commit()
-    db.refresh(db_tx)
+    await enqueue_pattern_scan(db, user_uuid)
+    await db.run_sync(mark_changed, [user_uuid])
+    await db.commit()
+    await db.refresh(db_tx)
     return db_tx
 
+BULK_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+PAGE_SIZE = 100
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+async def _read_bulk_records(request: Request) -> AsyncIterator[List]:
+    """Parse a JSON array or an NDJSON stream into batches of (row, record-or-error) pairs.
+
+    NDJSON is parsed as it arrives, so only one batch of records is held at a time;
+    a JSON array has to be read whole first, which makes NDJSON the format for big imports.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        batch = []
+        buffer = b""
+        row = 0
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    batch.append((row, json.loads(line)))
+                except ValueError as e:
+                    batch.append((row, e))
+                row += 1
+                if len(batch) == BULK_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if buffer.strip():
+            try:
+                batch.append((row, json.loads(buffer)))
+            except ValueError as e:
+                batch.append((row, e))
+        if batch:
+            yield batch
+        return
+
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for start in range(0, len(body), BULK_BATCH_SIZE):
+        yield list(enumerate(body[start:start + BULK_BATCH_SIZE], start))
+
+def _bulk_params(records: List, now: datetime, errors: List[BulkRowError]) -> List:
+    """Validate one batch into (row, insert params), categorizing rows without a category at once"""
+    rows = []
+    for row, record in records:
+        if isinstance(record, Exception):
+            errors.append(BulkRowError(row=row, error=f"Invalid JSON: {record}"))
+            continue
+        try:
+            tx = TransactionCreate.model_validate(record)
+            user_uuid = uuid.UUID(tx.user_id)
+        except ValidationError as e:
+            errors.append(BulkRowError(row=row, error=_validation_message(e)))
+            continue
+        except ValueError:
+            errors.append(BulkRowError(row=row, error="Invalid User ID"))
+            continue
+
+        rows.append((row, {
+            "id": uuid.uuid4(),
+            "user_id": user_uuid,
+            "snapshot_id": None,
+            "date": tx.date,
+            "merchant": tx.merchant,
+            "amount": tx.amount,
+            "category": tx.category,
+            "verified": True,
+            "created_at": now,
+            "updated_at": now
+        }))
+
+    uncategorized = [params for _, params in rows if not params["category"]]
+    for params, category in zip(uncategorized, categorize_many(p["merchant"] for p in uncategorized)):
+        params["category"] = category
+    return rows
+
+async def _insert_bulk(db: AsyncSession, batches: AsyncIterator[List]) -> BulkIngestResult:
+    """Insert each batch as it arrives, in one transaction committed at the end"""
+    errors = []
+    inserted = []
+    inserted_users = set()
+    known_users = set()
+    now = datetime.utcnow()
+
+    async for records in batches:
+        rows = _bulk_params(records, now, errors)
+
+        # Auto-create the batch's new users with one statement
+        new_users = {params["user_id"] for _, params in rows} - known_users
+        if new_users:
+            await db.execute(
+                pg_insert(User)
+                .values([{"id": uid, "email": f"demo_{uid}@budge.app"} for uid in new_users])
+                .on_conflict_do_nothing()
+            )
+            known_users |= new_users
+        if not rows:
+            continue
+
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(Transaction), [params for _, params in rows])
+            inserted.extend(params["id"] for _, params in rows)
+            inserted_users.update(params["user_id"] for _, params in rows)
+        except Exception:
+            # Retry the failed batch row by row so one bad row doesn't sink the rest
+            for row, params in rows:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(Transaction), [params])
+                    inserted.append(params["id"])
+                    inserted_users.add(params["user_id"])
+                except Exception as e:
+                    errors.append(BulkRowError(row=row, error=str(getattr(e, "orig", e)).strip()))
+
+    scan_job_ids = [await enqueue_pattern_scan(db, uid) for uid in inserted_users]
+    await db.run_sync(mark_changed, inserted_users)
+    await db.commit()
+    errors.sort(key=lambda err: err.row)
+    return BulkIngestResult(
+        inserted=len(inserted), failed=len(errors), ids=inserted, errors=errors, scan_job_ids=scan_job_ids
+    )
+
+@router.post("/bulk", response_model=BulkIngestResult)
+async def add_transactions_bulk(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Import many transactions from a JSON array or NDJSON body.
+
+    Rows that fail validation or insertion are reported individually; the rest are kept.
+    NDJSON bodies are inserted BULK_BATCH_SIZE rows at a time while they upload.
+    """
+    return await _insert_bulk(db, _read_bulk_records(request))
+
+def _encode_cursor(tx_date: date, tx_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{tx_date.isoformat()}|{tx_id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        tx_date, tx_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(tx_date), uuid.UUID(tx_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _stream_query(filters, limit: Optional[int] = None):
+    query = (
+        select(Transaction.id, Transaction.date, Transaction.merchant, Transaction.amount, Transaction.category)
+        .where(*filters)
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    return query.limit(limit) if limit else query
+
+async def _stream_transactions(filters, limit: Optional[int] = None) -> AsyncIterator[str]:
+    """NDJSON rows from a server-side cursor; owns its session since it outlives the request scope"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_stream_query(filters, limit))
+        async for row in result:
+            yield json.dumps({
+                "id": str(row.id),
+                "date": row.date.isoformat(),
+                "merchant": row.merchant,
+                "amount": row.amount,
+                "category": row.category
+            }) + "\n"
+
 @router.get("/{user_id}", response_model=List[TransactionResponse])
-def get_transactions(
+async def get_transactions(
     user_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """Newest-first page of transactions (limit defaults to PAGE_SIZE).
+
+    Pass the X-Next-Cursor header back as `cursor` for the next page, or use
+    format=ndjson to stream the remaining rows instead of paging: all of them, or the
+    first `limit` when one is given. JSON pages carry an ETag; send it back as
+    If-None-Match to get a 304 while nothing has changed.
+    """
     try:
         uid = uuid.UUID(user_id)
-        return db.query(Transaction).filter(Transaction.user_id == uid).order_by(Transaction.date.desc()).all()
     except ValueError:
         return []
 
+    filters = [Transaction.user_id == uid]
+    if cursor:
+        filters.append(tuple_(Transaction.date, Transaction.id) < tuple_(*_decode_cursor(cursor)))
+
+    if response_format == "ndjson":
+        return StreamingResponse(_stream_transactions(filters, limit), media_type="application/x-ndjson")
+    limit = limit or PAGE_SIZE
+
+    async def page(headers):
+        # One extra row tells us whether there is another page
+        txs = (await db.scalars(
+            select(Transaction).where(*filters)
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+            .limit(limit + 1)
+        )).all()
+
+        if len(txs) > limit:
+            txs = txs[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(txs[-1].date, txs[-1].id)
+        return txs
+
+    return await read_cache.respond(request, uid, ("transactions", limit, cursor), page, TRANSACTION_PAGE)
+
+async def dashboard_stats(
+    db: AsyncSession,
+    uid: uuid.UUID,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    granularity: Optional[str] = None
+) -> dict:
+    """Reads the daily_spend rollup, so the cost follows the number of distinct days and
+    merchants rather than the number of transactions.
+
+    Only verified transactions count, the same as for pattern detection. Drafts extracted
+    from an uploaded statement are excluded until they are confirmed through
+    POST /api/v1/ingest/{snapshot_id}/confirm.
+    """
+    filters = [DailySpend.user_id == uid]
+    if from_date:
+        filters.append(DailySpend.date >= from_date)
+    if to_date:
+        filters.append(DailySpend.date <= to_date)
+
+    # Category breakdown (totals are rolled up from the same rows)
+    rows = (await db.execute(
+        select(
+            DailySpend.category,
+            func.sum(DailySpend.tx_count).label("tx_count"),
+            func.sum(DailySpend.total).label("total")
+        ).where(*filters).group_by(DailySpend.category)
+    )).all()
+
+    breakdown = {row.category: row.total for row in rows}
+    total = sum(row.total for row in rows)
+    count = sum(row.tx_count for row in rows)
+    top_cat = max(breakdown, key=breakdown.get) if breakdown else None
+
+    series = None
+    if granularity:
+        # granularity is regex-validated; inline it so SELECT and GROUP BY render identically
+        period = cast(func.date_trunc(literal_column(f"'{granularity}'"), DailySpend.date), Date)
+        series = [
+            {"period": row.period, "total_spent": row.total, "tx_count": row.tx_count}
+            for row in await db.execute(
+                select(
+                    period.label("period"),
+                    func.sum(DailySpend.tx_count).label("tx_count"),
+                    func.sum(DailySpend.total).label("total")
+                ).where(*filters).group_by(period).order_by(period)
+            )
+        ]
+
+    return {
+        "total_spent": total,
+        "tx_count": count,
+        "top_category": top_cat,
+        "category_breakdown": breakdown,
+        "series": series
+    }
+
 @router.get("/{user_id}/stats", response_model=DashboardStats)
-def get_dashboard_stats(
+async def get_dashboard_stats(
     user_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    granularity: Optional[str] = Query(None, pattern="^(day|week|month)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """Verified totals and category breakdown, optionally within a date range and bucketed
+    by day/week/month.
+
+    Served from the read cache (with an ETag) until the user's data changes.
+    """
     try:
         uid = uuid.UUID(user_id)
-        txs = db.query(Transaction).filter(Transaction.user_id == uid).all()
-        
-        total = sum(t.amount for t in txs)
-        count = len(txs)
-        
-        # Category breakdown
-        breakdown = {}
-        for t in txs:
-            cat = t.category or "Uncategorized"
-            breakdown[cat] = breakdown.get(cat, 0) + t.amount
-            
-        top_cat = max(breakdown, key=breakdown.get) if breakdown else None
-        
-        return {
-            "total_spent": total,
-            "tx_count": count,
-            "top_category": top_cat,
-            "category_breakdown": breakdown
-        }
-    except Exception as e:
-        print(f"Stats error: {e}")
-        return {
-            "total_spent": 0,
-            "tx_count": 0,
-            "top_category": None,
-            "category_breakdown": {}
-        }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid User ID")
+
+    try:
+        return await read_cache.respond(
+            request, uid, ("stats", from_date, to_date, granularity),
+            lambda headers: dashboard_stats(db, uid, from_date, to_date, granularity), DASHBOARD_STATS
+        )
+    except Exception:
+        # Zeroed stats would read as "no spending"; let the dashboard show an error instead
+        logger.exception("Stats error")
+        raise HTTPException(status_code=503, detail="Stats unavailable")
 
 @router.delete("/{user_id}")
-def clear_all_transactions(user_id: str, db: Session = Depends(get_db)):
+async def clear_all_transactions(user_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
         uid = uuid.UUID(user_id)
-        db.query(Transaction).filter(Transaction.user_id == uid).delete()
-        db.commit()
+        # The daily_spend triggers drop this user's rollup rows in the same statement
+        await db.execute(delete(Transaction).where(Transaction.user_id == uid))
+        await db.run_sync(invalidate_scan_state, uid)
+        await enqueue_pattern_scan(db, uid)
+        await db.run_sync(mark_changed, [uid])
+        await db.commit()
         return {"status": "success", "message": "All transactions deleted"}
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid User ID")
 
 @router.delete("/{user_id}/{tx_id}")
-def delete_transaction(user_id: str, tx_id: str, db: Session = Depends(get_db)):
+async def delete_transaction(user_id: str, tx_id: str, db: AsyncSession = Depends(get_async_db)):
     try:
         uid = uuid.UUID(user_id)
         tid = uuid.UUID(tx_id)
         
-        tx = db.query(Transaction).filter(
+        tx = (await db.scalars(select(Transaction).where(
             Transaction.user_id == uid,
             Transaction.id == tid
-        ).first()
+        ))).first()
         
         if not tx:
             raise HTTPException(status_code=404, detail="Transaction not found")
             
-        db.delete(tx)
-        db.commit()
+        await db.delete(tx)
+        await db.run_sync(invalidate_scan_state, uid)
+        await enqueue_pattern_scan(db, uid)
+        await db.run_sync(mark_changed, [uid])
+        await db.commit()
         return {"status": "success", "message": "Transaction deleted"}
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ID format")
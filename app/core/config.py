@@ -1,13 +1,61 @@
 import os
-from dotenv import load_dotenv
+from functools import cached_property
+from sqlalchemy.engine import make_url
+
+_env_loaded = False
+
+
+def load_env():
+    """Read .env into os.environ, once.
+
+    Entrypoints call this before importing the rest of the app, since modules read their
+    os.getenv settings at import. Importing this module alone reads nothing.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def _env(name: str, default=None):
+    load_env()
+    return os.environ.get(name, default)
 
-load_dotenv()
 
 class Settings:
+    """Read on first access, so a missing DATABASE_URL only fails what actually needs the database"""
     PROJECT_NAME: str = "Budge"
     PROJECT_VERSION: str = "1.0.0"
-    DATABASE_URL: str = os.environ.get("DATABASE_URL")
-    if not DATABASE_URL:
-        raise ValueError("No DATABASE_URL set for Flask application")
 
-settings = Settings()
\ No newline at end of file
+    @cached_property
+    def DATABASE_URL(self) -> str:
+        url = _env("DATABASE_URL")
+        if not url:
+            raise ValueError("No DATABASE_URL set for Flask application")
+        return url
+
+    @cached_property
+    def ASYNC_DATABASE_URL(self) -> str:
+        # Same database through the asyncpg driver unless overridden
+        return _env("ASYNC_DATABASE_URL") or \
+            make_url(self.DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+    # Connection pool (applies to both engines)
+    @cached_property
+    def DB_POOL_SIZE(self) -> int:
+        return int(_env("DB_POOL_SIZE", "10"))
+
+    @cached_property
+    def DB_MAX_OVERFLOW(self) -> int:
+        return int(_env("DB_MAX_OVERFLOW", "20"))
+
+    @cached_property
+    def DB_POOL_PRE_PING(self) -> bool:
+        return _env("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    @cached_property
+    def DB_POOL_RECYCLE(self) -> int:
+        return int(_env("DB_POOL_RECYCLE", "1800"))
+
+settings = Settings()
@@ -0,0 +1,147 @@
+"""Request, database and connection-pool metrics.
+
+MetricsMiddleware times every HTTP request against its route template (so
+/patterns/{user_id} is one series, not one per user) and reports how many
+queries the request ran and how long they took. Query timing comes from
+SQLAlchemy cursor events on both engines, attributed to the current request
+through a context variable; that also covers sync engine code driven by
+`db.run_sync` and sync endpoints in the threadpool, which inherit the context.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.metrics import REGISTRY
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "budge_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "budge_http_request_seconds", "HTTP request latency", ["method", "route"]
+)
+HTTP_IN_PROGRESS = REGISTRY.gauge(
+    "budge_http_requests_in_progress", "HTTP requests being served", []
+)
+HTTP_DB_QUERIES = REGISTRY.histogram(
+    "budge_http_request_db_queries", "Database queries run per HTTP request", ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS
+)
+HTTP_DB_SECONDS = REGISTRY.histogram(
+    "budge_http_request_db_seconds", "Time spent in database queries per HTTP request", ["method", "route"]
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "budge_db_query_seconds", "Database query latency", ["engine"]
+)
+DB_QUERY_ERRORS = REGISTRY.counter(
+    "budge_db_query_errors_total", "Database queries that raised", ["engine"]
+)
+POOL_SIZE = REGISTRY.gauge(
+    "budge_db_pool_size", "Connections the pool keeps open", ["engine"]
+)
+POOL_CAPACITY = REGISTRY.gauge(
+    "budge_db_pool_capacity", "Most connections the pool hands out (size + max overflow)", ["engine"]
+)
+POOL_CHECKED_OUT = REGISTRY.gauge(
+    "budge_db_pool_checked_out", "Connections currently checked out", ["engine"]
+)
+POOL_SATURATION = REGISTRY.gauge(
+    "budge_db_pool_saturation", "Checked-out connections as a share of pool capacity", ["engine"]
+)
+POOL_CHECKOUTS = REGISTRY.counter(
+    "budge_db_pool_checkouts_total", "Connections handed out by the pool", ["engine"]
+)
+
+
+class QueryUsage:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries: ContextVar[Optional[QueryUsage]] = ContextVar("request_queries", default=None)
+
+
+def instrument_engine(engine: Engine, name: str, max_overflow: int = 0):
+    """Time every query on `engine` and expose its pool gauges (pass async_engine.sync_engine
+    for the async engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.observe(elapsed, engine=name)
+        usage = _request_queries.get()
+        if usage is not None:
+            usage.count += 1
+            usage.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+        DB_QUERY_ERRORS.inc(engine=name)
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKOUTS.inc(engine=name)
+
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    capacity = pool.size() + max(max_overflow, 0)
+    POOL_SIZE.set(pool.size(), engine=name)
+    POOL_CAPACITY.set(capacity, engine=name)
+    POOL_CHECKED_OUT.set_function(pool.checkedout, engine=name)
+    POOL_SATURATION.set_function(lambda: pool.checkedout() / capacity if capacity else 0.0, engine=name)
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one series so scanners can't blow up the label set
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are timed to their last byte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = QueryUsage()
+        token = _request_queries.set(usage)
+        HTTP_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.dec()
+            _request_queries.reset(token)
+
+            labels = {"method": scope["method"], "route": _route(scope)}
+            HTTP_REQUESTS.inc(status=status, **labels)
+            HTTP_SECONDS.observe(elapsed, **labels)
+            HTTP_DB_QUERIES.observe(usage.count, **labels)
+            HTTP_DB_SECONDS.observe(usage.seconds, **labels)
@@ -0,0 +1,263 @@
+"""Versioned schema migrations.
+
+`create_all` only creates missing tables, so anything that changes an existing
+table (new columns, new indexes) goes here as a numbered step. Steps run in
+autocommit mode so indexes can be built CONCURRENTLY without locking writes;
+every statement is idempotent, so a step that dies halfway can simply be re-run.
+"""
+import logging
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.models.allmodels import Base, SchemaMigration
+
+# Any constant works, it just has to be the same for every process
+MIGRATION_LOCK_ID = 7_240_118
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    (1, "Transaction timestamps and pattern keys for incremental scans", [
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS created_at TIMESTAMP",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+        "UPDATE transactions SET created_at = now() at time zone 'utc' WHERE created_at IS NULL",
+        "UPDATE transactions SET updated_at = created_at WHERE updated_at IS NULL",
+        "ALTER TABLE detected_patterns ADD COLUMN IF NOT EXISTS pattern_key VARCHAR",
+    ]),
+    (2, "Indexes for user_id hot paths", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_date "
+        "ON transactions (user_id, date, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_verified_date "
+        "ON transactions (user_id, date) WHERE verified",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_updated "
+        "ON transactions (user_id, updated_at)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_detected_patterns_user_key "
+        "ON detected_patterns (user_id, pattern_code, pattern_key)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reflection_sessions_pattern "
+        "ON reflection_sessions (pattern_id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_generated_questions_user_unanswered "
+        "ON generated_questions (user_id) WHERE is_answered = false",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_generated_questions_pattern "
+        "ON generated_questions (pattern_id)",
+    ]),
+    (3, "daily_spend rollup maintained by triggers on transactions", [
+        # Statement-level triggers see every affected row at once through transition
+        # tables, so a 100k-row bulk insert or clear-all is one aggregated upsert
+        """
+        CREATE OR REPLACE FUNCTION daily_spend_apply() RETURNS trigger LANGUAGE plpgsql AS $fn$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO daily_spend AS d (user_id, date, category, merchant, tx_count, total)
+                SELECT user_id, date, coalesce(category, 'Uncategorized'), merchant, count(*), sum(amount)
+                FROM new_rows WHERE verified AND user_id IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (user_id, date, category, merchant) DO UPDATE
+                SET tx_count = d.tx_count + excluded.tx_count, total = d.total + excluded.total;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO daily_spend AS d (user_id, date, category, merchant, tx_count, total)
+                SELECT user_id, date, coalesce(category, 'Uncategorized'), merchant, -count(*), -sum(amount)
+                FROM old_rows WHERE verified AND user_id IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (user_id, date, category, merchant) DO UPDATE
+                SET tx_count = d.tx_count + excluded.tx_count, total = d.total + excluded.total;
+            ELSE
+                -- Net change per key, so untouched rows (e.g. only updated_at moved) cost nothing
+                INSERT INTO daily_spend AS d (user_id, date, category, merchant, tx_count, total)
+                SELECT user_id, date, category, merchant, sum(n), sum(amount)
+                FROM (
+                    SELECT user_id, date, coalesce(category, 'Uncategorized') AS category, merchant,
+                           1 AS n, amount
+                    FROM new_rows WHERE verified AND user_id IS NOT NULL
+                    UNION ALL
+                    SELECT user_id, date, coalesce(category, 'Uncategorized'), merchant, -1, -amount
+                    FROM old_rows WHERE verified AND user_id IS NOT NULL
+                ) changes
+                GROUP BY 1, 2, 3, 4
+                HAVING sum(n) <> 0 OR sum(amount) <> 0
+                ON CONFLICT (user_id, date, category, merchant) DO UPDATE
+                SET tx_count = d.tx_count + excluded.tx_count, total = d.total + excluded.total;
+            END IF;
+
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM daily_spend d
+                USING (
+                    SELECT DISTINCT user_id, date, coalesce(category, 'Uncategorized') AS category, merchant
+                    FROM old_rows WHERE verified AND user_id IS NOT NULL
+                ) o
+                WHERE d.user_id = o.user_id AND d.date = o.date AND d.category = o.category
+                  AND d.merchant = o.merchant AND d.tx_count <= 0;
+            END IF;
+            RETURN NULL;
+        END
+        $fn$
+        """,
+        # Triggers and backfill in one transaction, with writers held off, so no row
+        # is both backfilled and counted by a trigger
+        """
+        DO $do$
+        BEGIN
+            LOCK TABLE transactions IN SHARE MODE;
+
+            CREATE OR REPLACE TRIGGER daily_spend_insert AFTER INSERT ON transactions
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION daily_spend_apply();
+            CREATE OR REPLACE TRIGGER daily_spend_update AFTER UPDATE ON transactions
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION daily_spend_apply();
+            CREATE OR REPLACE TRIGGER daily_spend_delete AFTER DELETE ON transactions
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION daily_spend_apply();
+
+            DELETE FROM daily_spend;
+            INSERT INTO daily_spend (user_id, date, category, merchant, tx_count, total)
+            SELECT user_id, date, coalesce(category, 'Uncategorized'), merchant, count(*), sum(amount)
+            FROM transactions WHERE verified AND user_id IS NOT NULL
+            GROUP BY 1, 2, 3, 4;
+        END
+        $do$
+        """,
+    ]),
+    (4, "Stable pattern fingerprints so scans upsert instead of delete-and-reinsert", [
+        "ALTER TABLE detected_patterns ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64)",
+        "UPDATE detected_patterns "
+        "SET fingerprint = encode(sha256(convert_to(pattern_code || '|' || pattern_key, 'UTF8')), 'hex') "
+        "WHERE fingerprint IS NULL AND pattern_key IS NOT NULL",
+        # Racing scans could leave duplicates; keep the newest and move questions and reflections onto it
+        """
+        WITH ranked AS (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY user_id, fingerprint ORDER BY created_at DESC, id
+            ) AS keep_id
+            FROM detected_patterns WHERE fingerprint IS NOT NULL
+        )
+        UPDATE generated_questions q SET pattern_id = r.keep_id
+        FROM ranked r WHERE q.pattern_id = r.id AND r.id <> r.keep_id
+        """,
+        """
+        WITH ranked AS (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY user_id, fingerprint ORDER BY created_at DESC, id
+            ) AS keep_id
+            FROM detected_patterns WHERE fingerprint IS NOT NULL
+        )
+        UPDATE reflection_sessions s SET pattern_id = r.keep_id
+        FROM ranked r WHERE s.pattern_id = r.id AND r.id <> r.keep_id
+        """,
+        """
+        WITH ranked AS (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY user_id, fingerprint ORDER BY created_at DESC, id
+            ) AS keep_id
+            FROM detected_patterns WHERE fingerprint IS NOT NULL
+        )
+        DELETE FROM detected_patterns p USING ranked r WHERE p.id = r.id AND r.id <> r.keep_id
+        """,
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_detected_patterns_user_fingerprint "
+        "ON detected_patterns (user_id, fingerprint)",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_detected_patterns_user_key",
+    ]),
+    (5, "Subscription keys now carry a cadence; force full rescans", [
+        # The next scan of each user falls back to a full scan, which replaces
+        # old-style subscription patterns and drops the retired state buckets
+        "DELETE FROM pattern_scan_states",
+    ]),
+    (6, "Concept library with pgvector embeddings", [
+        "ALTER TABLE concept_embeddings ADD COLUMN IF NOT EXISTS bias VARCHAR",
+        "ALTER TABLE concept_embeddings ADD COLUMN IF NOT EXISTS title VARCHAR",
+        "ALTER TABLE concept_embeddings ADD COLUMN IF NOT EXISTS definition TEXT",
+        "ALTER TABLE concept_embeddings ADD COLUMN IF NOT EXISTS embedder VARCHAR",
+        "ALTER TABLE concept_embeddings ADD COLUMN IF NOT EXISTS embedding vector(768)",
+        "ALTER TABLE concept_embeddings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_concept_embeddings_bias "
+        "ON concept_embeddings (bias)",
+        # HNSW needs no training data, so it can be built on an empty table and kept current
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_concept_embeddings_embedding "
+        "ON concept_embeddings USING hnsw (embedding vector_cosine_ops)",
+    ]),
+    (7, "Commit-ordered incremental scans: writer xids on transactions, snapshot watermark", [
+        # App-side updated_at stamps are taken before commit, so a slow writer could land
+        # behind a watermark a concurrent scan had already moved past. Existing rows get
+        # this migration's xid, which every later snapshot sees as committed.
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS created_xid xid8 NOT NULL DEFAULT pg_current_xact_id()",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT pg_current_xact_id()",
+        """
+        CREATE OR REPLACE FUNCTION transactions_touch_xid() RETURNS trigger LANGUAGE plpgsql AS $fn$
+        BEGIN
+            NEW.created_xid := OLD.created_xid;
+            NEW.change_xid := pg_current_xact_id();
+            RETURN NEW;
+        END
+        $fn$
+        """,
+        # Only for changes a detector can see; updated_at or snapshot_id alone don't count
+        """
+        CREATE OR REPLACE TRIGGER transactions_touch_xid BEFORE UPDATE ON transactions
+            FOR EACH ROW
+            WHEN ((OLD.user_id, OLD.date, OLD.merchant, OLD.amount, OLD.category, OLD.verified)
+                  IS DISTINCT FROM (NEW.user_id, NEW.date, NEW.merchant, NEW.amount, NEW.category, NEW.verified))
+            EXECUTE FUNCTION transactions_touch_xid()
+        """,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_change_xid "
+        "ON transactions (user_id, change_xid)",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_transactions_user_updated",
+        # States without a snapshot fall back to a full scan, which records one
+        "ALTER TABLE pattern_scan_states ADD COLUMN IF NOT EXISTS snapshot TEXT",
+        "ALTER TABLE pattern_scan_states DROP COLUMN IF EXISTS watermark",
+    ]),
+    (8, "Index for expired job leases", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_jobs_running_lease "
+        "ON jobs (updated_at) WHERE status = 'running'",
+    ]),
+    (9, "At most one open question per pattern", [
+        # Racing generators could each store one; keep the oldest
+        """
+        DELETE FROM generated_questions q USING (
+            SELECT id, row_number() OVER (PARTITION BY pattern_id ORDER BY created_at, id) AS n
+            FROM generated_questions WHERE NOT is_answered AND pattern_id IS NOT NULL
+        ) r
+        WHERE q.id = r.id AND r.n > 1
+        """,
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_generated_questions_pattern_open "
+        "ON generated_questions (pattern_id) WHERE is_answered = false",
+    ]),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Create missing tables, then apply pending steps. Returns the versions applied."""
+    applied_now = []
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Several workers may boot at once; only one migrates
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            # Vector columns need the extension before create_all can create their tables
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            Base.metadata.create_all(bind=conn)
+
+            applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+            for version, description, statements in MIGRATIONS:
+                if version in applied:
+                    continue
+                logger.info("Applying migration %s: %s", version, description)
+                for statement in statements:
+                    conn.execute(text(statement))
+                conn.execute(
+                    SchemaMigration.__table__.insert().values(version=version, description=description)
+                )
+                applied_now.append(version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    return applied_now
+
+
+def migrate() -> Dict:
+    """The deploy step (python migrate.py): migrate the schema, then sync the concept library"""
+    from app.db.session import SessionLocal, get_engine
+    from app.services.concepts import sync_concepts
+
+    applied = run_migrations(get_engine())
+    with SessionLocal() as db:
+        concepts = sync_concepts(db)
+    return {"applied": applied, "concepts": concepts}
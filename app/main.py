@@ -1,16 +1,66 @@
+from app.core.config import load_env
+
+# Before the imports below, which read their settings from os.environ
+load_env()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.models.allmodels import Base
-from app.db.session import engine
-from app.api.endpoints import ingest, patterns, learning, test, transactions
+from fastapi.responses import PlainTextResponse
+from app.core.instrumentation import MetricsMiddleware
+from app.core.metrics import REGISTRY
+from app.api.endpoints import ingest, patterns, learning, test, transactions, jobs, admin
+from app.services.llm_client import llm_client
+from app.services.job_queue import Worker
+from app.services.read_cache import ReadCacheListener
+from app.services.concepts import warm_concepts
+from app.db.migrations import migrate
+import asyncio
+import logging
+import os
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Schema changes are a deploy step (python migrate.py), not something every worker does on boot.
+# MIGRATE_ON_STARTUP=true runs them in the lifespan instead, for a single local process.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Set RUN_JOB_WORKER=false when workers run as a separate process (python worker.py)
+RUN_JOB_WORKER = os.getenv("RUN_JOB_WORKER", "true").lower() == "true"
+
+async def warm_up():
+    try:
+        await asyncio.to_thread(warm_concepts)
+    except Exception:
+        logger.exception("Concept index warm-up failed; retrieval will load it on first use")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate)
+    worker = Worker() if RUN_JOB_WORKER else None
+    if worker:
+        worker.start()
+    cache_listener = ReadCacheListener()
+    cache_listener.start()
+    # In the background, so the server takes requests right away
+    warming = asyncio.create_task(warm_up())
+    yield
+    warming.cancel()
+    await cache_listener.stop()
+    if worker:
+        await worker.stop()
+    await llm_client.aclose()
 
 app = FastAPI(
     title="Budge",
     version="1.0.0",
-    description="Financial behavior pattern detection and learning system"
+    description="Financial behavior pattern detection and learning system",
+    lifespan=lifespan
 )
 
 # CORS - MUST be before routes
@@ -20,14 +70,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Routes
 app.include_router(test.router, prefix="/api/v1/test", tags=["Test"])
 app.include_router(ingest.router, prefix="/api/v1/ingest", tags=["Ingest"])
 app.include_router(patterns.router, prefix="/api/v1/patterns", tags=["Patterns"])
 app.include_router(learning.router, prefix="/api/v1/learning", tags=["Learning"])
 app.include_router(transactions.router, prefix="/api/v1/transactions", tags=["Transactions"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["Jobs"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
 
 @app.get("/")
 def root():
@@ -41,6 +97,11 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (this process's counters, histograms and pool gauges)"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
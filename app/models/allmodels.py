@@ -1,9 +1,9 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Float, Boolean, ForeignKey, DateTime, Integer, ARRAY, Text, Date
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, String, Float, Boolean, ForeignKey, DateTime, Integer, ARRAY, Text, Date, Index, text
+from app.models.types import Vector, Xid8
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import declarative_base, deferred, relationship
 
 Base = declarative_base() 
 
@@ -23,6 +23,14 @@ class Snapshot(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Listing / stats by user, newest first; id breaks ties for keyset paging
+        Index("ix_transactions_user_date", "user_id", "date", "id"),
+        # Pattern scan only reads verified rows
+        Index("ix_transactions_user_verified_date", "user_id", "date", postgresql_where=text("verified")),
+        # Incremental scan: rows written since the last scan's snapshot
+        Index("ix_transactions_user_change_xid", "user_id", "change_xid"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     snapshot_id = Column(UUID(as_uuid=True), ForeignKey("snapshots.id"))
@@ -32,20 +40,57 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
     category = Column(String)
     verified = Column(Boolean, default=False) 
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Transactions that inserted and last changed the row, stamped by Postgres (a column
+    # default, and a trigger from migration 7), so scans can tell what they have not seen
+    created_xid = deferred(Column(Xid8, nullable=False, server_default=text("pg_current_xact_id()")))
+    change_xid = deferred(Column(Xid8, nullable=False, server_default=text("pg_current_xact_id()")))
+
+class DailySpend(Base):
+    """Verified spend rolled up per user, day, category and merchant.
+
+    Maintained by statement-level triggers on transactions (app.db.migrations), so
+    every insert, update and delete path keeps it current without app code.
+    """
+    __tablename__ = "daily_spend"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)  # NULL categories roll up as "Uncategorized"
+    merchant = Column(String, primary_key=True)
+    tx_count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
 
 class DetectedPattern(Base):
     """Behavioral events found by the Rule Engine"""
     __tablename__ = "detected_patterns"
+    __table_args__ = (
+        # One row per pattern identity; scans upsert on this instead of delete-and-reinsert
+        Index("uq_detected_patterns_user_fingerprint", "user_id", "fingerprint", unique=True),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     pattern_code = Column(String) 
     bias_mapping = Column(String) 
+    pattern_key = Column(String)  # merchant, date, tx id or (merchant, amount) the pattern is about
+    fingerprint = Column(String(64))  # pattern_fingerprint(pattern_code, pattern_key)
     details = Column(JSONB)
     trigger_transaction_ids = Column(ARRAY(UUID(as_uuid=True)))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class PatternScanState(Base):
+    """Per-user detector counters so scans only need to read new transactions"""
+    __tablename__ = "pattern_scan_states"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    state = Column(JSONB, nullable=False)
+    snapshot = Column(Text)  # pg_snapshot the state was read at; rows its writers were visible to are folded
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class ReflectionSession(Base):
     __tablename__ = "reflection_sessions"
+    __table_args__ = (
+        Index("ix_reflection_sessions_pattern", "pattern_id"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     pattern_id = Column(UUID(as_uuid=True), ForeignKey("detected_patterns.id"))
     ai_question = Column(Text)
@@ -53,15 +98,54 @@ class ReflectionSession(Base):
     reflection_quality_score = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+# Width of ConceptEmbedding.embedding; every embedder in app.services.embeddings produces it
+EMBEDDING_DIM = 768
+
 class ConceptEmbedding(Base):
+    """Concept library behind explanations (app.services.concepts); seeded from app/data/concepts.json"""
     __tablename__ = "concept_embeddings"
+    __table_args__ = (
+        Index("ix_concept_embeddings_bias", "bias"),
+        Index("ix_concept_embeddings_embedding", "embedding", postgresql_using="hnsw",
+              postgresql_ops={"embedding": "vector_cosine_ops"}),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     concept_id = Column(String, unique=True)
-    content = Column(Text)
-    # embedding = Column(Vector(768))
+    bias = Column(String)  # bias_mapping of the patterns this concept explains
+    title = Column(String)
+    definition = Column(Text)
+    content = Column(Text)  # the text that gets embedded
+    embedder = Column(String)  # which embedder produced `embedding`; rows from another one are re-embedded
+    embedding = Column(Vector(EMBEDDING_DIM))
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class LLMCacheEntry(Base):
+    """Persistent tier of the LLM reply cache (app.services.llm_cache)"""
+    __tablename__ = "llm_cache_entries"
+    key = Column(String(64), primary_key=True)  # sha256 prompt fingerprint
+    kind = Column(String)
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+class CategoryRule(Base):
+    """Merchant keyword rules; when present they override app/data/category_rules.json.
+    Lower priority wins when several categories match."""
+    __tablename__ = "category_rules"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    category = Column(String, nullable=False)
+    keyword = Column(String, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
 
 class GeneratedQuestion(Base):
     __tablename__ = "generated_questions"
+    __table_args__ = (
+        Index("ix_generated_questions_user_unanswered", "user_id", postgresql_where=text("is_answered = false")),
+        Index("ix_generated_questions_pattern", "pattern_id"),
+        # One open question per pattern; answered ones stay as history beside it
+        Index("uq_generated_questions_pattern_open", "pattern_id", unique=True,
+              postgresql_where=text("is_answered = false")),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     pattern_id = Column(UUID(as_uuid=True), ForeignKey("detected_patterns.id"))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
@@ -71,4 +155,33 @@ class GeneratedQuestion(Base):
     context_data = Column(JSONB)  
     
     is_answered = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Job(Base):
+    """Background work claimed by app.services.job_queue workers with FOR UPDATE SKIP LOCKED"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_runnable", "run_after", postgresql_where=text("status = 'queued'")),
+        # Running jobs whose lease has expired
+        Index("ix_jobs_running_lease", "updated_at", postgresql_where=text("status = 'running'")),
+        # At most one queued job per dedupe key; enqueueing again just pushes run_after back
+        Index("uq_jobs_queued_dedupe_key", "dedupe_key", unique=True, postgresql_where=text("status = 'queued'")),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB)
+    dedupe_key = Column(String)
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSONB)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaMigration(Base):
+    """Versions applied by app.db.migrations"""
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
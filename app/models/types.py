@@ -0,0 +1,66 @@
+"""Column types whose driver-side code is imported on first use, not with the models."""
+from typing import Any, Optional
+from sqlalchemy.types import Float, String, TypeEngine, UserDefinedType
+
+
+def _pgvector():
+    from pgvector import Vector
+    return Vector
+
+
+class Vector(UserDefinedType):
+    """pgvector VECTOR(dim) column.
+
+    Same DDL, conversion and distance operators as pgvector.sqlalchemy.VECTOR; the pgvector
+    package is only imported once a value is bound or read.
+    """
+    cache_ok = True
+    _string = String()
+
+    def __init__(self, dim: Optional[int] = None):
+        super().__init__()
+        self.dim = dim
+
+    def get_col_spec(self, **kw: Any) -> str:
+        return "VECTOR" if self.dim is None else f"VECTOR({self.dim})"
+
+    def bind_processor(self, dialect):
+        to_db = _pgvector()._to_db
+        return lambda value: to_db(value)
+
+    def literal_processor(self, dialect):
+        to_db = _pgvector()._to_db
+        string_literal = self._string._cached_literal_processor(dialect)
+        return lambda value: string_literal(to_db(value))
+
+    def result_processor(self, dialect, coltype):
+        from_db = _pgvector()._from_db
+        return lambda value: from_db(value)
+
+    class Comparator(TypeEngine.Comparator):
+        def l2_distance(self, other):
+            return self.op("<->", return_type=Float)(other)
+
+        def max_inner_product(self, other):
+            return self.op("<#>", return_type=Float)(other)
+
+        def cosine_distance(self, other):
+            return self.op("<=>", return_type=Float)(other)
+
+    comparator_factory = Comparator
+
+
+class Xid8(UserDefinedType):
+    """Postgres xid8: a 64-bit transaction id that never wraps around"""
+    cache_ok = True
+
+    def get_col_spec(self, **kw: Any) -> str:
+        return "XID8"
+
+
+class PgSnapshot(UserDefinedType):
+    """Postgres pg_snapshot, bound and read as its text form ('xmin:xmax:xip,...')"""
+    cache_ok = True
+
+    def get_col_spec(self, **kw: Any) -> str:
+        return "PG_SNAPSHOT"
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Any, Dict
+from uuid import UUID
+from datetime import datetime
+
+class TransactionDraft(BaseModel):
+    date: str = Field(..., description="ISO 8601 format YYYY-MM-DD")
+    merchant: str = Field(..., description="Cleaned merchant name")
+    amount: float
+    currency: str = "USD"
+
+class ExtractedReceipt(BaseModel):
+    transactions: List[TransactionDraft]
+
+class UploadAccepted(BaseModel):
+    status: str
+    snapshot_id: UUID
+    job_id: UUID
+    bytes: int
+
+class SnapshotStatus(BaseModel):
+    snapshot_id: UUID
+    user_id: UUID
+    status: str  # queued | running | done | failed
+    uploaded_at: datetime
+    job_id: Optional[UUID] = None
+    pages: Optional[int] = None
+    transactions_found: int = 0
+    transaction_ids: List[UUID] = []
+    skipped: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+
+class ConfirmDrafts(BaseModel):
+    # None confirms every draft of the snapshot
+    transaction_ids: Optional[List[UUID]] = None
+
+class DraftsConfirmed(BaseModel):
+    snapshot_id: UUID
+    confirmed: List[UUID]
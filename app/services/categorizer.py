@@ -0,0 +1,178 @@
+"""Keyword-based merchant categorization.
+
+Every keyword rule is compiled into one Aho-Corasick automaton, so a merchant
+name is matched against all rules in a single pass over its characters. Rules
+are ordered: when keywords from several categories occur, the earliest
+category wins, exactly like the old chain of `any(x in m ...)` checks.
+"""
+import json
+import os
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.allmodels import CategoryRule
+
+DEFAULT_CATEGORY = "Uncategorized"
+CATEGORY_RULES_PATH = os.getenv(
+    "CATEGORY_RULES_PATH", str(Path(__file__).resolve().parent.parent / "data" / "category_rules.json")
+)
+CATEGORIZER_CACHE_SIZE = int(os.getenv("CATEGORIZER_CACHE_SIZE", "50000"))
+
+Rules = List[Tuple[str, List[str]]]  # (category, keywords) in priority order
+
+
+def normalize_merchant(merchant_name: str) -> str:
+    return " ".join((merchant_name or "").lower().split())
+
+
+def load_rules_file(path: str = CATEGORY_RULES_PATH) -> Rules:
+    with open(path) as f:
+        return [(rule["category"], list(rule["keywords"])) for rule in json.load(f)]
+
+
+def load_rules_db(db: Session) -> Rules:
+    """Rules from the category_rules table, grouped by category in priority order"""
+    rules: "OrderedDict[str, List[str]]" = OrderedDict()
+    for rule in db.scalars(select(CategoryRule).order_by(CategoryRule.priority, CategoryRule.id)):
+        rules.setdefault(rule.category, []).append(rule.keyword)
+    return list(rules.items())
+
+
+class Automaton:
+    """Aho-Corasick automaton whose outputs are rule priorities (lower is better)"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._best: List[Optional[int]] = [None]  # best priority ending at each state, incl. via fail links
+
+        for word, priority in patterns:
+            word = normalize_merchant(word)
+            if not word:
+                continue
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._best.append(None)
+                state = nxt
+            self._best[state] = priority if self._best[state] is None else min(self._best[state], priority)
+
+        # Breadth-first fail links (depth-1 states fail to the root); fold each
+        # state's fail-chain outputs into its own so matching never walks the chain
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                inherited = self._best[self._fail[nxt]]
+                if inherited is not None and (self._best[nxt] is None or inherited < self._best[nxt]):
+                    self._best[nxt] = inherited
+
+    def best_match(self, text: str) -> Optional[int]:
+        """Lowest priority of any pattern occurring in `text`, or None"""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = None
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+        return found
+
+
+class Categorizer:
+    """Compiled rule set plus a bounded LRU memo keyed by normalized merchant name"""
+
+    def __init__(self, rules: Rules, cache_size: int = CATEGORIZER_CACHE_SIZE):
+        self.categories = [category for category, _ in rules]
+        self.automaton = Automaton(
+            (keyword, priority) for priority, (_, keywords) in enumerate(rules) for keyword in keywords
+        )
+        self.cache_size = cache_size
+        self._memo: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _match(self, normalized: str) -> str:
+        priority = self.automaton.best_match(normalized)
+        return DEFAULT_CATEGORY if priority is None else self.categories[priority]
+
+    def _lookup(self, normalized: str) -> str:
+        category = self._memo.get(normalized)
+        if category is not None:
+            self.hits += 1
+            self._memo.move_to_end(normalized)
+            return category
+        self.misses += 1
+        category = self._match(normalized)
+        self._memo[normalized] = category
+        if len(self._memo) > self.cache_size:
+            self._memo.popitem(last=False)
+        return category
+
+    def categorize(self, merchant_name: str) -> str:
+        return self._lookup(normalize_merchant(merchant_name))
+
+    def categorize_many(self, merchant_names: Iterable[str]) -> List[str]:
+        """Categorize a batch; each distinct merchant is matched at most once"""
+        seen: Dict[str, str] = {}
+        out = []
+        for name in merchant_names:
+            category = seen.get(name)
+            if category is None:
+                category = seen[name] = self._lookup(normalize_merchant(name))
+            out.append(category)
+        return out
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "categories": len(self.categories),
+            "entries": len(self._memo),
+            "max_entries": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+_categorizer: Optional[Categorizer] = None
+
+
+def get_categorizer() -> Categorizer:
+    global _categorizer
+    if _categorizer is None:
+        _categorizer = Categorizer(load_rules_file())
+    return _categorizer
+
+
+def reload_rules(db: Optional[Session] = None) -> Categorizer:
+    """Recompile from the category_rules table (falling back to the data file when it's empty).
+    Only affects this process."""
+    global _categorizer
+    rules = load_rules_db(db) if db is not None else []
+    _categorizer = Categorizer(rules or load_rules_file())
+    return _categorizer
+
+
+def categorize_merchant(merchant_name: str) -> str:
+    return get_categorizer().categorize(merchant_name)
+
+
+def categorize_many(merchant_names: Iterable[str]) -> List[str]:
+    return get_categorizer().categorize_many(merchant_names)
@@ -0,0 +1,231 @@
+"""Vectorized pattern detection over columnar transaction arrays.
+
+Transactions for one or many users are loaded once into NumPy arrays
+(merchants and categories dictionary-encoded) and every detector becomes a
+sort-based group-by plus threshold mask. Python only loops over groups, never
+over rows, which is what makes full scans of 100k+ row histories cheap. The
+detectors themselves are plugins in app/services/detectors.py.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import uuid
+import numpy as np
+from sqlalchemy import Boolean, Text, and_, cast, func, select
+from sqlalchemy.orm import Session
+from app.models.allmodels import Transaction
+from app.models.types import PgSnapshot
+from app.schemas.patterns import DetectedPatternCreate
+from app.services.pattern_rules import empty_state
+
+# Column order expected by from_rows (and produced by transaction_rows_query)
+COLUMNS = (
+    Transaction.user_id, Transaction.id, Transaction.date, Transaction.merchant,
+    Transaction.amount, Transaction.category
+)
+
+
+@dataclass
+class TransactionColumns:
+    user_ids: List[uuid.UUID]
+    users: np.ndarray            # int64 codes into user_ids
+    ids: np.ndarray              # object array of transaction UUIDs
+    days: np.ndarray             # datetime64[D]
+    merchant_names: List[str]
+    merchants: np.ndarray        # int64 codes into merchant_names
+    amounts: np.ndarray          # float64
+    category_names: List[Optional[str]]
+    categories: np.ndarray       # int64 codes into category_names
+    snapshot: Optional[str] = None  # pg_snapshot the rows were read at (see current_snapshot)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@dataclass
+class ScanResult:
+    user_id: uuid.UUID
+    patterns: List[Tuple[str, DetectedPatternCreate]] = field(default_factory=list)  # (pattern_key, pattern)
+    state: Dict = field(default_factory=empty_state)
+    snapshot: Optional[str] = None
+
+
+def _encode(values: Iterable) -> Tuple[list, np.ndarray]:
+    """Dictionary-encode values in first-appearance order"""
+    codes: Dict = {}
+    encoded = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int64)
+    return list(codes), encoded
+
+
+def current_snapshot(db: Session) -> str:
+    """The database's snapshot right now, as text: which writer transactions have committed.
+
+    It is the incremental-scan watermark. Unlike a timestamp, it can't be overtaken by a
+    transaction that commits late: rows whose writer it shows as still running are left
+    for the next scan, which reads exactly the rows this snapshot didn't see.
+    """
+    return db.scalar(select(cast(func.pg_current_snapshot(), Text)))
+
+
+def _as_snapshot(snapshot: str):
+    # Bound as text, then converted, so drivers never need a pg_snapshot codec
+    return cast(cast(snapshot, Text), PgSnapshot)
+
+
+def visible_in(snapshot: str, xid_column):
+    """Whether the transaction in `xid_column` had committed as of `snapshot`"""
+    return func.pg_visible_in_snapshot(xid_column, _as_snapshot(snapshot), type_=Boolean)
+
+
+def written_since(snapshot: str, xid_column):
+    """The opposite of visible_in, with a range test the (user_id, change_xid) index can use"""
+    return and_(xid_column >= func.pg_snapshot_xmin(_as_snapshot(snapshot)), ~visible_in(snapshot, xid_column))
+
+
+def transaction_rows_query(user_ids: List[uuid.UUID], snapshot: str):
+    """Every verified transaction of these users that `snapshot` sees"""
+    return select(*COLUMNS).where(
+        Transaction.user_id.in_(user_ids),
+        Transaction.verified == True,
+        visible_in(snapshot, Transaction.change_xid)
+    ).order_by(Transaction.user_id, Transaction.date.asc())
+
+
+def from_partitions(partitions: Iterable[List[tuple]], snapshot: Optional[str] = None) -> TransactionColumns:
+    """Build columns from batches of (user_id, id, date, merchant, amount, category) rows,
+    sorted by user then date.
+
+    Each batch is split into the per-column lists as it arrives, so a streamed result
+    only ever holds one batch of row objects.
+    """
+    user_col, id_col, date_col, merchant_col, amount_col, category_col = [], [], [], [], [], []
+    for batch in partitions:
+        for user_id, id_, date, merchant, amount, category in batch:
+            user_col.append(user_id)
+            id_col.append(id_)
+            date_col.append(date)
+            merchant_col.append(merchant)
+            amount_col.append(amount)
+            category_col.append(category)
+
+    if not id_col:
+        empty = np.empty(0, dtype=np.int64)
+        return TransactionColumns([], empty, np.empty(0, dtype=object), np.empty(0, dtype="datetime64[D]"),
+                                  [], empty, np.empty(0), [], empty, snapshot)
+
+    user_ids, users = _encode(user_col)
+    merchant_names, merchants = _encode(merchant_col)
+    category_names, categories = _encode(category_col)
+
+    return TransactionColumns(
+        user_ids=user_ids,
+        users=users,
+        ids=np.array(id_col, dtype=object),
+        days=np.array(date_col, dtype="datetime64[D]"),
+        merchant_names=merchant_names,
+        merchants=merchants,
+        amounts=np.array(amount_col, dtype=np.float64),
+        category_names=category_names,
+        categories=categories,
+        snapshot=snapshot
+    )
+
+
+def from_rows(rows: List[tuple], snapshot: Optional[str] = None) -> TransactionColumns:
+    """Build columns from (user_id, id, date, merchant, amount, category) rows,
+    sorted by user then date"""
+    return from_partitions([rows], snapshot)
+
+
+def load_columns(db: Session, user_ids: List[uuid.UUID]) -> TransactionColumns:
+    """One query for every verified transaction of the given users"""
+    snapshot = current_snapshot(db)
+    return from_rows(db.execute(transaction_rows_query(user_ids, snapshot)).all(), snapshot)
+
+
+def _group(keys: np.ndarray, rows: np.ndarray, amounts: np.ndarray):
+    """Group row indices by key.
+
+    Returns (members, starts, counts, sums): group i is members[starts[i]:starts[i] + counts[i]]
+    with rows in their original (date) order, and groups ordered by first appearance.
+    """
+    if len(rows) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0)
+
+    order = np.argsort(keys[rows], kind="stable")
+    members = rows[order]
+    sorted_keys = keys[members]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(members)])
+    sums = np.add.reduceat(amounts[members], starts)
+
+    by_first = np.argsort(members[starts], kind="stable")
+    return members, starts[by_first], counts[by_first], sums[by_first]
+
+
+def _combine(*codes: np.ndarray) -> np.ndarray:
+    """Single int64 key per row for a tuple of non-negative code columns"""
+    key = codes[0]
+    for column in codes[1:]:
+        width = int(column.max()) + 1
+        if int(key.max()) >= np.iinfo(np.int64).max // width:
+            # Re-densify before the product could overflow
+            key = np.unique(key, return_inverse=True)[1].reshape(-1)
+        key = key * width + column
+    return key
+
+
+@dataclass
+class ColumnarContext:
+    """What a detector's full-scan pass sees: the columns and the results to emit into"""
+    cols: TransactionColumns
+    results: Dict[uuid.UUID, ScanResult]
+    emitted: int = 0
+
+    @property
+    def all_rows(self) -> np.ndarray:
+        return np.arange(len(self.cols))
+
+    def owner(self, row: int) -> ScanResult:
+        return self.results[self.cols.user_ids[self.cols.users[row]]]
+
+    def emit(self, detector, key: str, details: Dict, members: np.ndarray):
+        """Add a pattern for the user owning `members` (row indices, in date order)"""
+        self.owner(members[0]).patterns.append((key, DetectedPatternCreate(
+            pattern_code=detector.code,
+            bias_mapping=detector.bias,
+            details=details,
+            trigger_transaction_ids=self.cols.ids[members].tolist()
+        )))
+        self.emitted += 1
+
+
+def detect(cols: TransactionColumns, runs: Optional[list] = None) -> Dict[uuid.UUID, ScanResult]:
+    """Run every enabled detector over every user in `cols` at once.
+
+    Per-detector timings go to the metrics registry, or are appended to `runs` for
+    callers (pool workers) that report them from another process.
+    """
+    from app.services.detectors import config_fingerprint, enabled_detectors, record_detector_runs, timed
+
+    results = {
+        user_id: ScanResult(user_id=user_id, snapshot=cols.snapshot)
+        for user_id in cols.user_ids
+    }
+    config = config_fingerprint()
+    for result in results.values():
+        result.state["config"] = config
+    if len(cols) == 0:
+        return results
+
+    ctx = ColumnarContext(cols, results)
+    collected = []
+    for detector in enabled_detectors():
+        before = ctx.emitted
+        collected.append(timed(detector, "full", lambda: (detector.detect(ctx), ctx.emitted - before)))
+
+    if runs is None:
+        record_detector_runs(collected)
+    else:
+        runs.extend(collected)
+    return results
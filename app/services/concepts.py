@@ -0,0 +1,259 @@
+"""Concept library and semantic retrieval for pattern explanations.
+
+Concepts live in the concept_embeddings table, each embedded by the configured
+embedder (app.services.embeddings). app/data/concepts.json seeds the table. Rows can
+also be loaded in bulk; sync_concepts() embeds whatever lacks a current embedding.
+
+A pattern is embedded from its bias and details, then matched by cosine similarity
+against the concepts tagged with the same bias (or all concepts, if none are).
+There are two ways to search:
+
+- memory: every process keeps a NumPy copy of the library, loaded in the background at
+  startup and refreshed when the table changes. One matrix product answers a whole batch of patterns.
+- pgvector: libraries larger than CONCEPT_INDEX_MAX_ROWS are not copied into memory.
+  They are searched in Postgres through the HNSW index instead.
+"""
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.metrics import REGISTRY
+from app.db.session import SessionLocal
+from app.models.allmodels import ConceptEmbedding, EMBEDDING_DIM
+from app.services.embeddings import get_embedder
+
+CONCEPTS_PATH = os.getenv(
+    "CONCEPTS_PATH", str(Path(__file__).resolve().parent.parent / "data" / "concepts.json")
+)
+CONCEPT_INDEX_MAX_ROWS = int(os.getenv("CONCEPT_INDEX_MAX_ROWS", "200000"))
+# How often a process checks the table for library changes
+CONCEPT_INDEX_TTL = float(os.getenv("CONCEPT_INDEX_TTL", "300"))
+EMBED_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+RETRIEVALS = REGISTRY.counter(
+    "budge_concept_retrievals_total", "Concept lookups by search path", ["path"]
+)
+
+Pattern = Tuple[str, Dict]  # (bias_mapping, details)
+
+
+def concept_text(concept: Dict) -> str:
+    return " ".join([concept["title"] + ".", concept["definition"], " ".join(concept.get("keywords", []))])
+
+
+def load_concepts_file(path: str = CONCEPTS_PATH) -> List[Dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def pattern_text(bias_mapping: str, details: Optional[Dict]) -> str:
+    """What a pattern is embedded from: its bias plus the names and text values of its details"""
+    words = [(bias_mapping or "").replace("_", " ").lower()]
+    for key, value in (details or {}).items():
+        words.append(str(key).replace("_", " "))
+        if isinstance(value, str):
+            words.append(value)
+        elif isinstance(value, list):
+            words.extend(v for v in value if isinstance(v, str))
+    return " ".join(words)
+
+
+def fallback_concept(bias_mapping: str) -> Dict:
+    return {"id": "unknown", "bias": bias_mapping, "title": bias_mapping, "definition": "A financial behavioral pattern."}
+
+
+def sync_concepts(db: Session, path: str = CONCEPTS_PATH) -> Dict:
+    """Upsert the library file, then embed every row without a current embedding (commits)"""
+    embedder = get_embedder()
+    now = datetime.utcnow()
+
+    library = [
+        {"concept_id": c["id"], "bias": c.get("bias"), "title": c["title"],
+         "definition": c["definition"], "content": concept_text(c)}
+        for c in load_concepts_file(path)
+    ]
+    stored = dict(db.execute(select(ConceptEmbedding.concept_id, ConceptEmbedding.content)).all())
+    changed = [row for row in library if stored.get(row["concept_id"]) != row["content"]]
+    if changed:
+        stmt = pg_insert(ConceptEmbedding).values([
+            {**row, "id": uuid.uuid4(), "embedder": None, "embedding": None, "updated_at": now} for row in changed
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["concept_id"],
+            set_={"bias": stmt.excluded.bias, "title": stmt.excluded.title, "definition": stmt.excluded.definition,
+                  "content": stmt.excluded.content, "embedder": None, "embedding": None, "updated_at": now}
+        ))
+
+    # Also picks up rows loaded straight into the table, and everything after an embedder change
+    embedded = 0
+    stale = select(ConceptEmbedding.id, ConceptEmbedding.content).where(or_(
+        ConceptEmbedding.embedder.is_distinct_from(embedder.name), ConceptEmbedding.embedding.is_(None)
+    )).limit(EMBED_BATCH_SIZE)
+    while rows := db.execute(stale).all():
+        vectors = embedder.embed([row.content or "" for row in rows])
+        db.execute(update(ConceptEmbedding), [
+            {"id": row.id, "embedding": vector, "embedder": embedder.name, "updated_at": now}
+            for row, vector in zip(rows, vectors)
+        ])
+        embedded += len(rows)
+    db.commit()
+    return {"upserted": len(changed), "embedded": embedded}
+
+
+@dataclass
+class _Snapshot:
+    embedder: str
+    version: tuple  # (rows, last update) of the table when loaded
+    concepts: List[Dict]
+    biases: np.ndarray  # concept bias per row
+    matrix: np.ndarray  # (rows, EMBEDDING_DIM) unit vectors
+
+
+class ConceptIndex:
+    """In-process NumPy copy of the embedded library.
+
+    Snapshots are immutable and swapped whole, so a search never sees a half-loaded one.
+    """
+
+    def __init__(self, max_rows: int = CONCEPT_INDEX_MAX_ROWS, ttl_seconds: float = CONCEPT_INDEX_TTL):
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = -math.inf
+
+    def _version(self, db: Session, embedder: str) -> tuple:
+        return tuple(db.execute(
+            select(func.count(), func.max(ConceptEmbedding.updated_at)).where(ConceptEmbedding.embedder == embedder)
+        ).one())
+
+    def load(self, db: Session) -> Optional[_Snapshot]:
+        """Rebuild from the table; None when the library is too big to hold in memory"""
+        embedder = get_embedder().name
+        version = self._version(db, embedder)
+        self._checked_at = time.monotonic()
+        if version[0] > self.max_rows:
+            self._snapshot = None
+            return None
+
+        rows = db.execute(
+            select(ConceptEmbedding.concept_id, ConceptEmbedding.bias, ConceptEmbedding.title,
+                   ConceptEmbedding.definition, ConceptEmbedding.embedding)
+            .where(ConceptEmbedding.embedder == embedder)
+            .order_by(ConceptEmbedding.concept_id)
+        ).all()
+        self._snapshot = _Snapshot(
+            embedder=embedder,
+            version=version,
+            concepts=[{"id": r.concept_id, "bias": r.bias, "title": r.title, "definition": r.definition} for r in rows],
+            biases=np.array([r.bias for r in rows], dtype=object),
+            matrix=np.array([r.embedding for r in rows], dtype=np.float32).reshape(len(rows), EMBEDDING_DIM)
+        )
+        logger.info("Concept index loaded: %d concepts (%s)", len(rows), embedder)
+        return self._snapshot
+
+    def current(self, db: Session) -> Optional[_Snapshot]:
+        """The snapshot to search, reloaded if the table changed; None means search pgvector"""
+        if time.monotonic() - self._checked_at < self.ttl_seconds:
+            return self._snapshot
+        snapshot = self._snapshot
+        embedder = get_embedder().name
+        if snapshot is not None and snapshot.embedder == embedder and snapshot.version == self._version(db, embedder):
+            self._checked_at = time.monotonic()
+            return snapshot
+        return self.load(db)
+
+    @staticmethod
+    def search(snapshot: _Snapshot, queries: np.ndarray, biases: Sequence[str]) -> List[Optional[Tuple[Dict, float]]]:
+        """Best concept per query: within the query's bias when the library has any, else overall"""
+        if not len(snapshot.concepts):
+            return [None] * len(biases)
+        scores = queries @ snapshot.matrix.T
+        for bias in set(biases):
+            allowed = snapshot.biases == bias
+            if allowed.any():
+                rows = [i for i, b in enumerate(biases) if b == bias]
+                scores[np.ix_(rows, np.flatnonzero(~allowed))] = -np.inf
+        best = scores.argmax(axis=1)
+        return [(snapshot.concepts[j], float(scores[i, j])) for i, j in enumerate(best.tolist())]
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            "loaded": snapshot is not None,
+            "embedder": snapshot.embedder if snapshot else get_embedder().name,
+            "concepts": len(snapshot.concepts) if snapshot else 0,
+            "biases": len(set(snapshot.biases.tolist())) if snapshot else 0,
+            "bytes": int(snapshot.matrix.nbytes) if snapshot else 0,
+            "max_rows": self.max_rows
+        }
+
+
+concept_index = ConceptIndex()
+
+
+def _search_db(db: Session, vector: np.ndarray, bias: str, embedder: str) -> Optional[Tuple[Dict, float]]:
+    distance = ConceptEmbedding.embedding.cosine_distance(vector)
+    nearest = select(
+        ConceptEmbedding.concept_id, ConceptEmbedding.bias, ConceptEmbedding.title,
+        ConceptEmbedding.definition, distance.label("distance")
+    ).where(ConceptEmbedding.embedder == embedder).order_by(distance).limit(1)
+    row = db.execute(nearest.where(ConceptEmbedding.bias == bias)).first() or db.execute(nearest).first()
+    if row is None:
+        return None
+    return {"id": row.concept_id, "bias": row.bias, "title": row.title, "definition": row.definition}, 1.0 - row.distance
+
+
+def retrieve_concepts(db: Session, patterns: Sequence[Pattern]) -> List[Dict]:
+    """Best-matching concept for each (bias_mapping, details), in order"""
+    if not patterns:
+        return []
+    embedder = get_embedder()
+    biases = [bias for bias, _ in patterns]
+    queries = embedder.embed([pattern_text(bias, details) for bias, details in patterns])
+
+    snapshot = concept_index.current(db)
+    if snapshot is not None:
+        RETRIEVALS.inc(len(patterns), path="memory")
+        hits = ConceptIndex.search(snapshot, queries, biases)
+    else:
+        RETRIEVALS.inc(len(patterns), path="pgvector")
+        hits = [_search_db(db, query, bias, embedder.name) for query, bias in zip(queries, biases)]
+
+    concepts = []
+    for bias, hit in zip(biases, hits):
+        if hit is None:
+            RETRIEVALS.inc(path="fallback")
+            concepts.append(fallback_concept(bias))
+        else:
+            concept, score = hit
+            concepts.append({**concept, "score": round(score, 4)})
+    return concepts
+
+
+def reload_concepts(db: Session) -> Dict:
+    """Sync the library file and rebuild this process's index"""
+    synced = sync_concepts(db)
+    concept_index.load(db)
+    return {**synced, **concept_index.stats()}
+
+
+def warm_concepts() -> Dict:
+    """Startup hook: load this process's index (blocking; run it in a thread).
+
+    Embedding the library file is left to the deploy step (app.db.migrations.migrate).
+    """
+    with SessionLocal() as db:
+        concept_index.load(db)
+    return concept_index.stats()
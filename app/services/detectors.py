@@ -0,0 +1,396 @@
+"""Pattern detector plugins.
+
+Each detector is a class registered with @register_detector. It owns its
+pattern code, bias and thresholds, and implements both scan modes:
+
+- detect(ctx): full scan over columnar arrays holding many users at once
+- incremental(ctx): one user's batch of new transactions, answered as the stored
+  patterns in scope plus what those patterns should now be
+
+Thresholds are per-detector config, overridable per deployment with the
+DETECTOR_CONFIG env var, e.g. '{"BIG_SPLURGE": {"min_amount": 300}, "IMPULSE_CLUSTER":
+{"enabled": false}}'. Scans run detectors in registration order and record each
+one's wall time, rows read and patterns emitted in the metrics registry.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import time
+import uuid
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.metrics import REGISTRY
+from app.models.allmodels import DailySpend, DetectedPattern, Transaction
+from app.services.columnar_engine import ColumnarContext, _combine, _group
+from app.services.impulse import impulse_clusters, impulse_details
+from app.services.recurrence import find_subscriptions, min_charges
+
+DETECTOR_CONFIG: Dict[str, Dict] = json.loads(os.getenv("DETECTOR_CONFIG") or "{}")
+
+# pattern_key -> (details, ids) where ids(stored pattern or None) gives the trigger transactions
+Found = Dict[str, Tuple[Dict, Callable[[Optional[DetectedPattern]], List[uuid.UUID]]]]
+
+DETECTOR_SECONDS = REGISTRY.histogram(
+    "budge_detector_seconds", "Wall time of one detector pass", ["detector", "mode"]
+)
+DETECTOR_ROWS = REGISTRY.counter(
+    "budge_detector_rows_total", "Rows read by detector passes", ["detector", "mode"]
+)
+DETECTOR_PATTERNS = REGISTRY.counter(
+    "budge_detector_patterns_total", "Patterns emitted by detector passes", ["detector", "mode"]
+)
+
+
+@dataclass
+class IncrementalContext:
+    db: Session
+    user_uuid: uuid.UUID
+    state: Dict                  # persisted counters; see pattern_rules.empty_state
+    txs: List[Transaction]       # verified rows added since the last scan, in date order
+
+    def stored(self, code: str, *criteria) -> List[DetectedPattern]:
+        return self.db.query(DetectedPattern).filter(
+            DetectedPattern.user_id == self.user_uuid,
+            DetectedPattern.pattern_code == code,
+            *criteria
+        ).all()
+
+
+@dataclass
+class DetectorRun:
+    code: str
+    mode: str                    # "full" or "incremental"
+    seconds: float
+    rows: int
+    patterns: int
+
+
+class Detector:
+    code: str = ""
+    bias: str = ""
+    defaults: Dict[str, Any] = {}
+
+    def __init__(self, overrides: Optional[Dict] = None):
+        overrides = overrides or {}
+        unknown = set(overrides) - set(self.defaults) - {"enabled"}
+        if unknown:
+            raise ValueError(f"Unknown {self.code} settings in DETECTOR_CONFIG: {sorted(unknown)}")
+        self.config = {"enabled": True, **self.defaults, **overrides}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config["enabled"])
+
+    def detect(self, ctx: ColumnarContext) -> int:
+        """Emit every pattern for the users in ctx; returns rows read"""
+        raise NotImplementedError
+
+    def incremental(self, ctx: IncrementalContext) -> Tuple[List[DetectedPattern], Found, int]:
+        """(stored patterns the batch can affect, what they should now be, rows read)"""
+        raise NotImplementedError
+
+
+DETECTORS: Dict[str, Detector] = {}
+
+
+def register_detector(cls):
+    """Instantiate a Detector subclass with its DETECTOR_CONFIG overrides and register it"""
+    DETECTORS[cls.code] = cls(DETECTOR_CONFIG.get(cls.code))
+    return cls
+
+
+def enabled_detectors() -> List[Detector]:
+    return [detector for detector in DETECTORS.values() if detector.enabled]
+
+
+def config_fingerprint() -> str:
+    """Changes whenever a detector is toggled or retuned; stored scan state built under
+    another config is stale"""
+    config = {detector.code: detector.config for detector in DETECTORS.values()}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def timed(detector: Detector, mode: str, run: Callable[[], Tuple[int, int]]) -> DetectorRun:
+    """Time run() -> (rows, patterns) as one DetectorRun"""
+    started = time.perf_counter()
+    rows, patterns = run()
+    return DetectorRun(detector.code, mode, time.perf_counter() - started, rows, patterns)
+
+
+def record_detector_runs(runs: List[DetectorRun]):
+    for run in runs:
+        labels = {"detector": run.code, "mode": run.mode}
+        DETECTOR_SECONDS.observe(run.seconds, **labels)
+        DETECTOR_ROWS.inc(run.rows, **labels)
+        DETECTOR_PATTERNS.inc(run.patterns, **labels)
+
+
+def detector_stats() -> List[Dict]:
+    """Config plus cumulative run metrics for every registered detector (this process)"""
+    seconds = DETECTOR_SECONDS.values()
+    rows = DETECTOR_ROWS.values()
+    patterns = DETECTOR_PATTERNS.values()
+
+    stats = []
+    for detector in DETECTORS.values():
+        modes = {}
+        for mode in ("full", "incremental"):
+            key = (detector.code, mode)
+            timing = seconds.get(key, {"count": 0, "sum": 0.0})
+            read = rows.get(key, 0.0)
+            emitted = patterns.get(key, 0.0)
+            modes[mode] = {
+                "runs": timing["count"],
+                "seconds": timing["sum"],
+                "avg_ms": 1000 * timing["sum"] / timing["count"] if timing["count"] else 0.0,
+                "rows": int(read),
+                "patterns": int(emitted),
+                # Patterns per row read
+                "hit_rate": emitted / read if read else 0.0
+            }
+        stats.append({
+            "code": detector.code,
+            "bias": detector.bias,
+            "enabled": detector.enabled,
+            "config": detector.config,
+            **modes
+        })
+    return stats
+
+
+@register_detector
+class LatteFactor(Detector):
+    """Small frequent purchases at one merchant"""
+    code = "LATTE_FACTOR"
+    bias = "PRESENT_BIAS"
+    defaults = {"max_amount": 25.0, "min_count": 3}
+
+    @staticmethod
+    def _details(merchant: str, count: int, total: float) -> Dict:
+        return {"merchant": merchant, "count": count, "total_spent": total, "avg_amount": total / count}
+
+    def detect(self, ctx: ColumnarContext) -> int:
+        cols = ctx.cols
+        small = np.flatnonzero(cols.amounts < self.config["max_amount"])
+        members, starts, counts, sums = _group(_combine(cols.users, cols.merchants), small, cols.amounts)
+        for start, count, total in zip(starts.tolist(), counts.tolist(), sums.tolist()):
+            group = members[start:start + count]
+            merchant = cols.merchant_names[cols.merchants[group[0]]]
+            ctx.owner(group[0]).state["merchants"][merchant] = {"count": count, "total": total}
+            if count >= self.config["min_count"]:
+                ctx.emit(self, merchant, self._details(merchant, count, total), group)
+        return len(cols)
+
+    def _member_ids(self, ctx: IncrementalContext, merchant: str) -> List[uuid.UUID]:
+        """Every transaction behind a merchant's counter (used when it first qualifies)"""
+        return ctx.db.scalars(
+            select(Transaction.id).where(
+                Transaction.user_id == ctx.user_uuid,
+                Transaction.verified == True,
+                Transaction.merchant == merchant,
+                Transaction.amount < self.config["max_amount"]
+            ).order_by(Transaction.date.asc())
+        ).all()
+
+    def incremental(self, ctx: IncrementalContext) -> Tuple[List[DetectedPattern], Found, int]:
+        # Counters only grow, so only the merchants this batch touched can change
+        merchants = ctx.state["merchants"]
+        new_ids = defaultdict(list)
+        for tx in ctx.txs:
+            if tx.amount < self.config["max_amount"]:
+                entry = merchants.setdefault(tx.merchant, {"count": 0, "total": 0.0})
+                entry["count"] += 1
+                entry["total"] += tx.amount
+                new_ids[tx.merchant].append(tx.id)
+
+        def ids(merchant: str, batch: List[uuid.UUID]):
+            def resolve(stored: Optional[DetectedPattern]) -> List[uuid.UUID]:
+                if stored is not None:
+                    return list(stored.trigger_transaction_ids or []) + batch
+                # Just crossed the threshold; earlier members predate this batch
+                if len(batch) == merchants[merchant]["count"]:
+                    return batch
+                return self._member_ids(ctx, merchant)
+            return resolve
+
+        found = {}
+        for merchant, batch in new_ids.items():
+            entry = merchants[merchant]
+            if entry["count"] >= self.config["min_count"]:
+                found[merchant] = (self._details(merchant, entry["count"], entry["total"]), ids(merchant, batch))
+
+        stored = ctx.stored(self.code, DetectedPattern.pattern_key.in_(list(new_ids))) if new_ids else []
+        return stored, found, len(ctx.txs)
+
+
+@register_detector
+class ImpulseCluster(Detector):
+    """Bursts of purchases within a sliding window of days"""
+    code = "IMPULSE_CLUSTER"
+    bias = "EMOTIONAL_SPENDING"
+    # min_count purchases (or min_total spent, 0 = off) within any window_days
+    # consecutive days; 2 catches sprees that straddle midnight
+    defaults = {"window_days": 2, "min_count": 4, "min_total": 0.0}
+
+    def _clusters(self, days, counts, totals) -> List[Tuple[int, int]]:
+        return impulse_clusters(
+            days, counts, totals, self.config["window_days"], self.config["min_count"], self.config["min_total"]
+        )
+
+    def detect(self, ctx: ColumnarContext) -> int:
+        cols = ctx.cols
+        day_keys = cols.days.astype(np.int64)
+        members, starts, counts, sums = _group(_combine(cols.users, day_keys), ctx.all_rows, cols.amounts)
+        # Day buckets come out in (user, date) order; split them into per-user runs
+        bucket_users = cols.users[members[starts]]
+        user_runs = np.flatnonzero(np.r_[True, bucket_users[1:] != bucket_users[:-1]]).tolist() + [len(starts)]
+        bucket_days = day_keys[members[starts]].tolist()
+        counts, sums, starts = counts.tolist(), sums.tolist(), starts.tolist()
+        for lo, hi in zip(user_runs[:-1], user_runs[1:]):
+            for first, last in self._clusters(bucket_days[lo:hi], counts[lo:hi], sums[lo:hi]):
+                first, last = first + lo, last + lo
+                group = members[starts[first]:starts[last] + counts[last]]
+                start_day, end_day = cols.days[group[0]].astype(date), cols.days[group[-1]].astype(date)
+                ctx.emit(self, str(start_day), impulse_details(
+                    start_day, end_day, sum(counts[first:last + 1]), sum(sums[first:last + 1]),
+                    self.config["window_days"]
+                ), group)
+        return len(cols)
+
+    def incremental(self, ctx: IncrementalContext) -> Tuple[List[DetectedPattern], Found, int]:
+        """Every burst for the user, windowed over the daily_spend rollup.
+
+        The rollup already includes the batch being scanned, and one row per active day
+        keeps this cheap enough to redo on every incremental scan. Member ids are fetched
+        lazily, only for bursts that are new or changed.
+        """
+        db, user_uuid = ctx.db, ctx.user_uuid
+        rows = db.execute(
+            select(DailySpend.date, func.sum(DailySpend.tx_count), func.sum(DailySpend.total))
+            .where(DailySpend.user_id == user_uuid)
+            .group_by(DailySpend.date).order_by(DailySpend.date)
+        ).all()
+        days = [row[0] for row in rows]
+        counts = [row[1] for row in rows]
+        totals = [row[2] for row in rows]
+
+        def member_ids(start: date, end: date):
+            return lambda stored: db.scalars(
+                select(Transaction.id).where(
+                    Transaction.user_id == user_uuid,
+                    Transaction.verified == True,
+                    Transaction.date.between(start, end)
+                ).order_by(Transaction.date.asc())
+            ).all()
+
+        found = {}
+        for first, last in self._clusters([day.toordinal() for day in days], counts, totals):
+            details = impulse_details(
+                days[first], days[last], sum(counts[first:last + 1]), sum(totals[first:last + 1]),
+                self.config["window_days"]
+            )
+            found[str(days[first])] = (details, member_ids(days[first], days[last]))
+        return ctx.stored(self.code), found, len(rows)
+
+
+@register_detector
+class BigSplurge(Detector):
+    """High value single purchase"""
+    code = "BIG_SPLURGE"
+    bias = "ANCHORING"  # Often result of sales/anchoring
+    defaults = {"min_amount": 150.0, "categories": ["Shopping", "Entertainment", "Electronics"]}
+
+    def detect(self, ctx: ColumnarContext) -> int:
+        cols = ctx.cols
+        splurge_codes = [i for i, name in enumerate(cols.category_names) if name in self.config["categories"]]
+        splurges = np.flatnonzero((cols.amounts > self.config["min_amount"]) & np.isin(cols.categories, splurge_codes))
+        for row in splurges.tolist():
+            ctx.emit(self, str(cols.ids[row]), {
+                "merchant": cols.merchant_names[cols.merchants[row]],
+                "amount": float(cols.amounts[row]),
+                "date": str(cols.days[row])
+            }, np.array([row]))
+        return len(cols)
+
+    def incremental(self, ctx: IncrementalContext) -> Tuple[List[DetectedPattern], Found, int]:
+        # Stateless: each qualifying transaction is its own pattern
+        found = {
+            str(tx.id): ({"merchant": tx.merchant, "amount": tx.amount, "date": str(tx.date)},
+                         lambda stored, tx_id=tx.id: [tx_id])
+            for tx in ctx.txs
+            if tx.amount > self.config["min_amount"] and tx.category in self.config["categories"]
+        }
+        stored = ctx.stored(self.code, DetectedPattern.pattern_key.in_(list(found))) if found else []
+        return stored, found, len(ctx.txs)
+
+
+@register_detector
+class SubscriptionTrap(Detector):
+    """Charges recurring on a regular cadence"""
+    code = "SUBSCRIPTION_TRAP"
+    bias = "SUNK_COST"
+    defaults = {
+        "min_amount": 10.0,
+        # [name, period days, tolerance days, min charges]: a bucket recurs when its
+        # median charge interval is within tolerance of the period
+        "cadences": [
+            ["weekly", 7.0, 1.0, 4],
+            ["monthly", 30.44, 4.0, 3],
+            ["annual", 365.25, 15.0, 2],
+        ],
+        # Share of intervals that must individually fit the cadence (tolerates a skipped month)
+        "min_regularity": 0.75,
+        # Sorted amounts closer than max(absolute, relative * amount) share a bucket, so
+        # price changes and FX noise don't split one subscription into several
+        "amount_tolerance": 1.0,
+        "amount_tolerance_pct": 0.10,
+    }
+
+    def detect(self, ctx: ColumnarContext) -> int:
+        cols = ctx.cols
+        min_count = min_charges(self.config)
+        members, starts, counts, _ = _group(_combine(cols.users, cols.merchants), ctx.all_rows, cols.amounts)
+        for start, count in zip(starts.tolist(), counts.tolist()):
+            if count < min_count:
+                continue
+            group = members[start:start + count]
+            merchant = cols.merchant_names[cols.merchants[group[0]]]
+            for key, details, positions in find_subscriptions(merchant, cols.days[group], cols.amounts[group], self.config):
+                ctx.emit(self, key, details, group[positions])
+        return len(cols)
+
+    def incremental(self, ctx: IncrementalContext) -> Tuple[List[DetectedPattern], Found, int]:
+        """Re-run recurrence detection over every charge at the touched merchants.
+
+        Interval analysis needs the whole date history, so unlike the counters this
+        reads the merchants' rows.
+        """
+        merchants = {tx.merchant for tx in ctx.txs}
+        if not merchants:
+            return [], {}, 0
+        rows = ctx.db.execute(
+            select(Transaction.merchant, Transaction.id, Transaction.date, Transaction.amount)
+            .where(Transaction.user_id == ctx.user_uuid, Transaction.verified == True,
+                   Transaction.merchant.in_(merchants))
+            .order_by(Transaction.merchant, Transaction.date.asc())
+        ).all()
+
+        by_merchant = defaultdict(list)
+        for row in rows:
+            by_merchant[row.merchant].append(row)
+
+        found = {}
+        for merchant, charges in by_merchant.items():
+            days = np.array([row.date for row in charges], dtype="datetime64[D]")
+            amounts = np.array([row.amount for row in charges], dtype=np.float64)
+            for key, details, positions in find_subscriptions(merchant, days, amounts, self.config):
+                ids = [charges[i].id for i in positions.tolist()]
+                found[key] = (details, lambda stored, ids=ids: ids)
+
+        stored = ctx.stored(self.code, DetectedPattern.details["merchant"].astext.in_(merchants))
+        return stored, found, len(rows)
@@ -0,0 +1,87 @@
+"""Text embeddings for concept retrieval, behind a pluggable embedder.
+
+Embedders turn texts into unit-length EMBEDDING_DIM vectors, so a dot product is
+cosine similarity. They run locally and synchronously. EMBEDDER picks one:
+
+- hashing: signed feature hashing of word unigrams and bigrams. No model and no
+  network, and deterministic, so every process embeds the same text identically.
+
+An embedder's `name` is stored next to each vector. Changing the embedder (or its
+version suffix) makes app.services.concepts re-embed the library.
+"""
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+import numpy as np
+from app.models.allmodels import EMBEDDING_DIM
+
+EMBEDDER = os.getenv("EMBEDDER", "hashing")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class Embedder:
+    name = ""
+    dim = EMBEDDING_DIM
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) float32, each row unit length (or zero for empty text)"""
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, "big")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbedder(Embedder):
+    """Bag of words and word pairs hashed into `dim` signed buckets, log-scaled counts"""
+    name = "hashing-v1"
+
+    def features(self, text: str) -> Counter:
+        words = _WORD.findall(text.lower())
+        return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self.features(text).items():
+                index, sign = _bucket(feature, self.dim)
+                vectors[row, index] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+EMBEDDERS: Dict[str, Type[Embedder]] = {
+    "hashing": HashingEmbedder,
+}
+
+_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    if _embedder is None:
+        if EMBEDDER not in EMBEDDERS:
+            raise ValueError(f"Unknown EMBEDDER {EMBEDDER!r}; expected one of {sorted(EMBEDDERS)}")
+        _embedder = EMBEDDERS[EMBEDDER]()
+    return _embedder
+
+
+def set_embedder(embedder: Embedder):
+    """Swap the process-wide embedder (tests, benchmarks); it must produce EMBEDDING_DIM vectors"""
+    global _embedder
+    if embedder.dim != EMBEDDING_DIM:
+        raise ValueError(f"Embedder {embedder.name!r} produces {embedder.dim} dims, the column holds {EMBEDDING_DIM}")
+    _embedder = embedder
+
+
+def embed(texts: List[str]) -> np.ndarray:
+    return get_embedder().embed(texts)
@@ -0,0 +1,56 @@
+"""Sliding-window spending bursts, shared by both scan modes of the IMPULSE_CLUSTER detector.
+
+Both reduce a user's verified transactions to per-day buckets (full scans from
+the rows they loaded, incremental scans from the daily_spend rollup), so the
+window pass runs over distinct days, not rows.
+"""
+from datetime import date
+from typing import Dict, List, Sequence, Tuple
+
+
+def impulse_clusters(
+    days: Sequence[int],
+    counts: Sequence[int],
+    totals: Sequence[float],
+    window_days: int,
+    min_count: int,
+    min_total: float = 0.0
+) -> List[Tuple[int, int]]:
+    """Bursts as inclusive (first, last) bucket index ranges.
+
+    `days` are one user's distinct day numbers in ascending order with their
+    transaction counts and totals. A window is any span of fewer than `window_days`
+    days holding at least `min_count` purchases, or at least `min_total` spent when
+    that is set. Overlapping qualifying windows merge into one burst. Two pointers,
+    so O(len(days)).
+    """
+    clusters: List[List[int]] = []
+    left = 0
+    count = 0
+    total = 0.0
+    for right in range(len(days)):
+        count += counts[right]
+        total += totals[right]
+        while days[right] - days[left] >= window_days:
+            count -= counts[left]
+            total -= totals[left]
+            left += 1
+
+        if count >= min_count or (min_total and total >= min_total):
+            if clusters and left <= clusters[-1][1]:
+                clusters[-1][1] = right
+            else:
+                clusters.append([left, right])
+    return [(first, last) for first, last in clusters]
+
+
+def impulse_details(start: date, end: date, count: int, total: float, window_days: int) -> Dict:
+    return {
+        "date": str(start),
+        "end_date": str(end),
+        "days": (end - start).days + 1,
+        "window_days": window_days,
+        "count": count,
+        "total_spent": total
+    }
+
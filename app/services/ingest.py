@@ -0,0 +1,181 @@
+"""Statement upload pipeline.
+
+1. The upload endpoint spools the file to INGEST_SPOOL_DIR in fixed-size chunks
+   (never holding it in memory), records a Snapshot and queues an extract job.
+2. The extract job runs the configured extractor (app.services.ocr) in a thread
+   and bulk-inserts its drafts as unverified transactions of that snapshot.
+
+Drafts stay unverified, so they don't reach the daily_spend rollup or pattern
+scans until the user confirms them (confirm_drafts, behind
+POST /api/v1/ingest/{snapshot_id}/confirm).
+"""
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import REGISTRY
+from app.models.allmodels import Snapshot, Transaction
+from app.schemas.ingest import ExtractedReceipt
+from app.services.categorizer import categorize_many
+from app.services.ocr import get_extractor
+from app.services.pattern_engine import invalidate_scan_state
+from app.services.read_cache import mark_changed
+
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "budge-uploads"))
+INGEST_MAX_UPLOAD_BYTES = int(os.getenv("INGEST_MAX_UPLOAD_MB", "25")) * 1024 * 1024
+SPOOL_CHUNK_SIZE = 1 << 20
+DRAFT_BATCH_SIZE = 1000
+
+EXTRACT_SECONDS = REGISTRY.histogram(
+    "budge_ingest_extract_seconds", "Statement extraction time per snapshot", ["extractor"],
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+)
+EXTRACTED_ROWS = REGISTRY.counter(
+    "budge_ingest_drafts_total", "Extracted drafts by outcome", ["outcome"]
+)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def spool_upload(source: BinaryIO, snapshot_id: uuid.UUID, filename: Optional[str] = None) -> Tuple[str, int]:
+    """Copy an upload to the spool dir chunk by chunk; returns (path, bytes).
+
+    Blocking; call through asyncio.to_thread. Oversized uploads are removed and raise UploadTooLarge.
+    """
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(filename or "")[1].lower()[:10]
+    path = os.path.join(INGEST_SPOOL_DIR, f"{snapshot_id}{extension}")
+
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = source.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > INGEST_MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"Upload exceeds {INGEST_MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def draft_rows(receipt: ExtractedReceipt, user_id: uuid.UUID, snapshot_id: uuid.UUID) -> Tuple[List[Dict], List[Dict]]:
+    """Insert params for the usable drafts, plus (index, reason) for the rest"""
+    rows, skipped = [], []
+    now = datetime.utcnow()
+    for index, draft in enumerate(receipt.transactions):
+        try:
+            tx_date = date.fromisoformat(draft.date.strip())
+        except ValueError:
+            skipped.append({"index": index, "reason": f"bad date {draft.date!r}"})
+            continue
+        merchant = " ".join(draft.merchant.split())
+        if not merchant:
+            skipped.append({"index": index, "reason": "no merchant"})
+            continue
+        if draft.amount <= 0:
+            skipped.append({"index": index, "reason": "not a debit"})
+            continue
+        rows.append({
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "snapshot_id": snapshot_id,
+            "date": tx_date,
+            "merchant": merchant,
+            "amount": draft.amount,
+            "category": None,
+            "verified": False,
+            "created_at": now,
+            "updated_at": now
+        })
+
+    for params, category in zip(rows, categorize_many(params["merchant"] for params in rows)):
+        params["category"] = category
+    return rows, skipped
+
+
+def _extract(path: str, content_type: Optional[str]) -> Tuple[ExtractedReceipt, int, str, float]:
+    extractor = get_extractor()
+    started = time.perf_counter()
+    pages = extractor.pages(path, content_type)
+    receipt = extractor.extract(path, content_type)
+    return receipt, pages, extractor.name, time.perf_counter() - started
+
+
+async def extract_snapshot(db: AsyncSession, snapshot_id: uuid.UUID) -> Dict:
+    """Run extraction for a snapshot and store its drafts (commits)"""
+    snapshot = await db.get(Snapshot, snapshot_id)
+    if snapshot is None:
+        return {"skipped": "snapshot no longer exists"}
+    meta = dict(snapshot.ocr_res or {})
+    if meta.get("status") == "done":
+        return {"skipped": "already extracted", "transactions": meta.get("transactions_found", 0)}
+
+    # Extractors block (SDK calls, hashing, image decoding); keep them off the event loop
+    receipt, pages, extractor, seconds = await asyncio.to_thread(_extract, snapshot.imgpath, meta.get("content_type"))
+    EXTRACT_SECONDS.observe(seconds, extractor=extractor)
+
+    rows, skipped = draft_rows(receipt, snapshot.user_id, snapshot.id)
+    EXTRACTED_ROWS.inc(len(rows), outcome="inserted")
+    EXTRACTED_ROWS.inc(len(skipped), outcome="skipped")
+
+    # A retried job replaces whatever an earlier attempt managed to insert
+    await db.execute(delete(Transaction).where(Transaction.snapshot_id == snapshot.id, Transaction.verified == False))
+    for start in range(0, len(rows), DRAFT_BATCH_SIZE):
+        await db.execute(insert(Transaction), rows[start:start + DRAFT_BATCH_SIZE])
+
+    snapshot.ocr_res = {
+        **meta,
+        "status": "done",
+        "extractor": extractor,
+        "pages": pages,
+        "transactions_found": len(rows),
+        "skipped": skipped,
+        "extracted_data": receipt.model_dump()
+    }
+    # Drafts show up in the transaction list straight away
+    await db.run_sync(mark_changed, [snapshot.user_id])
+    await db.commit()
+    return {"snapshot_id": str(snapshot.id), "pages": pages, "transactions": len(rows), "skipped": len(skipped)}
+
+
+async def confirm_drafts(
+    db: AsyncSession, snapshot: Snapshot, transaction_ids: Optional[List[uuid.UUID]] = None
+) -> List[uuid.UUID]:
+    """Mark a snapshot's drafts (all of them, or just `transaction_ids`) verified (commits).
+
+    Confirmed rows enter the daily_spend rollup through its triggers; the user's scan
+    state is rebuilt and a scan queued, as for any other write to past transactions.
+    """
+    # job_handlers imports this module for the extract job
+    from app.services.job_handlers import enqueue_pattern_scan
+
+    stmt = update(Transaction).where(Transaction.snapshot_id == snapshot.id, Transaction.verified == False)
+    if transaction_ids is not None:
+        stmt = stmt.where(Transaction.id.in_(transaction_ids))
+    confirmed = (await db.scalars(
+        stmt.values(verified=True, updated_at=datetime.utcnow()).returning(Transaction.id)
+    )).all()
+
+    if confirmed:
+        await db.run_sync(invalidate_scan_state, snapshot.user_id)
+        await enqueue_pattern_scan(db, snapshot.user_id)
+        await db.run_sync(mark_changed, [snapshot.user_id])
+    await db.commit()
+    return confirmed
+
+
+def remove_spooled(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
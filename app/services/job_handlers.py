@@ -0,0 +1,120 @@
+import asyncio
+import os
+import uuid
+from typing import Dict
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.allmodels import DetectedPattern, GeneratedQuestion
+from app.services.job_queue import job_handler, enqueue
+from app.services.pattern_engine import run_incremental_scan, invalidate_scan_state
+from app.services.learning_service import get_or_create_question, generate_questions_for_user
+from app.services.batch_scan import run_batch_scan, BATCH_SHARD_SIZE
+from app.services.categorizer import reload_rules
+from app.services.recategorize import recategorize_chunk, RECATEGORIZE_CHUNK_SIZE
+from app.services.ingest import extract_snapshot
+from app.services.read_cache import mark_changed
+
+# Transactions tend to arrive in bursts; wait for a quiet period before scanning
+SCAN_DEBOUNCE_SECONDS = float(os.getenv("SCAN_DEBOUNCE_SECONDS", "5"))
+# A recategorize job handles this many chunks, then queues its own continuation
+RECATEGORIZE_CHUNKS_PER_JOB = int(os.getenv("RECATEGORIZE_CHUNKS_PER_JOB", "20"))
+
+
+async def enqueue_pattern_scan(db: AsyncSession, user_id) -> uuid.UUID:
+    """Debounced scan for a user; call before committing the write that triggered it"""
+    return await enqueue(
+        db, "pattern_scan", {"user_id": str(user_id)},
+        dedupe_key=f"pattern_scan:{user_id}", delay=SCAN_DEBOUNCE_SECONDS
+    )
+
+
+@job_handler("pattern_scan")
+async def pattern_scan(db: AsyncSession, payload: Dict) -> Dict:
+    user_id = payload["user_id"]
+    patterns = await db.run_sync(run_incremental_scan, user_id)
+
+    # Pre-generate questions for patterns that don't have one yet, in one batch job
+    unquestioned = (await db.scalars(select(DetectedPattern.id).where(
+        DetectedPattern.user_id == uuid.UUID(user_id),
+        ~exists().where(GeneratedQuestion.pattern_id == DetectedPattern.id)
+    ))).all()
+    if unquestioned:
+        await enqueue(
+            db, "generate_questions", {"user_id": user_id},
+            dedupe_key=f"generate_questions:{user_id}"
+        )
+    await db.commit()
+
+    return {"patterns": len(patterns), "questions_queued": len(unquestioned)}
+
+
+@job_handler("generate_question")
+async def generate_question(db: AsyncSession, payload: Dict) -> Dict:
+    """One pattern at a time; scans now queue generate_questions, this drains older jobs"""
+    pattern = await db.get(DetectedPattern, uuid.UUID(payload["pattern_id"]))
+    if pattern is None:
+        # Rescanned away before we got to it
+        return {"skipped": "pattern no longer exists"}
+
+    # Also warms the explanation cache for when the user opens it
+    question, _, created = await get_or_create_question(db, pattern)
+    return {"question_id": str(question.id), "created": created}
+
+
+@job_handler("generate_questions")
+async def generate_questions(db: AsyncSession, payload: Dict) -> Dict:
+    created, skipped = await generate_questions_for_user(db, uuid.UUID(payload["user_id"]))
+    return {"created": len(created), "skipped": skipped}
+
+
+@job_handler("batch_scan")
+async def batch_scan(db: AsyncSession, payload: Dict) -> Dict:
+    # Blocking (process pool + sync session); keep it off the event loop
+    report = await asyncio.to_thread(run_batch_scan, payload.get("workers"), payload.get("shard_size") or BATCH_SHARD_SIZE)
+    return report.as_dict()
+
+
+@job_handler("recategorize")
+async def recategorize(db: AsyncSession, payload: Dict) -> Dict:
+    """Re-apply the current category rules to stored transactions.
+
+    Each chunk commits on its own and the job ends by queueing a continuation that
+    starts after the last id it saw, so a crash or retry resumes instead of restarting.
+    The result carries cumulative progress and the id of the next job in the chain.
+    """
+    # Pick up rule edits made through the category_rules table
+    await db.run_sync(reload_rules)
+
+    chunk_size = payload.get("chunk_size") or RECATEGORIZE_CHUNK_SIZE
+    overwrite = bool(payload.get("overwrite"))
+    after = uuid.UUID(payload["after"]) if payload.get("after") else None
+    progress = {"scanned": 0, "updated": 0, "rescans_queued": 0, **(payload.get("progress") or {})}
+
+    for _ in range(RECATEGORIZE_CHUNKS_PER_JOB):
+        last_id, scanned, updated, user_ids = await recategorize_chunk(db, after, chunk_size, overwrite)
+        if last_id is None:
+            return {**progress, "done": True}
+
+        # Categories feed BIG_SPLURGE, so affected users need a full rescan
+        for user_id in user_ids:
+            await db.run_sync(invalidate_scan_state, user_id)
+            await enqueue_pattern_scan(db, user_id)
+        await db.run_sync(mark_changed, user_ids)
+        await db.commit()
+
+        after = last_id
+        progress["scanned"] += scanned
+        progress["updated"] += updated
+        progress["rescans_queued"] += len(user_ids)
+
+    next_job_id = await enqueue(db, "recategorize", {
+        "after": str(after), "chunk_size": chunk_size, "overwrite": overwrite, "progress": progress
+    }, dedupe_key="recategorize")
+    await db.commit()
+    return {**progress, "done": False, "after": str(after), "next_job_id": str(next_job_id)}
+
+
+@job_handler("extract_snapshot")
+async def extract_statement(db: AsyncSession, payload: Dict) -> Dict:
+    """Turn an uploaded statement into unverified transactions; see app.services.ingest"""
+    return await extract_snapshot(db, uuid.UUID(payload["snapshot_id"]))
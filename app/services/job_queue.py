@@ -0,0 +1,215 @@
+"""Postgres-backed job queue.
+
+Jobs are rows in the `jobs` table. Workers claim them with
+`SELECT ... FOR UPDATE SKIP LOCKED`, so any number of worker tasks or
+processes can share the table without an external broker.
+"""
+import asyncio
+import logging
+import os
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import and_, case, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import AsyncSessionLocal
+from app.models.allmodels import Job
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job whose worker stopped renewing its lease (it died) is handed out again after this long
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3
+
+Handler = Callable[[AsyncSession, Dict], Awaitable[Optional[Dict]]]
+
+logger = logging.getLogger(__name__)
+HANDLERS: Dict[str, Handler] = {}
+
+
+def job_handler(kind: str):
+    """Register a coroutine `(db, payload) -> result dict` for a job kind"""
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Dict,
+    dedupe_key: Optional[str] = None,
+    delay: float = 0
+) -> uuid.UUID:
+    """Queue a job in the caller's transaction (it becomes visible when they commit).
+
+    With a dedupe_key, an already-queued job with that key is reused and its
+    run_after pushed back, which debounces bursts of identical work.
+    """
+    run_after = datetime.utcnow() + timedelta(seconds=delay)
+    stmt = pg_insert(Job).values(
+        id=uuid.uuid4(), kind=kind, payload=payload, dedupe_key=dedupe_key,
+        status="queued", run_after=run_after, attempts=0,
+        created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+    )
+    if dedupe_key is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["dedupe_key"],
+            index_where=text("status = 'queued'"),
+            set_={"run_after": stmt.excluded.run_after, "payload": stmt.excluded.payload,
+                  "updated_at": stmt.excluded.updated_at}
+        )
+    return (await db.execute(stmt.returning(Job.id))).scalar_one()
+
+
+async def lock_kind(db: AsyncSession, kind: str) -> None:
+    """Serialize callers on this job kind until the current transaction ends.
+
+    Take it before an active_job check that decides whether to enqueue: two requests
+    can otherwise both see nothing queued or running and both start a job.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"job_kind:{kind}"))))
+
+
+async def active_job(db: AsyncSession, kind: str) -> Optional[Job]:
+    """The oldest queued or running job of this kind, if any"""
+    return (await db.scalars(
+        select(Job).where(Job.kind == kind, Job.status.in_(("queued", "running")))
+        .order_by(Job.created_at).limit(1)
+    )).first()
+
+
+async def get_jobs(db: AsyncSession, user_id: str, limit: int = 20) -> List[Job]:
+    return (await db.scalars(
+        select(Job).where(Job.payload["user_id"].astext == user_id)
+        .order_by(Job.created_at.desc()).limit(limit)
+    )).all()
+
+
+async def _claim(db: AsyncSession) -> Optional[Job]:
+    """Take the next runnable job. An expired lease on a job that has used up its attempts
+    is claimed only to be marked failed; the caller sees status "failed"."""
+    now = datetime.utcnow()
+    next_id = select(Job.id).where(or_(
+        and_(Job.status == "queued", Job.run_after <= now),
+        and_(Job.status == "running", Job.updated_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+    )).order_by(Job.run_after).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+    exhausted = Job.attempts >= JOB_MAX_ATTEMPTS
+    job = (await db.scalars(
+        update(Job).where(Job.id == next_id)
+        .values(
+            status=case((exhausted, "failed"), else_="running"),
+            attempts=case((exhausted, Job.attempts), else_=Job.attempts + 1),
+            error=case((exhausted, f"Lease expired on attempt {JOB_MAX_ATTEMPTS} of {JOB_MAX_ATTEMPTS}"), else_=Job.error),
+            updated_at=now
+        )
+        .returning(Job)
+    )).first()
+    await db.commit()
+    return job
+
+
+def _owned(job: Job):
+    """Still ours: a worker that lost its lease must not touch the job's new run"""
+    return update(Job).where(Job.id == job.id, Job.status == "running", Job.attempts == job.attempts)
+
+
+async def _finish(job: Job, **values):
+    async with AsyncSessionLocal() as db:
+        await db.execute(_owned(job).values(updated_at=datetime.utcnow(), **values))
+        await db.commit()
+
+
+async def _heartbeat(job: Job):
+    """Renew the lease while the handler runs, so a long job isn't handed to a second worker"""
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                renewed = (await db.execute(_owned(job).values(updated_at=datetime.utcnow()))).rowcount
+                await db.commit()
+        except Exception as e:
+            logger.warning("Job %s %s heartbeat failed: %s", job.kind, job.id, e)
+            continue
+        if not renewed:
+            logger.warning("Job %s %s lost its lease", job.kind, job.id)
+            return
+
+
+async def run_next_job() -> bool:
+    """Claim and run one job. Returns False when nothing was runnable."""
+    async with AsyncSessionLocal() as db:
+        job = await _claim(db)
+    if job is None:
+        return False
+    if job.status == "failed":
+        logger.warning("Job %s %s failed: %s", job.kind, job.id, job.error)
+        return True
+
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        await _finish(job, status="failed", error=f"No handler for job kind {job.kind}")
+        return True
+
+    heartbeat = asyncio.create_task(_heartbeat(job))
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await handler(db, job.payload or {})
+    except Exception as e:
+        logger.warning("Job %s %s failed: %s", job.kind, job.id, e)
+        error = traceback.format_exc()
+    else:
+        error = None
+    finally:
+        heartbeat.cancel()
+
+    if error is None:
+        await _finish(job, status="done", result=result, error=None)
+    elif job.attempts < JOB_MAX_ATTEMPTS:
+        # Retry with backoff; drop the dedupe key so it can't clash with a newer queued copy
+        await _finish(
+            job, status="queued", dedupe_key=None, error=error,
+            run_after=datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+        )
+    else:
+        await _finish(job, status="failed", error=error)
+    return True
+
+
+class Worker:
+    """Polls the jobs table from a few asyncio tasks in this process"""
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                ran = await run_next_job()
+            except Exception:
+                logger.exception("Job worker error")
+                ran = False
+            if not ran:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        # Importing registers the handlers
+        import app.services.job_handlers  # noqa: F401
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,163 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from sqlalchemy import exists, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.allmodels import DetectedPattern, GeneratedQuestion
+from app.services.concepts import pattern_text
+from app.services.rag_service import rag_service
+from app.services.question_service import question_generator
+from app.services.read_cache import mark_changed
+
+# LLM calls one batch may have in flight; the client's own limit is shared by every request
+QUESTION_BATCH_CONCURRENCY = int(os.getenv("QUESTION_BATCH_CONCURRENCY", "4"))
+
+
+def _insert_open_question():
+    """INSERT of new questions that skips patterns which already have an open one
+    (uq_generated_questions_pattern_open), whoever inserted it"""
+    return pg_insert(GeneratedQuestion).on_conflict_do_nothing(
+        index_elements=["pattern_id"], index_where=text("is_answered = false")
+    ).returning(GeneratedQuestion)
+
+
+def _question_row(pattern: DetectedPattern, concept: Dict, question_text: str) -> Dict:
+    return {
+        "pattern_id": pattern.id,
+        "user_id": pattern.user_id,
+        "question_text": question_text,
+        "question_type": "reflection",
+        "context_data": {
+            "pattern_code": pattern.pattern_code,
+            "bias": pattern.bias_mapping,
+            "concept_id": concept["id"]
+        }
+    }
+
+
+async def _generate(pattern: DetectedPattern, concept: Dict) -> Tuple[str, str]:
+    """Question and explanation for a pattern, generated concurrently"""
+    question_text, explanation = await asyncio.gather(
+        question_generator.generate_question(
+            pattern_code=pattern.pattern_code,
+            bias_name=pattern.bias_mapping,
+            pattern_details=pattern.details,
+            concept_context=concept
+        ),
+        rag_service.get_explanation(concept, pattern.details)
+    )
+    return question_text, explanation
+
+
+async def get_or_create_question(db: AsyncSession, pattern: DetectedPattern) -> Tuple[GeneratedQuestion, str, bool]:
+    """Return the pattern's open question and its explanation, generating both if needed.
+
+    Shared by the generate-question endpoint and the background pre-generation job.
+    The third element is True when the question was created by this call.
+    """
+    # Check if question already exists
+    existing = (await db.scalars(select(GeneratedQuestion).where(
+        GeneratedQuestion.pattern_id == pattern.id,
+        GeneratedQuestion.is_answered == False
+    ))).first()
+
+    # Retrieve relevant concept
+    concept = await db.run_sync(
+        rag_service.retrieve_relevant_concept, pattern.bias_mapping, pattern.details
+    )
+
+    if existing:
+        explanation = await rag_service.get_explanation(concept, pattern.details)
+        return existing, explanation, False
+
+    question_text, explanation = await _generate(pattern, concept)
+
+    # A concurrent request may have stored one since the check above; keep theirs
+    row = {**_question_row(pattern, concept, question_text),
+           "id": uuid.uuid4(), "is_answered": False, "created_at": datetime.utcnow()}
+    db_question = (await db.scalars(_insert_open_question().values(**row))).first()
+    if db_question is None:
+        existing = (await db.scalars(select(GeneratedQuestion).where(
+            GeneratedQuestion.pattern_id == pattern.id,
+            GeneratedQuestion.is_answered == False
+        ))).one()
+        return existing, explanation, False
+
+    await db.run_sync(mark_changed, [pattern.user_id])
+    await db.commit()
+
+    return db_question, explanation, True
+
+
+async def _taken(db: AsyncSession, patterns: List[DetectedPattern]) -> set:
+    """Ids of these patterns that have a question by now"""
+    return set((await db.scalars(select(GeneratedQuestion.pattern_id).where(
+        GeneratedQuestion.pattern_id.in_([p.id for p in patterns])
+    ))).all())
+
+
+async def generate_questions_for_user(
+    db: AsyncSession, user_id: uuid.UUID, limit: Optional[int] = None
+) -> Tuple[List[Tuple[GeneratedQuestion, DetectedPattern, str]], int]:
+    """Questions for every pattern of the user that has never had one (commits).
+
+    One query loads the patterns. One batched search covers their distinct retrieval
+    queries (bias plus the text pattern_text() embeds). LLM calls run at most
+    QUESTION_BATCH_CONCURRENCY at a time, and one INSERT stores the questions, skipping
+    patterns that already have an open question. Returns ([(question, pattern, explanation)],
+    skipped), where skipped counts patterns that got a question elsewhere while this batch ran.
+    """
+    unquestioned = select(DetectedPattern).where(
+        DetectedPattern.user_id == user_id,
+        ~exists().where(GeneratedQuestion.pattern_id == DetectedPattern.id)
+    ).order_by(DetectedPattern.created_at.asc(), DetectedPattern.id)
+    if limit:
+        unquestioned = unquestioned.limit(limit)
+    patterns = (await db.scalars(unquestioned)).all()
+    if not patterns:
+        return [], 0
+
+    # Patterns that embed to the same query share one concept lookup
+    keys = [(p.bias_mapping, pattern_text(p.bias_mapping, p.details)) for p in patterns]
+    distinct = {key: (pattern.bias_mapping, pattern.details) for key, pattern in zip(keys, patterns)}
+    found = await db.run_sync(rag_service.retrieve_many, list(distinct.values()))
+    concepts = dict(zip(distinct, found))
+
+    # The pre-generation job or a single-pattern request may have beaten us to some;
+    # check before paying for their LLM calls, and again before inserting
+    taken = await _taken(db, patterns)
+    pending = [(p, key) for p, key in zip(patterns, keys) if p.id not in taken]
+    if not pending:
+        return [], len(patterns)
+
+    semaphore = asyncio.Semaphore(QUESTION_BATCH_CONCURRENCY)
+
+    async def generate(pattern: DetectedPattern, key: Tuple[str, str]) -> Tuple[str, str]:
+        async with semaphore:
+            return await _generate(pattern, concepts[key])
+
+    generated = await asyncio.gather(*(generate(p, key) for p, key in pending))
+
+    taken = await _taken(db, [p for p, _ in pending])
+    batch = [
+        (pattern, explanation, {**_question_row(pattern, concepts[key], question_text),
+                                "id": uuid.uuid4(), "is_answered": False, "created_at": datetime.utcnow()})
+        for (pattern, key), (question_text, explanation) in zip(pending, generated)
+        if pattern.id not in taken
+    ]
+    if not batch:
+        return [], len(patterns)
+
+    # A concurrent batch can still get in between the check and the insert;
+    # its questions win and ours for those patterns are dropped
+    inserted = (await db.scalars(_insert_open_question(), [row for _, _, row in batch])).all()
+    by_pattern = {question.pattern_id: question for question in inserted}
+    created = [(by_pattern[pattern.id], pattern, explanation)
+               for pattern, explanation, _ in batch if pattern.id in by_pattern]
+    if created:
+        await db.run_sync(mark_changed, [user_id])
+    await db.commit()
+    return created, len(patterns) - len(created)
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db.session import AsyncSessionLocal
+from app.models.allmodels import LLMCacheEntry
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value: Any) -> Any:
+    """Make equivalent pattern details hash the same (key order, float noise, stray whitespace)"""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def cache_key(kind: str, model: str, prompt_version: str, concept_id: str, pattern_details: Dict, *extra: str) -> str:
+    """Fingerprint of everything that shapes the prompt"""
+    details = json.dumps(_normalize(pattern_details or {}), sort_keys=True, separators=(",", ":"))
+    raw = "|".join([kind, model, prompt_version, concept_id or "", *extra, details])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class LLMCache:
+    """Two-tier cache for LLM replies: an in-process TTL/LRU dict in front of a Postgres table.
+
+    Only successful replies are stored; if `compute` raises, nothing is cached and the
+    error propagates so callers can fall back as before.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_seconds: int = LLM_CACHE_TTL, persistent: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at monotonic, value)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = {"memory": 0, "db": 0}
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_local(self, key: str, value: str, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _get_db(self, key: str) -> Optional[tuple]:
+        try:
+            async with AsyncSessionLocal() as db:
+                entry = (await db.scalars(select(LLMCacheEntry).where(
+                    LLMCacheEntry.key == key,
+                    LLMCacheEntry.expires_at > datetime.utcnow()
+                ))).first()
+                if entry:
+                    return entry.value, (entry.expires_at - datetime.utcnow()).total_seconds()
+        except Exception as e:
+            logger.warning("LLM cache read error: %s", e)
+        return None
+
+    async def _put_db(self, key: str, kind: str, value: str):
+        now = datetime.utcnow()
+        values = {"key": key, "kind": kind, "value": value, "created_at": now,
+                  "expires_at": now + timedelta(seconds=self.ttl_seconds)}
+        stmt = pg_insert(LLMCacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": stmt.excluded.value, "created_at": stmt.excluded.created_at,
+                  "expires_at": stmt.excluded.expires_at}
+        )
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt)
+                await db.commit()
+        except Exception as e:
+            logger.warning("LLM cache write error: %s", e)
+
+    async def get_or_compute(self, key: str, kind: str, compute: Callable[[], Awaitable[str]]) -> str:
+        value = self._get_local(key)
+        if value is not None:
+            self.hits["memory"] += 1
+            return value
+
+        # Concurrent requests for the same key share one computation
+        if key in self._inflight:
+            self.hits["memory"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            found = await self._get_db(key) if self.persistent else None
+            if found is not None:
+                value, ttl = found
+                self.hits["db"] += 1
+                self._put_local(key, value, ttl)
+            else:
+                self.misses += 1
+                value = await compute()
+                self._put_local(key, value, self.ttl_seconds)
+                if self.persistent:
+                    await self._put_db(key, kind, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved so an unawaited future doesn't warn
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        lookups = self.hits["memory"] + self.hits["db"] + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0
+        }
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import random
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+from urllib.parse import urlsplit
+from app.core.metrics import REGISTRY
+
+# httpx (and the CLI it pulls in) is imported with the first client, not at startup
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+# Point at a local stub server (any OpenAI-compatible /chat/completions) for tests and benchmarks
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", DEFAULT_BASE_URL)
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+LLM_SECONDS = REGISTRY.histogram(
+    "budge_llm_request_seconds", "LLM call latency including retries", ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+LLM_ATTEMPTS = REGISTRY.counter(
+    "budge_llm_attempts_total", "HTTP attempts against the LLM API by status (or transport error)", ["status"]
+)
+LLM_FAILURES = REGISTRY.counter(
+    "budge_llm_failures_total", "LLM calls that raised LLMError", ["reason"]
+)
+# Callers record where each generated text came from: "llm", or the reason they fell back
+LLM_GENERATIONS = REGISTRY.counter(
+    "budge_llm_generations_total", "Generated texts by kind and source (llm or a fallback reason)", ["kind", "source"]
+)
+
+
+class LLMError(Exception):
+    """The LLM call failed after retries (or with a non-retryable status)"""
+
+    def __init__(self, message: str, reason: str = "error"):
+        super().__init__(message)
+        self.reason = reason
+
+
+class LLMClient:
+    """Shared async client for the chat completions API.
+
+    One keep-alive connection pool per process, a concurrency cap per host and
+    bounded retries with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url: str = LLM_BASE_URL,
+        api_key: str = GROQ_API_KEY,
+        model: str = LLM_MODEL,
+        max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+        max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2")),
+        backoff_base: float = 0.5,
+        backoff_max: float = 4.0
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def configured(self) -> bool:
+        """Whether a call can succeed at all (a key, or a non-default endpoint such as a stub)"""
+        return bool(self.api_key) or self.base_url != DEFAULT_BASE_URL
+
+    def _bind_loop(self):
+        """The pool and the semaphores belong to one event loop; start over on another one
+        (a second asyncio.run, a second TestClient)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # An old loop's client can't be closed from here; dropping it releases its sockets
+            self._client = None
+            self._semaphores = {}
+            self._loop = loop
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        # Created lazily so it binds to the running event loop
+        self._bind_loop()
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        self._bind_loop()
+        host = urlsplit(self.base_url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[host]
+
+    def _backoff(self, attempt: int, response: Optional["httpx.Response"] = None) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * (0.5 + random.random() / 2)
+
+    async def chat(
+        self,
+        prompt: str,
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        timeout: float = 30.0
+    ) -> str:
+        """Send one user message and return the stripped reply text"""
+        started = time.perf_counter()
+        try:
+            reply = await self._chat(prompt, max_tokens, temperature, timeout)
+        except LLMError as e:
+            LLM_SECONDS.observe(time.perf_counter() - started, outcome="error")
+            LLM_FAILURES.inc(reason=e.reason)
+            raise
+        LLM_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+        return reply
+
+    async def _chat(self, prompt: str, max_tokens: int, temperature: float, timeout: float) -> str:
+        import httpx
+
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        client = self._get_client()
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                async with self._semaphore():
+                    response = await client.post("/chat/completions", json=payload, timeout=timeout)
+            except httpx.TransportError as e:
+                LLM_ATTEMPTS.inc(status=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise LLMError(f"{type(e).__name__}: {e}", "transport") from e
+            else:
+                LLM_ATTEMPTS.inc(status=response.status_code)
+                if response.status_code == 200:
+                    try:
+                        return response.json()["choices"][0]["message"]["content"].strip()
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        raise LLMError(f"Malformed response: {e}", "malformed") from e
+                if response.status_code not in RETRYABLE_STATUS or attempt == self.max_retries:
+                    raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}", f"http_{response.status_code}")
+
+            await asyncio.sleep(self._backoff(attempt, response))
+
+        raise LLMError("retries exhausted", "retries_exhausted")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._semaphores = {}
+        self._loop = None
+
+
+llm_client = LLMClient()
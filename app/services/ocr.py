@@ -0,0 +1,159 @@
+"""Statement extraction behind a pluggable extractor.
+
+Extractors turn a spooled upload into an ExtractedReceipt. They are plain
+blocking code and only ever run from the extract job, off the request path.
+OCR_EXTRACTOR picks one:
+
+- gemini: Gemini vision, one call per image page (PDFs go up whole)
+- fake: deterministic drafts derived from the file's bytes, for tests and benchmarks
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Type
+from app.schemas.ingest import ExtractedReceipt, TransactionDraft
+
+OCR_EXTRACTOR = os.getenv("OCR_EXTRACTOR", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+logger = logging.getLogger(__name__)
+
+PROMPT = """Analyze this bank statement image and extract ALL transactions.
+
+For EACH transaction row, extract:
+1. Date (convert to YYYY-MM-DD format)
+2. Merchant/Description (clean name - remove prefixes like "Payroll Deposit -", "ATM Withdrawal -", "Web Bill Payment -")
+3. Amount (use the withdrawal/debit amount, ignore deposits unless specified)
+
+Return ONLY valid JSON with NO markdown or explanation:
+{"transactions": [{"date": "2003-10-14", "merchant": "HOTEL", "amount": 200.00, "currency": "USD"}]}
+
+IMPORTANT: Extract ALL transactions visible in the image (typically 10-20 entries)."""
+
+
+class ExtractionError(Exception):
+    """The extractor could not read the file; the job fails and is retried"""
+
+
+class StatementExtractor:
+    name = ""
+
+    def extract(self, path: str, content_type: Optional[str] = None) -> ExtractedReceipt:
+        raise NotImplementedError
+
+    def pages(self, path: str, content_type: Optional[str] = None) -> int:
+        return 1
+
+
+def parse_reply(content: str) -> ExtractedReceipt:
+    """Drafts from a model reply, tolerating a ```json fence around it"""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("```")[1]
+        if content.startswith("json"):
+            content = content[4:]
+        content = content.strip()
+    try:
+        return ExtractedReceipt(**json.loads(content))
+    except (ValueError, TypeError) as e:
+        raise ExtractionError(f"Unreadable extractor reply: {e}") from e
+
+
+class GeminiExtractor(StatementExtractor):
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = GEMINI_MODEL):
+        # Heavy SDK; only processes that actually extract pay for the import
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self._model = genai.GenerativeModel(model)
+
+    def _images(self, path: str):
+        from PIL import Image, ImageSequence
+        with Image.open(path) as image:
+            for frame in ImageSequence.Iterator(image):
+                yield frame.copy()
+
+    def pages(self, path: str, content_type: Optional[str] = None) -> int:
+        if content_type == "application/pdf":
+            return 1
+        from PIL import Image
+        with Image.open(path) as image:
+            return getattr(image, "n_frames", 1)
+
+    def _generate(self, part) -> ExtractedReceipt:
+        try:
+            response = self._model.generate_content([PROMPT, part])
+        except Exception as e:
+            raise ExtractionError(f"Gemini error: {e}") from e
+        logger.debug("Gemini response: %s...", response.text[:300])
+        return parse_reply(response.text)
+
+    def extract(self, path: str, content_type: Optional[str] = None) -> ExtractedReceipt:
+        if content_type == "application/pdf":
+            with open(path, "rb") as f:
+                return self._generate({"mime_type": content_type, "data": f.read()})
+
+        # Multi-page images (TIFF scans) go one page per call, keeping each reply small
+        drafts: List[TransactionDraft] = []
+        for page in self._images(path):
+            drafts.extend(self._generate(page).transactions)
+        return ExtractedReceipt(transactions=drafts)
+
+
+class FakeExtractor(StatementExtractor):
+    """Same bytes in, same drafts out; no network, no model"""
+    name = "fake"
+
+    MERCHANTS = ["Starbucks", "Amazon", "Netflix", "Uber", "Whole Foods", "Shell", "Target", "Spotify"]
+    START = date(2024, 1, 1)
+
+    def _digest(self, path: str) -> bytes:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.digest()
+
+    def pages(self, path: str, content_type: Optional[str] = None) -> int:
+        # One "page" per started MiB, so bigger uploads yield more rows
+        return max(1, -(-os.path.getsize(path) // (1 << 20)))
+
+    def extract(self, path: str, content_type: Optional[str] = None) -> ExtractedReceipt:
+        digest = self._digest(path)
+        drafts = []
+        for page in range(self.pages(path, content_type)):
+            seed = hashlib.sha256(digest + page.to_bytes(4, "big")).digest()
+            for i in range(4 + seed[0] % 9):
+                b = seed[i + 1:i + 4]
+                drafts.append(TransactionDraft(
+                    date=(self.START + timedelta(days=b[0] + page * 31)).isoformat(),
+                    merchant=self.MERCHANTS[b[1] % len(self.MERCHANTS)],
+                    amount=round(1 + (b[1] * 256 + b[2]) % 30000 / 100, 2)
+                ))
+        return ExtractedReceipt(transactions=drafts)
+
+
+EXTRACTORS: Dict[str, Type[StatementExtractor]] = {
+    GeminiExtractor.name: GeminiExtractor,
+    FakeExtractor.name: FakeExtractor,
+}
+
+_extractor: Optional[StatementExtractor] = None
+
+
+def get_extractor() -> StatementExtractor:
+    global _extractor
+    if _extractor is None:
+        if OCR_EXTRACTOR not in EXTRACTORS:
+            raise ValueError(f"Unknown OCR_EXTRACTOR {OCR_EXTRACTOR!r}; expected one of {sorted(EXTRACTORS)}")
+        _extractor = EXTRACTORS[OCR_EXTRACTOR]()
+    return _extractor
+
+
+def set_extractor(extractor: StatementExtractor):
+    """Swap the process-wide extractor (tests, benchmarks)"""
+    global _extractor
+    _extractor = extractor
@@ -1,121 +1,220 @@
+from sqlalchemy import delete, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from typing import List
-from collections import defaultdict
-from app.models.allmodels import Transaction, DetectedPattern
-from app.schemas.patterns import DetectedPatternCreate
+from sqlalchemy.orm.attributes import flag_modified
+from typing import Dict, List
+from app.models.allmodels import (
+    Transaction, DetectedPattern, PatternScanState, GeneratedQuestion, ReflectionSession
+)
+from app.services.columnar_engine import ScanResult, current_snapshot, detect, load_columns, visible_in, written_since
+from app.services.detectors import (
+    Detector, Found, IncrementalContext, config_fingerprint, enabled_detectors, record_detector_runs, timed
+)
+from app.services.pattern_rules import pattern_fingerprint
+from app.services.read_cache import mark_changed
+from datetime import datetime
 import uuid
-from datetime import timedelta
+
+
+def _reconcile(
+    db: Session,
+    user_uuid: uuid.UUID,
+    detector: Detector,
+    stored: List[DetectedPattern],
+    found: Found,
+    vanished: List[uuid.UUID]
+):
+    """Bring one detector's stored patterns in line with a fresh result for the same scope"""
+    for db_pat in stored:
+        entry = found.pop(db_pat.pattern_key, None)
+        if entry is None:
+            vanished.append(db_pat.id)
+        elif entry[0] != db_pat.details:
+            db_pat.details = entry[0]
+            db_pat.trigger_transaction_ids = entry[1](db_pat)
+    for key, (details, ids) in found.items():
+        db.add(DetectedPattern(
+            user_id=user_uuid,
+            pattern_code=detector.code,
+            pattern_key=key,
+            fingerprint=pattern_fingerprint(detector.code, key),
+            bias_mapping=detector.bias,
+            details=details,
+            trigger_transaction_ids=ids(None)
+        ))
+
+
+def invalidate_scan_state(db: Session, user_uuid: uuid.UUID):
+    """Drop the detector state so the next scan rebuilds from scratch.
+
+    Counters can only grow, so anything that removes or rewrites transactions must call this.
+    """
+    db.query(PatternScanState).filter(PatternScanState.user_id == user_uuid).delete()
+
+
+def delete_patterns(db: Session, *criteria):
+    """Delete matching patterns without breaking the rows that point at them (no commit).
+
+    Open questions about a vanished pattern go with it; answered questions and
+    reflections are kept as history with their pattern_id cleared.
+    """
+    doomed = select(DetectedPattern.id).where(*criteria).scalar_subquery()
+    no_sync = {"synchronize_session": False}
+    db.execute(delete(GeneratedQuestion).where(
+        GeneratedQuestion.pattern_id.in_(doomed), GeneratedQuestion.is_answered == False
+    ).execution_options(**no_sync))
+    db.execute(update(GeneratedQuestion).where(GeneratedQuestion.pattern_id.in_(doomed))
+               .values(pattern_id=None).execution_options(**no_sync))
+    db.execute(update(ReflectionSession).where(ReflectionSession.pattern_id.in_(doomed))
+               .values(pattern_id=None).execution_options(**no_sync))
+    db.execute(delete(DetectedPattern).where(*criteria))
+
+
+def save_scan_results(db: Session, results: List[ScanResult]) -> List[DetectedPattern]:
+    """Store full-scan results for one or many users (no commit).
+
+    Patterns are upserted on (user_id, fingerprint), so a pattern that survives a rescan
+    keeps its id, created_at and questions; only patterns that vanished are deleted.
+    Returns the stored patterns in scan order.
+    """
+    if not results:
+        return []
+    user_ids = [result.user_id for result in results]
+    now = datetime.utcnow()
+
+    pattern_rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": result.user_id,
+            "pattern_code": p.pattern_code,
+            "pattern_key": key,
+            "fingerprint": pattern_fingerprint(p.pattern_code, key),
+            "bias_mapping": p.bias_mapping,
+            "details": p.details,
+            "trigger_transaction_ids": p.trigger_transaction_ids,
+            "created_at": now
+        }
+        for result in results
+        for key, p in result.patterns
+    ]
+
+    kept = [(row["user_id"], row["fingerprint"]) for row in pattern_rows]
+    mark_changed(db, user_ids)
+    vanished = [DetectedPattern.user_id.in_(user_ids)]
+    if kept:
+        vanished.append(or_(
+            DetectedPattern.fingerprint.is_(None),
+            tuple_(DetectedPattern.user_id, DetectedPattern.fingerprint).not_in(kept)
+        ))
+    delete_patterns(db, *vanished)
+
+    saved = []
+    if pattern_rows:
+        stmt = pg_insert(DetectedPattern)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "fingerprint"],
+            set_={
+                "pattern_key": stmt.excluded.pattern_key,
+                "bias_mapping": stmt.excluded.bias_mapping,
+                "details": stmt.excluded.details,
+                "trigger_transaction_ids": stmt.excluded.trigger_transaction_ids
+            }
+        ).returning(DetectedPattern, sort_by_parameter_order=True)
+        saved = db.scalars(stmt, pattern_rows, execution_options={"populate_existing": True}).all()
+
+    stmt = pg_insert(PatternScanState).values([
+        {"user_id": result.user_id, "state": result.state, "snapshot": result.snapshot, "updated_at": now}
+        for result in results
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"state": stmt.excluded.state, "snapshot": stmt.excluded.snapshot, "updated_at": stmt.excluded.updated_at}
+    ))
+    return saved
+
 
 def run_pattern_scan(db: Session, user_id: str) -> List[DetectedPattern]:
+    """Full rescan: rebuild patterns and detector state from every verified transaction"""
     # Convert string to UUID for query
     try:
         user_uuid = uuid.UUID(user_id)
     except ValueError:
         return []
-    
-    txs = db.query(Transaction).filter(
-        Transaction.user_id == user_uuid, 
-        Transaction.verified == True
-    ).order_by(Transaction.date.asc()).all()
-    
-    if not txs:
+
+    cols = load_columns(db, [user_uuid])
+    result = detect(cols).get(user_uuid) or ScanResult(user_id=user_uuid, snapshot=cols.snapshot)
+    saved_patterns = save_scan_results(db, [result])
+    db.commit()
+    return saved_patterns
+
+
+def scan_users(db: Session, user_ids: List[uuid.UUID]) -> Dict[uuid.UUID, int]:
+    """Full rescan of many users from a single transaction query; returns pattern counts"""
+    cols = load_columns(db, user_ids)
+    detected = detect(cols)
+    results = [detected.get(user_id) or ScanResult(user_id=user_id, snapshot=cols.snapshot) for user_id in user_ids]
+    save_scan_results(db, results)
+    db.commit()
+    return {result.user_id: len(result.patterns) for result in results}
+
+
+def run_incremental_scan(db: Session, user_id: str) -> List[DetectedPattern]:
+    """Fold only transactions written since the last scan and upsert the patterns they touch.
+
+    "Since" is by commit, not by clock: the state records the snapshot it was read at,
+    and the next scan reads the rows whose writers that snapshot did not show as
+    committed. Falls back to a full scan when there is no state yet, the detector
+    config changed, or an older transaction changed.
+    """
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
         return []
 
-    new_patterns = []
-
-    # 1. Latte Factor (Small frequent purchases)
-    merchant_counts = defaultdict(list)
-    for tx in txs:
-        if tx.amount < 25.0:
-            merchant_counts[tx.merchant].append(tx)
-    
-    for merchant, merchant_txs in merchant_counts.items():
-        if len(merchant_txs) >= 3:
-            total_spent = sum(t.amount for t in merchant_txs)
-            new_patterns.append(DetectedPatternCreate(
-                pattern_code="LATTE_FACTOR",
-                bias_mapping="PRESENT_BIAS",
-                details={
-                    "merchant": merchant, 
-                    "count": len(merchant_txs), 
-                    "total_spent": total_spent,
-                    "avg_amount": total_spent/len(merchant_txs)
-                },
-                trigger_transaction_ids=[t.id for t in merchant_txs]
-            ))
-
-    # 2. Impulse Cluster (Crowded spending days)
-    date_counts = defaultdict(list)
-    for tx in txs:
-        date_counts[tx.date].append(tx)
-        
-    for date_obj, day_txs in date_counts.items():
-        if len(day_txs) >= 4:
-            new_patterns.append(DetectedPatternCreate(
-                pattern_code="IMPULSE_CLUSTER",
-                bias_mapping="EMOTIONAL_SPENDING", 
-                details={
-                    "date": str(date_obj), 
-                    "count": len(day_txs), 
-                    "total_spent": sum(t.amount for t in day_txs)
-                },
-                trigger_transaction_ids=[t.id for t in day_txs]
-            ))
-
-    # 3. Big Splurge (High value single purchase)
-    for tx in txs:
-        if tx.amount > 150.0 and tx.category in ["Shopping", "Entertainment", "Electronics"]:
-            new_patterns.append(DetectedPatternCreate(
-                pattern_code="BIG_SPLURGE",
-                bias_mapping="ANCHORING", # Often result of sales/anchoring
-                details={
-                    "merchant": tx.merchant,
-                    "amount": tx.amount,
-                    "date": str(tx.date)
-                },
-                trigger_transaction_ids=[tx.id]
-            ))
-
-    # 4. Subscription Trap (Recurring amounts)
-    # Group by (Merchant, Amount)
-    sub_counts = defaultdict(list)
-    for tx in txs:
-        sub_counts[(tx.merchant, tx.amount)].append(tx)
-    
-    for (merch, amt), sub_txs in sub_counts.items():
-        if len(sub_txs) >= 2 and amt > 10.0:
-            # Check if dates are somewhat spaced (e.g. > 20 days) for monthly
-            # For demo, just recurrence is enough
-            new_patterns.append(DetectedPatternCreate(
-                pattern_code="SUBSCRIPTION_TRAP",
-                bias_mapping="SUNK_COST",
-                details={
-                    "merchant": merch,
-                    "amount": amt,
-                    "frequency": "recurring"
-                },
-                trigger_transaction_ids=[t.id for t in sub_txs]
-            ))
-
-    # Clear old patterns (Simpler for demo than deduplication)
-    db.query(DetectedPattern).filter(DetectedPattern.user_id == user_uuid).delete()
-    db.flush()
-
-    # Save patterns
-    saved_patterns = []
-    for p in new_patterns:
-        db_pat = DetectedPattern(
-            user_id=user_uuid,
-            pattern_code=p.pattern_code,
-            bias_mapping=p.bias_mapping,
-            details=p.details,
-            trigger_transaction_ids=p.trigger_transaction_ids
-        )
-        db.add(db_pat)
-        saved_patterns.append(db_pat)
-    
+    # Locked, so two scans of one user can't both fold the same rows
+    scan_state = db.query(PatternScanState).filter(PatternScanState.user_id == user_uuid).with_for_update().first()
+    # Counters built under other thresholds (or before detectors were configurable) are stale
+    if not scan_state or scan_state.snapshot is None or scan_state.state.get("config") != config_fingerprint():
+        return run_pattern_scan(db, user_id)
+
+    last = scan_state.snapshot
+    snapshot = current_snapshot(db)
+    changed = db.query(Transaction, visible_in(last, Transaction.created_xid)).filter(
+        Transaction.user_id == user_uuid,
+        written_since(last, Transaction.change_xid),
+        # Writers still running now are left for the next scan
+        visible_in(snapshot, Transaction.change_xid)
+    ).order_by(Transaction.date.asc()).all()
+
+    # An edited (or newly verified, or unverified) old row may have moved between buckets
+    if any(existed for _, existed in changed):
+        return run_pattern_scan(db, user_id)
+
+    txs = [tx for tx, _ in changed if tx.verified]
+    runs = []
+    if txs:
+        state = scan_state.state
+        ctx = IncrementalContext(db, user_uuid, state, txs)
+        vanished = []
+        for detector in enabled_detectors():
+            def run(detector=detector):
+                stored, found, rows = detector.incremental(ctx)
+                patterns = len(found)
+                _reconcile(db, user_uuid, detector, stored, found, vanished)
+                return rows, patterns
+            runs.append(timed(detector, "incremental", run))
+
+        if vanished:
+            delete_patterns(db, DetectedPattern.id.in_(vanished))
+        scan_state.state = state
+        flag_modified(scan_state, "state")
+        mark_changed(db, [user_uuid])
+    if changed:
+        # Unverified drafts are skipped, but they needn't be read again either
+        scan_state.snapshot = snapshot
     db.commit()
-    for pat in saved_patterns:
-        db.refresh(pat)
-    
-    return saved_patterns
\ No newline at end of file
+    record_detector_runs(runs)
+
+    return db.query(DetectedPattern).filter(
+        DetectedPattern.user_id == user_uuid
+    ).order_by(DetectedPattern.created_at.asc()).all()
@@ -0,0 +1,25 @@
+"""Scan state layout and pattern identity shared by the full and incremental scans.
+
+Thresholds live with each detector; see app/services/detectors.py.
+"""
+from typing import Dict
+import hashlib
+import json
+
+
+def empty_state() -> Dict:
+    # Only counters are kept; trigger ids live on the DetectedPattern rows. Per-day
+    # counts aren't stored: IMPULSE_CLUSTER windows over the daily_spend rollup, and
+    # SUBSCRIPTION_TRAP re-reads the touched merchants' charges. "config" records the
+    # detector config the counters were built under (detectors.config_fingerprint).
+    return {"merchants": {}, "config": None}
+
+
+def subscription_key(merchant: str, cadence: str, amount: float) -> str:
+    # amount is the first charge in the bucket, which stays put as new charges arrive
+    return json.dumps([merchant, cadence, amount])
+
+
+def pattern_fingerprint(pattern_code: str, pattern_key: str) -> str:
+    """Stable identity of a pattern within a user; migration 4 computes the same value in SQL"""
+    return hashlib.sha256(f"{pattern_code}|{pattern_key}".encode("utf-8")).hexdigest()
@@ -1,9 +1,13 @@
-import os
 from typing import Dict
 import json
-import requests
+import logging
+from app.services.llm_client import llm_client, LLMError, LLM_GENERATIONS
+from app.services.llm_cache import llm_cache, cache_key
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+# Bump whenever the prompt below changes so cached replies are not reused
+PROMPT_VERSION = "1"
+
+logger = logging.getLogger(__name__)
 
 class QuestionGenerator:
     """Generates Socratic questions that provoke reflection, NOT advice"""
@@ -17,7 +21,7 @@ class QuestionGenerator:
         "why don't you"
     ]
     
-    def generate_question(
+    async def generate_question(
         self, 
         pattern_code: str,
         bias_name: str,
@@ -56,36 +60,26 @@ GOOD QUESTION TYPES:
 
 Generate ONE question (return ONLY the question, no preamble):"""
         
+        key = cache_key(
+            "question", llm_client.model, PROMPT_VERSION,
+            concept_context.get("id"), pattern_details, pattern_code, bias_name
+        )
         try:
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "llama-3.3-70b-versatile",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.7,
-                    "max_tokens": 150
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                question = response.json()["choices"][0]["message"]["content"].strip().strip('"')
-                
-                for forbidden in self.FORBIDDEN_PATTERNS:
-                    if forbidden in question.lower():
-                        return self._template_fallback(pattern_code, pattern_details)
-                
-                return question
-            else:
-                return self._template_fallback(pattern_code, pattern_details)
-                
-        except Exception as e:
-            print(f"Groq API error: {e}")
+            question = (await llm_cache.get_or_compute(
+                key, "question", lambda: llm_client.chat(prompt, timeout=30)
+            )).strip('"')
+        except LLMError as e:
+            logger.warning("Groq API error: %s", e)
+            LLM_GENERATIONS.inc(kind="question", source="fallback_llm_error")
             return self._template_fallback(pattern_code, pattern_details)
+        
+        for forbidden in self.FORBIDDEN_PATTERNS:
+            if forbidden in question.lower():
+                LLM_GENERATIONS.inc(kind="question", source="fallback_forbidden_phrase")
+                return self._template_fallback(pattern_code, pattern_details)
+        
+        LLM_GENERATIONS.inc(kind="question", source="llm")
+        return question
     
     def _template_fallback(self, pattern_code: str, details: Dict) -> str:
         """Deterministic fallback if LLM gives advice"""
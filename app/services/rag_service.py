@@ -1,50 +1,29 @@
 import json
-import os
-import requests
-from typing import Dict
+import logging
+from typing import Dict, List, Tuple
 from sqlalchemy.orm import Session
+from app.services.concepts import retrieve_concepts
+from app.services.llm_client import llm_client, LLMError, LLM_GENERATIONS
+from app.services.llm_cache import llm_cache, cache_key
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+# Bump whenever the explanation prompt changes so cached replies are not reused
+PROMPT_VERSION = "1"
 
-# Static concept definitions as fallback/context
-CONCEPTS_DB = {
-    "PRESENT_BIAS": {
-        "id": "present_bias",
-        "title": "Present Bias",
-        "definition": "Overvaluing immediate rewards at the expense of long-term goals."
-    },
-    "EMOTIONAL_SPENDING": {
-        "id": "emotional_spending",
-        "title": "Emotional Spending",
-        "definition": "Using spending to manage emotions rather than for utility."
-    },
-    "ANCHORING": {
-        "id": "anchoring",
-        "title": "Anchoring Bias",
-        "definition": "Relying too heavily on the first piece of information (like a sale price)."
-    },
-    "SUNK_COST": {
-        "id": "sunk_cost",
-        "title": "Sunk Cost Fallacy",
-        "definition": "Continuing to pay for something because of past investment, not future value."
-    }
-}
+logger = logging.getLogger(__name__)
 
 class RAGService:
     def __init__(self):
         pass
     
     def retrieve_relevant_concept(self, db: Session, bias_mapping: str, pattern_details: Dict) -> Dict:
-        """Find best matching concept for a detected pattern"""
-        # Simple lookup for now since we have a direct mapping
-        # bias_mapping from pattern_engine matches keys in CONCEPTS_DB
-        return CONCEPTS_DB.get(bias_mapping, {
-            "id": "unknown", 
-            "title": bias_mapping, 
-            "definition": "A financial behavioral pattern."
-        })
+        """Find best matching concept for a detected pattern (semantic search, see app.services.concepts)"""
+        return retrieve_concepts(db, [(bias_mapping, pattern_details)])[0]
 
-    def get_explanation(self, concept: Dict, pattern_details: Dict) -> str:
+    def retrieve_many(self, db: Session, patterns: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Concepts for many (bias_mapping, details) pairs with one embedding batch and one search"""
+        return retrieve_concepts(db, patterns)
+
+    async def get_explanation(self, concept: Dict, pattern_details: Dict) -> str:
         """Generate personalized explanation using Groq"""
         
         prompt = f"""You are a friendly financial coach.
@@ -59,33 +38,20 @@ Task: Write a 2-sentence explanation for the user about why this pattern matters
 - Do NOT use markdown.
 """
 
-        try:
-            if not GROQ_API_KEY:
-                return f"{concept['title']}: {concept['definition']} (AI unavailable)"
+        if not llm_client.configured:
+            LLM_GENERATIONS.inc(kind="explanation", source="fallback_unconfigured")
+            return f"{concept['title']}: {concept['definition']} (AI unavailable)"
 
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "llama-3.3-70b-versatile",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.7,
-                    "max_tokens": 150
-                },
-                timeout=10
+        key = cache_key("explanation", llm_client.model, PROMPT_VERSION, concept.get("id"), pattern_details)
+        try:
+            explanation = await llm_cache.get_or_compute(
+                key, "explanation", lambda: llm_client.chat(prompt, timeout=10)
             )
-            
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"].strip()
-            else:
-                print(f"Groq Error: {response.text}")
-                return f"{concept['title']}: {concept['definition']}"
-                
-        except Exception as e:
-            print(f"RAG Error: {e}")
+        except LLMError as e:
+            logger.warning("RAG Error: %s", e)
+            LLM_GENERATIONS.inc(kind="explanation", source="fallback_llm_error")
             return f"{concept['title']}: {concept['definition']}"
+        LLM_GENERATIONS.inc(kind="explanation", source="llm")
+        return explanation
 
 rag_service = RAGService()
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""Per-user read cache for the dashboard's polled endpoints, with ETags.
+
+Every user has a version number in each process. Cached responses are stored under the
+version they were read at. Anything that changes what those endpoints return calls
+mark_changed() inside its transaction. On commit the version moves on:
+- locally, through a session after_commit hook
+- in every other process (API workers, the job worker), through a Postgres NOTIFY,
+  which is only delivered once the transaction commits
+
+ETags are a hash of the response itself, so every process (uvicorn --workers N) hands out
+the same tag for the same content, and a tag stays valid across restarts. A request whose
+If-None-Match matches a cached response gets a 304 with no DB work; on a miss the view is
+loaded and compared, which still saves sending the body.
+Each process keeps a LISTEN connection open (ReadCacheListener) and only caches while it
+is connected. Whenever it connects, it forgets everything, since it may have missed
+notifications.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.core.metrics import REGISTRY
+
+READ_CACHE_ENABLED = os.getenv("READ_CACHE_ENABLED", "true").lower() == "true"
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "4096"))
+READ_CACHE_MAX_BYTES = int(os.getenv("READ_CACHE_MAX_MB", "64")) * 1024 * 1024
+READ_CACHE_CHANNEL = "budge_read_cache"
+# User ids per NOTIFY; payloads are capped at 8000 bytes
+NOTIFY_BATCH_SIZE = 200
+LISTEN_PING_SECONDS = 10.0
+LISTEN_RETRY_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = REGISTRY.counter(
+    "budge_read_cache_requests_total", "Cached read lookups by view and outcome", ["view", "outcome"]
+)
+
+Compute = Callable[[Dict[str, str]], Awaitable[Any]]
+
+
+class ReadCache:
+    """LRU of serialized responses keyed by (user, view), bounded by entry count and bytes"""
+
+    def __init__(self, max_entries: int = READ_CACHE_MAX_ENTRIES, max_bytes: int = READ_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # One oversized page shouldn't be able to flush everything else
+        self.max_entry_bytes = max_bytes // 16
+        self.listening = False
+        self._clock = count(1)
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._entries: "OrderedDict[Tuple[str, tuple], tuple]" = OrderedDict()  # -> (version, body, headers, etag)
+        self._by_user: Dict[str, Set[tuple]] = {}
+        self._bytes = 0
+        self.evictions = 0
+
+    def version(self, user_id: str) -> int:
+        version = self._versions.get(user_id)
+        if version is None:
+            # Fresh numbers come from one clock, so a forgotten user never reuses an old version
+            version = self._versions[user_id] = next(self._clock)
+            while len(self._versions) > 4 * self.max_entries:
+                self._versions.popitem(last=False)
+        self._versions.move_to_end(user_id)
+        return version
+
+    def bump(self, user_ids: Iterable[str]):
+        for user_id in user_ids:
+            if user_id in self._versions:
+                self._versions[user_id] = next(self._clock)
+            for key in list(self._by_user.get(user_id, ())):
+                self._drop(key)
+
+    def reset(self, listening: Optional[bool] = None):
+        """Forget every entry and version"""
+        if listening is not None:
+            self.listening = listening
+        self._versions.clear()
+        self._entries.clear()
+        self._by_user.clear()
+        self._bytes = 0
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def _get(self, key: tuple, version: int) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: tuple, version: int, body: bytes, headers: Dict[str, str], etag: str):
+        if len(body) > self.max_entry_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (version, body, headers, etag)
+        self._by_user.setdefault(key[0], set()).add(key)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def respond(self, request: Request, user_id, view: tuple, compute: Compute, adapter: TypeAdapter) -> Response:
+        """JSON response for one user's view, from cache when the user hasn't changed since.
+
+        `compute(headers)` loads the content (and may add response headers). It runs
+        only on a miss; `adapter` serializes what it returns.
+        """
+        name = view[0]
+        if not (READ_CACHE_ENABLED and self.listening):
+            REQUESTS.inc(view=name, outcome="bypass")
+            headers: Dict[str, str] = {}
+            body = _dump(adapter, await compute(headers))
+            return _validated(request, body, headers, etag(body, headers))
+
+        user_id = str(user_id)
+        version = self.version(user_id)
+        key = (user_id, view)
+        entry = self._get(key, version)
+        if entry is not None:
+            _, body, headers, tag = entry
+            if tag in _if_none_match(request):
+                REQUESTS.inc(view=name, outcome="not_modified")
+            else:
+                REQUESTS.inc(view=name, outcome="hit")
+            return _validated(request, body, headers, tag)
+
+        REQUESTS.inc(view=name, outcome="miss")
+        headers = {}
+        body = _dump(adapter, await compute(headers))
+        tag = etag(body, headers)
+        # Read at `version`; if a write committed meanwhile, the result may already be stale
+        if self._versions.get(user_id) == version:
+            self._put(key, version, body, headers, tag)
+        return _validated(request, body, headers, tag)
+
+    def stats(self) -> Dict:
+        outcomes: Dict[str, float] = {}
+        for (_, outcome), value in REQUESTS.values().items():
+            outcomes[outcome] = outcomes.get(outcome, 0) + value
+        return {
+            "enabled": READ_CACHE_ENABLED,
+            "listening": self.listening,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "users": len(self._by_user),
+            "evictions": self.evictions,
+            "requests": outcomes
+        }
+
+
+def _dump(adapter: TypeAdapter, content: Any) -> bytes:
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+
+def etag(body: bytes, headers: Dict[str, str]) -> str:
+    """Strong validator for a response: the same content gets the same tag in every process"""
+    digest = hashlib.sha256(body)
+    for name, value in sorted(headers.items()):
+        digest.update(f"\n{name}: {value}".encode())
+    return '"' + digest.hexdigest()[:32] + '"'
+
+
+def _validated(request: Request, body: bytes, headers: Dict[str, str], tag: str) -> Response:
+    """The response, or a 304 if the client already holds this exact content"""
+    validators = {"ETag": tag, "Cache-Control": "private, no-cache"}
+    if tag in _if_none_match(request):
+        return Response(status_code=304, headers=validators)
+    return Response(body, media_type="application/json", headers={**headers, **validators})
+
+
+def _if_none_match(request: Request) -> Set[str]:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return set()
+    # Weak comparison: proxies may have weakened our tags on the way back
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+read_cache = ReadCache()
+REGISTRY.gauge("budge_read_cache_entries", "Responses held in the read cache").set_function(
+    lambda: len(read_cache._entries)
+)
+REGISTRY.gauge("budge_read_cache_bytes", "Bytes of response bodies held in the read cache").set_function(
+    lambda: read_cache._bytes
+)
+
+_PENDING = "read_cache_users"
+
+
+def mark_changed(db: Session, user_ids: Iterable):
+    """Invalidate these users' cached reads once the current transaction commits (no commit).
+
+    Sync Session; async callers go through `await db.run_sync(mark_changed, ids)`.
+    """
+    ids = sorted({str(user_id) for user_id in user_ids})
+    if not ids:
+        return
+    db.info.setdefault(_PENDING, set()).update(ids)
+    for start in range(0, len(ids), NOTIFY_BATCH_SIZE):
+        db.execute(select(func.pg_notify(READ_CACHE_CHANNEL, ",".join(ids[start:start + NOTIFY_BATCH_SIZE]))))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed(session: Session):
+    # Don't wait for our own NOTIFY to come back: the writer's next read must see the write
+    user_ids = session.info.pop(_PENDING, None)
+    if user_ids:
+        read_cache.bump(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session: Session):
+    session.info.pop(_PENDING, None)
+
+
+class ReadCacheListener:
+    """Holds a LISTEN connection (outside the pool) that applies other processes' bumps"""
+
+    def __init__(self, cache: ReadCache = read_cache, database_url: Optional[str] = None):
+        self.cache = cache
+        self.database_url = database_url
+        self._task: Optional[asyncio.Task] = None
+
+    def _dsn(self) -> str:
+        if self.database_url:
+            return self.database_url
+        from app.core.config import settings
+        return make_url(settings.ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        self.cache.bump(payload.split(","))
+
+    async def _listen(self):
+        import asyncpg
+
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self._dsn())
+                await conn.add_listener(READ_CACHE_CHANNEL, self._on_notify)
+                self.cache.reset(listening=True)
+                logger.info("Read cache listening on %s", READ_CACHE_CHANNEL)
+                while True:
+                    await asyncio.sleep(LISTEN_PING_SECONDS)
+                    await conn.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Read cache listener lost its connection: %s", e)
+            finally:
+                self.cache.reset(listening=False)
+                if conn is not None:
+                    try:
+                        await conn.close(timeout=2)
+                    except Exception:
+                        pass
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+
+    def start(self):
+        if READ_CACHE_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
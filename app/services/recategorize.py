@@ -0,0 +1,66 @@
+"""Re-run the merchant categorizer over stored transactions.
+
+Transactions are walked in id order, one keyset chunk at a time. Each chunk
+categorizes its distinct merchants once and applies the result with a single
+`UPDATE ... FROM (VALUES ...)`, so the cost per chunk is one read and one write.
+"""
+import os
+import uuid
+from datetime import datetime
+from typing import Optional, Set, Tuple
+from sqlalchemy import String, column, or_, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.allmodels import Transaction
+from app.services.categorizer import DEFAULT_CATEGORY, get_categorizer
+
+RECATEGORIZE_CHUNK_SIZE = int(os.getenv("RECATEGORIZE_CHUNK_SIZE", "5000"))
+
+
+async def recategorize_chunk(
+    db: AsyncSession,
+    after: Optional[uuid.UUID],
+    limit: int = RECATEGORIZE_CHUNK_SIZE,
+    overwrite: bool = False
+) -> Tuple[Optional[uuid.UUID], int, int, Set[uuid.UUID]]:
+    """Recategorize the next `limit` transactions with id > after (no commit).
+
+    Returns (last id seen or None when finished, rows scanned, rows changed, affected user ids).
+    Unless `overwrite` is set, only rows whose category is empty or one the rules
+    can produce are touched, so categories entered by hand or by OCR survive.
+    """
+    query = select(Transaction.id, Transaction.merchant).order_by(Transaction.id).limit(limit)
+    if after is not None:
+        query = query.where(Transaction.id > after)
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return None, 0, 0, set()
+
+    last_id = rows[-1].id
+    merchants = list({row.merchant for row in rows if row.merchant is not None})
+    if not merchants:
+        return last_id, len(rows), 0, set()
+
+    categorizer = get_categorizer()
+    mapping = values(
+        column("merchant", String), column("category", String), name="recategorized"
+    ).data(list(zip(merchants, categorizer.categorize_many(merchants))))
+
+    stmt = update(Transaction).where(
+        Transaction.id <= last_id,
+        Transaction.merchant == mapping.c.merchant,
+        Transaction.category.is_distinct_from(mapping.c.category)
+    )
+    if after is not None:
+        stmt = stmt.where(Transaction.id > after)
+    if not overwrite:
+        stmt = stmt.where(or_(
+            Transaction.category.is_(None),
+            Transaction.category.in_([*categorizer.categories, DEFAULT_CATEGORY])
+        ))
+
+    changed = (await db.execute(
+        stmt.values(category=mapping.c.category, updated_at=datetime.utcnow())
+        .returning(Transaction.user_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    return last_id, len(rows), len(changed), set(changed)
@@ -0,0 +1,84 @@
+"""Recurring-charge detection shared by the columnar and incremental pattern engines.
+
+A merchant's charges are bucketed by amount: after sorting, neighbouring amounts
+within tolerance share a bucket. Each bucket's charge days are then sorted and
+its inter-arrival intervals checked against the weekly / monthly / annual
+cadences. Everything is a sort plus a few vector ops, so a merchant with k
+charges costs O(k log k). Thresholds come from the SUBSCRIPTION_TRAP detector's
+config (see detectors.SubscriptionTrap.defaults).
+"""
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.pattern_rules import subscription_key
+
+
+def amount_buckets(amounts: np.ndarray, config: Dict) -> List[np.ndarray]:
+    """Positions of `amounts` grouped into buckets of near-equal amounts"""
+    order = np.argsort(amounts, kind="stable")
+    ordered = amounts[order]
+    tolerance = np.maximum(config["amount_tolerance"], config["amount_tolerance_pct"] * ordered[:-1])
+    breaks = np.flatnonzero(np.diff(ordered) > tolerance) + 1
+    return np.split(order, breaks)
+
+
+def min_charges(config: Dict) -> int:
+    return min(cadence[3] for cadence in config["cadences"])
+
+
+def cadence(days: np.ndarray, config: Dict) -> Optional[Tuple[str, float]]:
+    """(cadence name, median interval in days) for sorted charge days, or None if irregular.
+
+    Several charges on one day count once, so a double charge doesn't break the rhythm.
+    """
+    charge_days = np.unique(days.astype("datetime64[D]").astype(np.int64))
+    if len(charge_days) < min_charges(config):
+        return None
+    intervals = np.diff(charge_days)
+    median = float(np.median(intervals))
+
+    for name, period, tolerance, min_count in config["cadences"]:
+        if len(charge_days) < min_count or abs(median - period) > tolerance:
+            continue
+        if np.mean(np.abs(intervals - period) <= tolerance) >= config["min_regularity"]:
+            return name, median
+    return None
+
+
+def find_subscriptions(
+    merchant: str, days: np.ndarray, amounts: np.ndarray, config: Dict
+) -> List[Tuple[str, Dict, np.ndarray]]:
+    """Recurring charges among one merchant's transactions.
+
+    Returns (pattern_key, details, positions) per subscription, with positions into the
+    inputs in date order.
+    """
+    found = []
+    min_count = min_charges(config)
+    if len(amounts) < min_count:
+        return found
+
+    for bucket in amount_buckets(amounts, config):
+        if len(bucket) < min_count:
+            continue
+        # Date order, ties by amount, so both engines agree on the bucket's first charge
+        bucket = bucket[np.lexsort((amounts[bucket], days[bucket]))]
+        amount = float(np.median(amounts[bucket]))
+        if amount <= config["min_amount"]:
+            continue
+        match = cadence(days[bucket], config)
+        if match is None:
+            continue
+
+        name, interval = match
+        last = days[bucket[-1]].astype("datetime64[D]")
+        found.append((subscription_key(merchant, name, float(amounts[bucket[0]])), {
+            "merchant": merchant,
+            "amount": round(amount, 2),
+            "frequency": name,
+            "interval_days": round(interval, 1),
+            "count": len(bucket),
+            "total_spent": float(amounts[bucket].sum()),
+            "last_charged": str(last),
+            "next_expected": str(last + np.timedelta64(int(round(interval)), "D"))
+        }, bucket))
+    return found
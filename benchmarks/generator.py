@@ -0,0 +1,252 @@
+"""Synthetic transaction histories with production-like shape.
+
+- Transactions per user are heavy-tailed (lognormal), so a few users own long histories.
+- Merchants are drawn from a weighted catalog of real-looking names plus a
+  Zipf-distributed long tail of local merchants (what stresses the categorizer cache).
+- Amounts are lognormal around each merchant's typical ticket.
+- Dates lean towards weekends. Each user has a few fixed-price monthly
+  subscriptions and the odd shopping spree day, so every detector has something to find.
+
+Everything is seeded, so the same arguments always produce the same data.
+
+    python -m benchmarks.generator --users 1000 --transactions 1000000 --load
+    python -m benchmarks.generator --users 50 --transactions 10000 --csv /tmp/tx.csv
+
+--load COPYs into DATABASE_URL (migrations are applied first); 10M rows stream
+through in chunks, so memory stays flat. Ids are seeded too, so loading the same
+seed twice needs --truncate (or another --seed).
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Tuple
+import numpy as np
+
+# (merchant, weight, median amount, lognormal sigma)
+CATALOG = [
+    ("Starbucks", 9.0, 5.5, 0.25),
+    ("Dunkin", 4.0, 4.2, 0.3),
+    ("Cafe Coffee Day", 3.0, 4.5, 0.3),
+    ("McDonalds", 4.0, 9.0, 0.4),
+    ("Pizza Hut", 2.0, 22.0, 0.35),
+    ("Blue Door Restaurant", 2.0, 38.0, 0.5),
+    ("Uber", 5.0, 18.0, 0.5),
+    ("Lyft", 2.0, 16.0, 0.5),
+    ("Shell", 3.0, 45.0, 0.3),
+    ("Metro Transit", 2.0, 2.75, 0.1),
+    ("City Parking", 1.0, 12.0, 0.4),
+    ("Amazon", 7.0, 35.0, 0.9),
+    ("Walmart", 4.0, 55.0, 0.7),
+    ("Target", 3.0, 48.0, 0.7),
+    ("Flipkart", 1.0, 60.0, 0.8),
+    ("Myntra", 1.0, 70.0, 0.7),
+    ("Electronics Store", 0.5, 320.0, 0.8),
+    ("BookMyShow", 1.0, 25.0, 0.4),
+    ("Cinema City", 1.0, 30.0, 0.3),
+    ("Steam Games", 0.5, 20.0, 0.6),
+    ("Whole Foods", 4.0, 65.0, 0.5),
+    ("Trader Joes", 3.0, 45.0, 0.5),
+    ("Grocery Outlet", 2.0, 40.0, 0.5),
+    ("Farmers Market", 1.0, 25.0, 0.5),
+]
+# (merchant, monthly amount)
+SUBSCRIPTIONS = [
+    ("Netflix", 15.49), ("Spotify", 10.99), ("Hulu", 17.99), ("Comcast Internet", 79.99),
+    ("City Water Utility", 42.0), ("Electric Bill", 96.0), ("Gym Membership", 39.99), ("Rent", 1850.0),
+]
+SPREE_MERCHANTS = ["Amazon", "Myntra", "Flipkart", "Target", "BookMyShow", "Electronics Store"]
+
+
+@dataclass
+class GeneratorConfig:
+    users: int = 100
+    transactions: int = 100_000
+    days: int = 365
+    end: date = field(default_factory=date.today)
+    seed: int = 0
+    tail_merchants: int = 5000
+    tail_share: float = 0.25      # share of everyday purchases at long-tail merchants
+    spree_share: float = 0.03     # share of purchases moved onto spree days
+    users_per_chunk: int = 200
+
+
+Row = Tuple[uuid.UUID, uuid.UUID, date, str, float]  # (user_id, id, date, merchant, amount)
+
+
+def _uuids(rng: np.random.Generator, n: int) -> List[uuid.UUID]:
+    raw = rng.bytes(16 * n)
+    return [uuid.UUID(bytes=raw[i:i + 16], version=4) for i in range(0, 16 * n, 16)]
+
+
+def user_sizes(config: GeneratorConfig, rng: np.random.Generator) -> np.ndarray:
+    """Transactions per user: lognormal shares summing exactly to config.transactions"""
+    shares = rng.lognormal(0.0, 1.0, config.users)
+    sizes = np.maximum(1, np.floor(shares / shares.sum() * config.transactions)).astype(np.int64)
+    # Hand the rounding remainder to the heaviest users
+    remainder = config.transactions - int(sizes.sum())
+    order = np.argsort(-shares)
+    if remainder > 0:
+        sizes[order[:remainder % config.users]] += 1
+        sizes += remainder // config.users
+    elif remainder < 0:
+        for i in order:
+            take = min(-remainder, int(sizes[i]) - 1)
+            sizes[i] -= take
+            remainder += take
+            if remainder == 0:
+                break
+    return sizes
+
+
+def _user_rows(config: GeneratorConfig, rng: np.random.Generator, user_id: uuid.UUID, size: int,
+               tail_names: np.ndarray, tail_p: np.ndarray) -> List[Row]:
+    start = config.end - timedelta(days=config.days - 1)
+    merchants: List[str] = []
+    amounts: List[float] = []
+    offsets: List[int] = []
+
+    # Subscriptions: a fixed day of month, every month of the window, at most half the user's rows
+    months = -(-config.days // 30)
+    n_subs = min(int(rng.integers(1, 5)), size // (2 * months))
+    for sub in rng.choice(len(SUBSCRIPTIONS), n_subs, replace=False).tolist():
+        name, price = SUBSCRIPTIONS[sub]
+        for offset in range(int(rng.integers(0, 28)), config.days, 30):
+            merchants.append(name)
+            amounts.append(price)
+            offsets.append(offset)
+
+    n = max(0, size - len(merchants))
+    if n:
+        weights = np.array([c[1] for c in CATALOG])
+        from_tail = rng.random(n) < config.tail_share
+        picks = rng.choice(len(CATALOG), n, p=weights / weights.sum())
+        tail_picks = rng.choice(len(tail_names), n, p=tail_p)
+        medians = np.array([c[2] for c in CATALOG])[picks]
+        sigmas = np.array([c[3] for c in CATALOG])[picks]
+        everyday = np.round(rng.lognormal(np.log(medians), sigmas), 2)
+        tail_amounts = np.round(rng.lognormal(np.log(25.0), 1.0, n), 2)
+
+        # Weekends get ~40% more purchases
+        day_weights = np.where((start.weekday() + np.arange(config.days)) % 7 >= 5, 1.4, 1.0)
+        days = rng.choice(config.days, n, p=day_weights / day_weights.sum())
+
+        # A few spree days soak up a small share of purchases at shopping merchants
+        spree = rng.random(n) < config.spree_share
+        spree_days = rng.choice(config.days, max(1, n // 400 + 1))
+        days[spree] = rng.choice(spree_days, int(spree.sum()))
+        spree_amounts = np.round(rng.lognormal(np.log(60.0), 0.7, n), 2)
+
+        names = np.array([c[0] for c in CATALOG], dtype=object)[picks]
+        names[from_tail] = tail_names[tail_picks[from_tail]]
+        names[spree] = np.array(SPREE_MERCHANTS, dtype=object)[picks[spree] % len(SPREE_MERCHANTS)]
+        spent = np.where(spree, spree_amounts, np.where(from_tail, tail_amounts, everyday))
+        merchants.extend(names.tolist())
+        amounts.extend(np.maximum(spent, 0.5).tolist())
+        offsets.extend(days.tolist())
+
+    order = np.argsort(np.array(offsets), kind="stable").tolist()
+    ids = _uuids(rng, len(order))
+    return [
+        (user_id, ids[k], start + timedelta(days=offsets[i]), merchants[i], amounts[i])
+        for k, i in enumerate(order)
+    ]
+
+
+def generate(config: GeneratorConfig) -> Iterator[List[Row]]:
+    """Chunks of rows, each covering whole users in (user, date) order"""
+    rng = np.random.default_rng(config.seed)
+    sizes = user_sizes(config, rng)
+    user_ids = _uuids(rng, config.users)
+    tail_names = np.array([f"Local Merchant {k:05d}" for k in range(config.tail_merchants)], dtype=object)
+    tail_p = 1.0 / np.arange(1, config.tail_merchants + 1) ** 1.1
+    tail_p /= tail_p.sum()
+
+    for lo in range(0, config.users, config.users_per_chunk):
+        chunk: List[Row] = []
+        for user_id, size in zip(user_ids[lo:lo + config.users_per_chunk], sizes[lo:lo + config.users_per_chunk].tolist()):
+            chunk.extend(_user_rows(config, rng, user_id, size, tail_names, tail_p))
+        yield chunk
+
+
+def column_rows(chunk: List[Row]) -> List[tuple]:
+    """Rows in app.services.columnar_engine.COLUMNS order, for from_rows"""
+    return [(u, i, d, m, a, None) for u, i, d, m, a in chunk]
+
+
+def load(config: GeneratorConfig, truncate: bool = False) -> Tuple[int, float]:
+    """COPY generated users and verified transactions into DATABASE_URL; returns (rows, seconds)"""
+    from app.db.migrations import migrate
+    from app.db.session import get_engine
+    from app.services.categorizer import categorize_many
+    from psycopg2.extras import execute_values
+
+    migrate()
+    engine = get_engine()
+    started = time.perf_counter()
+    rows = 0
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        if truncate:
+            cursor.execute("TRUNCATE transactions, daily_spend, detected_patterns, pattern_scan_states CASCADE")
+        now = datetime.utcnow().isoformat(sep=" ")
+        for chunk in generate(config):
+            execute_values(
+                cursor, "INSERT INTO users (id, email) VALUES %s ON CONFLICT DO NOTHING",
+                [(str(user_id), f"bench_{user_id}@budge.app") for user_id in dict.fromkeys(row[0] for row in chunk)]
+            )
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            categories = categorize_many(row[3] for row in chunk)
+            for (user_id, tx_id, tx_date, merchant, amount), category in zip(chunk, categories):
+                writer.writerow((tx_id, user_id, tx_date.isoformat(), merchant, amount, category, "t", now, now))
+            buffer.seek(0)
+            cursor.copy_expert(
+                "COPY transactions (id, user_id, date, merchant, amount, category, verified, created_at, updated_at) "
+                "FROM STDIN WITH (FORMAT csv)", buffer
+            )
+            conn.commit()
+            rows += len(chunk)
+            print(f"  {rows:,} rows", file=sys.stderr, end="\r")
+    finally:
+        conn.close()
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Budge transactions")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=100_000, help="total rows (1k to 10M)")
+    parser.add_argument("--days", type=int, default=365, help="history length")
+    parser.add_argument("--seed", type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--csv", help="write (user_id, id, date, merchant, amount) CSV here")
+    target.add_argument("--load", action="store_true", help="COPY into DATABASE_URL")
+    parser.add_argument("--truncate", action="store_true", help="with --load: clear existing transactions first")
+    args = parser.parse_args()
+
+    config = GeneratorConfig(users=args.users, transactions=args.transactions, days=args.days, seed=args.seed)
+    if args.load:
+        rows, seconds = load(config, truncate=args.truncate)
+        print(f"Loaded {rows:,} transactions for {config.users:,} users in {seconds:.1f}s ({rows / seconds:,.0f} rows/s)")
+        return
+
+    started = time.perf_counter()
+    rows = 0
+    with open(args.csv, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("user_id", "id", "date", "merchant", "amount"))
+        for chunk in generate(config):
+            writer.writerows(chunk)
+            rows += len(chunk)
+    print(f"Wrote {rows:,} transactions for {config.users:,} users in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""A local OpenAI-compatible chat endpoint, standing in for the LLM during load tests.
+
+Replies are deterministic per prompt, and the latency and error rate are tunable.
+That way a load run measures Budge, not the provider's rate limits. Point the API at it:
+
+    python -m benchmarks.llm_stub --port 9100 --latency-ms 300 --jitter-ms 100
+    LLM_BASE_URL=http://127.0.0.1:9100 GROQ_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+QUESTIONS = [
+    "What was going on for you the last time you made one of these purchases?",
+    "If you skipped this for a month, what would you notice first?",
+    "Which of these purchases would you make again without thinking twice?",
+    "What feeling were you hoping this spending would give you?",
+]
+
+
+def create_app(latency_ms: float = 200.0, jitter_ms: float = 50.0, error_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    rng = random.Random(seed)
+    app.state.calls = 0
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if rng.random() < error_rate:
+            return JSONResponse({"error": {"message": "stub overloaded"}}, status_code=rng.choice([429, 503]))
+
+        prompt = body["messages"][-1]["content"]
+        digest = hashlib.sha256(prompt.encode()).digest()
+        return {
+            "id": f"stub-{digest.hex()[:12]}",
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": QUESTIONS[digest[0] % len(QUESTIONS)]},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": 16}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered 429/503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""HTTP load driver for the main API endpoints.
+
+Closed loop: --concurrency workers each send a request, wait for the reply and
+send the next one, picking endpoints by the weights in MIX. It runs against a live
+server started with the LLM pointed at benchmarks.llm_stub:
+
+    python -m benchmarks.llm_stub --port 9100 &
+    LLM_BASE_URL=http://127.0.0.1:9100 GROQ_API_KEY=stub uvicorn app.main:app --workers 4 &
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --users 20 --duration 60 --concurrency 32
+
+Setup seeds --users demo users through /api/v1/test/create-user and scans them,
+so every endpoint in the mix has patterns and questions to work with. Results come
+per route (p50/p99 latency, requests/s, errors), and can be saved with --json.
+--revalidate makes GETs send back the last ETag they saw, the way a polling browser
+does, so 304s from the read cache show up in the numbers. ETags are content hashes, so a
+tag from one uvicorn worker is honoured by the others.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+import httpx
+from benchmarks.stats import Summary, print_table, summarize, write_json
+
+API = "/api/v1"
+
+# (route label, weight); the label is what results are grouped by
+MIX = [
+    ("GET /transactions/{user_id}", 25),
+    ("GET /transactions/{user_id}/stats", 20),
+    ("GET /transactions/{user_id}/stats?granularity=month", 10),
+    ("POST /transactions/", 15),
+    ("GET /patterns/{user_id}", 10),
+    ("POST /patterns/scan/{user_id}", 5),
+    ("GET /learning/unanswered-questions", 10),
+    ("POST /learning/generate-question/{pattern_id}", 5),
+    ("POST /learning/generate-questions", 2),
+]
+
+MERCHANTS = [("Starbucks", 5.75), ("Amazon", 42.0), ("Uber", 18.5), ("Whole Foods", 64.0), ("Netflix", 15.49)]
+
+
+class Fixture:
+    """Seeded users and the patterns found for them"""
+
+    def __init__(self):
+        self.users: List[str] = []
+        self.patterns: Dict[str, List[str]] = {}
+
+
+async def setup(client: httpx.AsyncClient, users: int) -> Fixture:
+    fixture = Fixture()
+    for _ in range(users):
+        response = await client.post(f"{API}/test/create-user")
+        response.raise_for_status()
+        user_id = response.json()["user_id"]
+        scanned = await client.post(f"{API}/patterns/scan/{user_id}")
+        scanned.raise_for_status()
+        fixture.users.append(user_id)
+        fixture.patterns[user_id] = [p["id"] for p in scanned.json()]
+    return fixture
+
+
+def build_request(route: str, fixture: Fixture, rng: random.Random) -> Tuple[str, str, dict]:
+    user_id = rng.choice(fixture.users)
+    if route == "GET /transactions/{user_id}":
+        return "GET", f"{API}/transactions/{user_id}", {}
+    if route == "GET /transactions/{user_id}/stats":
+        return "GET", f"{API}/transactions/{user_id}/stats", {}
+    if route == "GET /transactions/{user_id}/stats?granularity=month":
+        return "GET", f"{API}/transactions/{user_id}/stats", {"params": {"granularity": "month"}}
+    if route == "POST /transactions/":
+        merchant, amount = rng.choice(MERCHANTS)
+        return "POST", f"{API}/transactions/", {"json": {
+            "user_id": user_id,
+            "date": (date.today() - timedelta(days=rng.randrange(60))).isoformat(),
+            "merchant": merchant,
+            "amount": amount
+        }}
+    if route == "GET /patterns/{user_id}":
+        return "GET", f"{API}/patterns/{user_id}", {}
+    if route == "POST /patterns/scan/{user_id}":
+        return "POST", f"{API}/patterns/scan/{user_id}", {}
+    if route == "GET /learning/unanswered-questions":
+        return "GET", f"{API}/learning/unanswered-questions", {"params": {"user_id": user_id}}
+    if route == "POST /learning/generate-question/{pattern_id}":
+        # Fall back to a plain read for users whose scan found nothing
+        if not fixture.patterns[user_id]:
+            return "GET", f"{API}/patterns/{user_id}", {}
+        pattern_id = rng.choice(fixture.patterns[user_id])
+        return "POST", f"{API}/learning/generate-question/{pattern_id}", {"params": {"user_id": user_id}}
+    if route == "POST /learning/generate-questions":
+        return "POST", f"{API}/learning/generate-questions", {"params": {"user_id": user_id}}
+    raise ValueError(f"Unknown route {route!r}")
+
+
+async def worker(client: httpx.AsyncClient, fixture: Fixture, deadline: float, seed: int,
+                 samples: Dict[str, List[float]], errors: Dict[str, int], revalidate: bool = False):
+    rng = random.Random(seed)
+    routes = [route for route, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    etags: Dict[tuple, str] = {}
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        method, url, kwargs = build_request(route, fixture, rng)
+        resource = (url, tuple(sorted(kwargs.get("params", {}).items())))
+        if revalidate and method == "GET" and resource in etags:
+            kwargs["headers"] = {"If-None-Match": etags[resource]}
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+            if "etag" in response.headers:
+                etags[resource] = response.headers["etag"]
+        except httpx.HTTPError:
+            failed = True
+        elapsed = time.perf_counter() - started
+        if failed:
+            errors[route] = errors.get(route, 0) + 1
+        else:
+            samples.setdefault(route, []).append(elapsed)
+
+
+async def run(base_url: str, users: int, duration: float, concurrency: int, seed: int,
+              revalidate: bool = False) -> List[Summary]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        fixture = await setup(client, users)
+
+        samples: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            worker(client, fixture, deadline, seed + i, samples, errors, revalidate) for i in range(concurrency)
+        ))
+        wall = time.perf_counter() - started
+
+    results = [
+        summarize(route, samples.get(route, []), wall=wall, errors=errors.get(route, 0))
+        for route, _ in MIX if route in samples or route in errors
+    ]
+    everything = [s for route_samples in samples.values() for s in route_samples]
+    results.append(summarize("all", everything, wall=wall, errors=sum(errors.values())))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budge HTTP load driver")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="demo users to seed")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match with the last ETag seen")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.base_url, args.users, args.duration, args.concurrency, args.seed, args.revalidate))
+    print_table(results)
+    if args.json:
+        write_json(args.json, results, {
+            "base_url": args.base_url, "users": args.users, "duration": args.duration,
+            "concurrency": args.concurrency, "seed": args.seed, "revalidate": args.revalidate
+        })
+
+
+if __name__ == "__main__":
+    main()
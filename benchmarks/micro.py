@@ -0,0 +1,139 @@
+"""Microbenchmarks for the hot paths: categorization, pattern scans and dashboard stats.
+
+In-memory benchmarks run on generated data with no database:
+
+    python -m benchmarks.micro --users 200 --transactions 200000
+
+--db adds run_pattern_scan and dashboard_stats against DATABASE_URL for a
+sample of users already loaded with `python -m benchmarks.generator --load`:
+
+    python -m benchmarks.micro --db --sample 50 --json micro.json
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+from benchmarks.generator import GeneratorConfig, column_rows, generate
+from benchmarks.stats import Summary, print_table, summarize, time_calls, write_json
+
+
+def bench_categorize(merchants: List[str]) -> List[Summary]:
+    from app.services.categorizer import Categorizer, load_rules_file
+
+    rules = load_rules_file()
+    results = []
+
+    # Fresh cache: each distinct name misses the memo once, repeats hit it
+    categorizer = Categorizer(rules)
+    samples = []
+    for merchant in merchants:
+        started = time.perf_counter()
+        categorizer.categorize(merchant)
+        samples.append(time.perf_counter() - started)
+    results.append(summarize("categorize_merchant (fresh cache)", samples))
+
+    # Warm: same names again, all memoized
+    samples = []
+    for merchant in merchants:
+        started = time.perf_counter()
+        categorizer.categorize(merchant)
+        samples.append(time.perf_counter() - started)
+    results.append(summarize("categorize_merchant (warm)", samples))
+
+    # Batch path used by bulk ingest: one call per 10k rows
+    categorizer = Categorizer(rules)
+    batches = [merchants[i:i + 10_000] for i in range(0, len(merchants), 10_000)]
+    samples = []
+    for batch in batches:
+        started = time.perf_counter()
+        categorizer.categorize_many(batch)
+        samples.append(time.perf_counter() - started)
+    results.append(summarize("categorize_many (10k batch)", samples, items=len(merchants)))
+    return results
+
+
+def bench_detect(chunks: List[list]) -> List[Summary]:
+    from app.services.columnar_engine import detect, from_rows
+
+    rows = [row for chunk in chunks for row in column_rows(chunk)]
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row[0], []).append(row)
+
+    # What run_pattern_scan does per user, minus the query and the writes
+    samples = []
+    for user_rows in by_user.values():
+        started = time.perf_counter()
+        detect(from_rows(user_rows))
+        samples.append(time.perf_counter() - started)
+    results = [summarize("detect per user", samples, items=len(rows))]
+
+    # What one batch-scan shard does: every user in one pass
+    shard = time_calls(lambda: detect(from_rows(rows)), iterations=3, warmup=1)
+    results.append(summarize("detect whole batch", shard, items=3 * len(rows)))
+    return results
+
+
+def bench_db(sample: int, seed: int) -> List[Summary]:
+    from sqlalchemy import func, select
+    from app.api.endpoints.transactions import dashboard_stats
+    from app.db.session import AsyncSessionLocal, SessionLocal
+    from app.models.allmodels import Transaction
+    from app.services.pattern_engine import run_pattern_scan
+
+    with SessionLocal() as db:
+        user_ids = db.scalars(select(Transaction.user_id).group_by(Transaction.user_id)
+                              .having(func.count() > 0)).all()
+    if not user_ids:
+        raise SystemExit("No transactions in DATABASE_URL; load some with benchmarks.generator --load")
+    users = random.Random(seed).sample(user_ids, min(sample, len(user_ids)))
+
+    samples = []
+    for user_id in users:
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            run_pattern_scan(db, str(user_id))
+            samples.append(time.perf_counter() - started)
+    results = [summarize("run_pattern_scan", samples)]
+
+    async def stats(granularity):
+        timings = []
+        async with AsyncSessionLocal() as db:
+            for user_id in users:
+                started = time.perf_counter()
+                await dashboard_stats(db, user_id, granularity=granularity)
+                timings.append(time.perf_counter() - started)
+        return timings
+
+    # The query behind /stats on a read-cache miss
+    results.append(summarize("dashboard_stats", asyncio.run(stats(None))))
+    results.append(summarize("dashboard_stats (monthly)", asyncio.run(stats("month"))))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budge microbenchmarks")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", action="store_true", help="also benchmark DB paths against DATABASE_URL")
+    parser.add_argument("--sample", type=int, default=50, help="users to benchmark with --db")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    config = GeneratorConfig(users=args.users, transactions=args.transactions, seed=args.seed)
+    chunks = list(generate(config))
+    merchants = [row[3] for chunk in chunks for row in chunk]
+
+    results = bench_categorize(merchants) + bench_detect(chunks)
+    if args.db:
+        results += bench_db(args.sample, args.seed)
+
+    print_table(results)
+    if args.json:
+        write_json(args.json, results, {"users": args.users, "transactions": args.transactions, "seed": args.seed})
+
+
+if __name__ == "__main__":
+    main()
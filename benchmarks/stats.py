@@ -0,0 +1,90 @@
+"""Latency summaries shared by the benchmarks.
+
+Every benchmark collects per-operation wall times in seconds and reports them
+as one Summary row: count, p50/p90/p99/max latency and throughput. The scripts'
+`--json` output holds the same rows, so two runs can be diffed to spot regressions.
+"""
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values (q in 0..100)"""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(min(rank, len(ordered))) - 1]
+
+
+@dataclass
+class Summary:
+    name: str
+    count: int
+    errors: int
+    seconds: float          # wall time of the whole run
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    mean_ms: float
+    ops_per_s: float
+    items_per_s: Optional[float] = None  # rows, merchants... when an op handles many
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+def summarize(
+    name: str,
+    samples: List[float],
+    wall: Optional[float] = None,
+    errors: int = 0,
+    items: Optional[int] = None
+) -> Summary:
+    """Summary of per-op latencies; `wall` defaults to their sum (sequential runs)"""
+    ordered = sorted(samples)
+    wall = wall if wall is not None else sum(ordered)
+    count = len(ordered)
+    return Summary(
+        name=name,
+        count=count,
+        errors=errors,
+        seconds=wall,
+        p50_ms=1000 * percentile(ordered, 50),
+        p90_ms=1000 * percentile(ordered, 90),
+        p99_ms=1000 * percentile(ordered, 99),
+        max_ms=1000 * (ordered[-1] if ordered else 0.0),
+        mean_ms=1000 * (sum(ordered) / count if count else 0.0),
+        ops_per_s=count / wall if wall else 0.0,
+        items_per_s=items / wall if items is not None and wall else None
+    )
+
+
+def time_calls(func: Callable[[], object], iterations: int, warmup: int = 0) -> List[float]:
+    """Per-call wall times of func(), after `warmup` untimed calls"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def print_table(summaries: List[Summary]):
+    header = f"{'benchmark':<34} {'count':>8} {'err':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} " \
+             f"{'max ms':>9} {'ops/s':>10} {'items/s':>12}"
+    print(header)
+    print("-" * len(header))
+    for s in summaries:
+        items = f"{s.items_per_s:>12.0f}" if s.items_per_s is not None else f"{'':>12}"
+        print(f"{s.name:<34} {s.count:>8} {s.errors:>5} {s.p50_ms:>9.3f} {s.p90_ms:>9.3f} {s.p99_ms:>9.3f} "
+              f"{s.max_ms:>9.3f} {s.ops_per_s:>10.1f} {items}")
+
+
+def write_json(path: str, summaries: List[Summary], meta: Optional[Dict] = None):
+    with open(path, "w") as f:
+        json.dump({"meta": meta or {}, "results": [s.as_dict() for s in summaries]}, f, indent=2)
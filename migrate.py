@@ -0,0 +1,16 @@
+from app.core.config import load_env
+
+load_env()
+
+from app.db.migrations import migrate
+
+print("🔧 Applying schema migrations...")
+result = migrate()
+applied = result["applied"]
+
+if applied:
+    print(f"✅ Applied migrations: {', '.join(str(v) for v in applied)}")
+else:
+    print("✅ Schema already up to date")
+concepts = result["concepts"]
+print(f"✅ Concept library: {concepts['upserted']} upserted, {concepts['embedded']} embedded")
@@ -1,10 +1,15 @@
-from app.db.session import engine
+from app.core.config import load_env
+
+load_env()
+
+from app.db.session import get_engine
 from app.models.allmodels import Base
+from app.db.migrations import migrate
 
 print("🗑️  Dropping all tables...")
-Base.metadata.drop_all(bind=engine)
+Base.metadata.drop_all(bind=get_engine())
 
 print("✨ Creating fresh tables...")
-Base.metadata.create_all(bind=engine)
+migrate()
 
-print("✅ Database reset complete!")
\ No newline at end of file
+print("✅ Database reset complete!")
@@ -0,0 +1,18 @@
+from app.core.config import load_env
+
+load_env()
+
+import argparse
+from app.services.batch_scan import run_batch_scan, BATCH_SHARD_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full pattern rescan of every user")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=BATCH_SHARD_SIZE, help="users per shard")
+    args = parser.parse_args()
+
+    print("🔍 Scanning all users...")
+    report = run_batch_scan(workers=args.workers, shard_size=args.shard_size)
+    print(f"✅ {report.users} users, {report.rows} transactions, {report.patterns} patterns "
+          f"in {report.seconds:.1f}s ({report.shards} shards on {report.workers} workers)")
+    print(f"   {report.users_per_s:.1f} users/s, {report.rows_per_s:.0f} rows/s")
\ No newline at end of file
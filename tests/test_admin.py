@@ -0,0 +1,67 @@
+"""POST /admin/recategorize: the active-job check and the enqueue run under the kind's lock"""
+import asyncio
+import uuid
+from types import SimpleNamespace
+from sqlalchemy.sql.dml import Insert
+from app.api.endpoints.admin import recategorize_transactions
+
+
+class Result:
+    def __init__(self, value=None):
+        self.value = value
+
+    def first(self):
+        return self.value
+
+    def scalar_one(self):
+        return self.value
+
+
+class RecordingSession:
+    """Records statements in order; `running` is what active_job finds"""
+
+    def __init__(self, running=None):
+        self.running = running
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        return Result(uuid.uuid4() if isinstance(statement, Insert) else None)
+
+    async def scalars(self, statement):
+        self.statements.append(statement)
+        return Result(self.running)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def recategorize(db):
+    return asyncio.run(recategorize_transactions(overwrite=False, chunk_size=None, db=db))
+
+
+def test_lock_is_taken_before_the_check_and_enqueue():
+    db = RecordingSession()
+    result = recategorize(db)
+
+    lock, check, insert = db.statements
+    assert "pg_advisory_xact_lock" in str(lock.compile())
+    assert "FROM jobs" in str(check.compile())
+    assert isinstance(insert, Insert)
+    assert result["status"] == "queued"
+    assert db.commits == 1
+
+
+def test_active_pass_is_returned_instead():
+    running = SimpleNamespace(id=uuid.uuid4(), status="running")
+    db = RecordingSession(running)
+
+    assert recategorize(db) == {"status": "running", "job_id": running.id}
+    assert not any(isinstance(statement, Insert) for statement in db.statements)
+    assert db.commits == 0
+    assert db.rollbacks == 1
@@ -0,0 +1,55 @@
+"""Bulk import bodies are parsed into BULK_BATCH_SIZE batches as they stream in"""
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.api.endpoints import transactions
+
+
+def request(body: bytes, content_type: str, chunk_size: int = 7) -> Request:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def batches(req: Request):
+    async def collect():
+        return [batch async for batch in transactions._read_bulk_records(req)]
+    return asyncio.run(collect())
+
+
+def test_ndjson_is_batched_while_streaming(monkeypatch):
+    monkeypatch.setattr(transactions, "BULK_BATCH_SIZE", 2)
+    lines = [json.dumps({"n": i}) for i in range(5)]
+    body = ("\n".join(lines[:3]) + "\n\n" + "\n".join(lines[3:])).encode()
+
+    found = batches(request(body, "application/x-ndjson"))
+    assert [len(batch) for batch in found] == [2, 2, 1]
+    assert [row for batch in found for row, _ in batch] == [0, 1, 2, 3, 4]
+    assert found[2][0][1] == {"n": 4}
+
+
+def test_ndjson_bad_line_is_reported_in_place(monkeypatch):
+    monkeypatch.setattr(transactions, "BULK_BATCH_SIZE", 10)
+    found = batches(request(b'{"n": 0}\n{oops\n{"n": 2}\n', "application/x-ndjson"))
+    (batch,) = found
+    assert isinstance(batch[1][1], ValueError)
+    assert [row for row, _ in batch] == [0, 1, 2]
+
+
+def test_json_array_in_batches(monkeypatch):
+    monkeypatch.setattr(transactions, "BULK_BATCH_SIZE", 2)
+    found = batches(request(json.dumps([{"n": i} for i in range(3)]).encode(), "application/json"))
+    assert [[row for row, _ in batch] for batch in found] == [[0, 1], [2]]
+
+
+def test_body_must_be_an_array():
+    with pytest.raises(HTTPException) as raised:
+        batches(request(b'{"n": 1}', "application/json"))
+    assert raised.value.status_code == 400
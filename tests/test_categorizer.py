@@ -0,0 +1,68 @@
+"""The compiled categorizer must agree with the keyword chain it replaced"""
+import random
+from app.services.categorizer import Categorizer, categorize_many, categorize_merchant, load_rules_file
+
+
+def legacy_categorize_merchant(merchant_name: str) -> str:
+    """categorize_merchant as it was in app/api/endpoints/transactions.py"""
+    m = merchant_name.lower()
+    if any(x in m for x in ['starbucks', 'coffee', 'cafe', 'restaurant', 'dining', 'burger', 'pizza', 'dunkin', 'mcdonalds']):
+        return "Food & Dining"
+    if any(x in m for x in ['uber', 'lyft', 'taxi', 'gas', 'shell', 'fuel', 'parking', 'metro']):
+        return "Transportation"
+    if any(x in m for x in ['amazon', 'shopping', 'store', 'walmart', 'target', 'myntra', 'flipkart', 'clothing']):
+        return "Shopping"
+    if any(x in m for x in ['netflix', 'spotify', 'movie', 'cinema', 'hulu', 'games']):
+        return "Entertainment"
+    if any(x in m for x in ['bill', 'utility', 'rent', 'electric', 'water', 'internet']):
+        return "Bills & Utilities"
+    if any(x in m for x in ['grocery', 'market', 'foods', 'trader']):
+        return "Groceries"
+    return "Uncategorized"
+
+
+MERCHANTS = [
+    "Starbucks #1234", "UBER *TRIP", "Amazon.com", "Netflix", "City Water Dept", "Trader Joe's",
+    "Whole Foods Market", "Shell Oil 5521", "Target Store", "Pizza Hut", "Spotify USA", "Lyft Ride",
+    "Local Hardware", "", "   ", "COFFEE  BEAN", "Gas & Electric Bill", "Uber Eats Burger",
+    "Movie Theater Parking", "Supermarket", "Parental Rentals", "Metro Cinema Cafe",
+]
+
+
+def test_matches_legacy_on_known_merchants():
+    for merchant in MERCHANTS:
+        assert categorize_merchant(merchant) == legacy_categorize_merchant(merchant), merchant
+
+
+def test_matches_legacy_on_random_names():
+    # Fragments of keywords glued together exercise overlaps and failure links
+    pieces = ["star", "bucks", "ub", "er", "gas", "shel", "l", "mar", "ket", "rent", "bill",
+              "cafe", "hulu", "x", " ", "food", "s", "tar", "get", "metro", "wat", "er", "-"]
+    rng = random.Random(7)
+    for _ in range(2000):
+        merchant = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 6)))
+        if rng.random() < 0.3:
+            merchant = merchant.upper()
+        assert categorize_merchant(merchant) == legacy_categorize_merchant(merchant), merchant
+
+
+def test_earlier_category_wins():
+    # "cafe" (Food & Dining) outranks "metro" and "cinema" wherever they occur
+    assert categorize_merchant("Metro Cinema Cafe") == "Food & Dining"
+    assert categorize_merchant("Gas Station Market") == "Transportation"
+
+
+def test_categorize_many_matches_single_lookups():
+    names = MERCHANTS * 3
+    assert categorize_many(names) == [categorize_merchant(name) for name in names]
+
+
+def test_memo_is_bounded():
+    categorizer = Categorizer(load_rules_file(), cache_size=4)
+    for i in range(10):
+        categorizer.categorize(f"merchant {i}")
+    categorizer.categorize("merchant 9")
+    stats = categorizer.stats()
+    assert stats["entries"] == 4
+    assert stats["misses"] == 10
+    assert stats["hits"] == 1
@@ -0,0 +1,10 @@
+"""Importing the API stays within the cold-start budget and leaves heavy modules for first use"""
+import statistics
+from benchmarks.cold_start import BUDGET_MS, DEFERRED, measure
+
+
+def test_app_imports_within_budget_without_deferred_modules():
+    # Fresh interpreters, no reachable database; see benchmarks.cold_start
+    times, loaded = measure("app.main", 3)
+    assert statistics.median(times) * 1000 < BUDGET_MS
+    assert loaded == [], f"imported at startup: {loaded} (DEFERRED: {DEFERRED})"
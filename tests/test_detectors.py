@@ -0,0 +1,124 @@
+"""Full-scan detector results on a small fixed dataset, plus the recurrence rules"""
+import uuid
+from datetime import date
+import numpy as np
+from app.services.columnar_engine import detect, from_rows
+from app.services.detectors import DETECTORS
+from app.services.recurrence import cadence, find_subscriptions
+
+ALICE = uuid.UUID("00000000-0000-0000-0000-00000000000a")
+BOB = uuid.UUID("00000000-0000-0000-0000-00000000000b")
+
+
+def tx(user_id, day, merchant, amount, category):
+    # Deterministic ids so trigger ids can be asserted
+    tx_id = uuid.uuid5(user_id, f"{day}|{merchant}|{amount}")
+    return user_id, tx_id, day, merchant, amount, category
+
+
+def dataset():
+    rows = [
+        # Monthly subscription (a 29-31 day rhythm)
+        *(tx(ALICE, date(2024, month, 5), "Netflix", 29.99, "Entertainment") for month in (1, 2, 3, 4)),
+        # Weekly subscription
+        *(tx(ALICE, date(2024, 1, day), "Iron Gym", 45.0, "Uncategorized") for day in (1, 8, 15, 22, 29)),
+        # Small repeated purchases at one merchant
+        *(tx(ALICE, date(2024, 1, day), "Starbucks", 4.5, "Food & Dining") for day in (3, 10, 17, 24)),
+        # One big purchase in a splurge category
+        tx(ALICE, date(2024, 2, 10), "Amazon", 499.0, "Shopping"),
+        # Five purchases across two consecutive days
+        tx(ALICE, date(2024, 3, 15), "Zara", 30.0, "Shopping"),
+        tx(ALICE, date(2024, 3, 15), "H&M", 31.0, "Shopping"),
+        tx(ALICE, date(2024, 3, 15), "Uniqlo", 32.0, "Shopping"),
+        tx(ALICE, date(2024, 3, 16), "Sephora", 33.0, "Shopping"),
+        tx(ALICE, date(2024, 3, 16), "Gap", 34.0, "Shopping"),
+        # Nothing notable
+        tx(BOB, date(2024, 1, 2), "Shell", 40.0, "Transportation"),
+        tx(BOB, date(2024, 2, 9), "Target", 120.0, "Shopping"),
+    ]
+    return sorted(rows, key=lambda row: (str(row[0]), row[2]))
+
+
+def patterns_by_code(result):
+    found = {}
+    for key, pattern in result.patterns:
+        found.setdefault(pattern.pattern_code, {})[key] = pattern
+    return found
+
+
+def test_every_detector_on_fixed_dataset():
+    runs = []
+    results = detect(from_rows(dataset(), snapshot="1:1:"), runs)
+
+    assert set(results) == {ALICE, BOB}
+    assert results[BOB].patterns == []
+    assert {run.code for run in runs} == set(DETECTORS)
+
+    found = patterns_by_code(results[ALICE])
+    assert set(found) == {"LATTE_FACTOR", "IMPULSE_CLUSTER", "BIG_SPLURGE", "SUBSCRIPTION_TRAP"}
+
+    latte = found["LATTE_FACTOR"]
+    assert list(latte) == ["Starbucks"]
+    assert latte["Starbucks"].details == {"merchant": "Starbucks", "count": 4, "total_spent": 18.0, "avg_amount": 4.5}
+
+    burst = found["IMPULSE_CLUSTER"]
+    assert list(burst) == ["2024-03-15"]
+    assert burst["2024-03-15"].details["count"] == 5
+    assert burst["2024-03-15"].details["end_date"] == "2024-03-16"
+    assert burst["2024-03-15"].details["total_spent"] == 160.0
+
+    splurge = list(found["BIG_SPLURGE"].values())
+    assert len(splurge) == 1
+    assert splurge[0].details == {"merchant": "Amazon", "amount": 499.0, "date": "2024-02-10"}
+    assert splurge[0].trigger_transaction_ids == [tx(ALICE, date(2024, 2, 10), "Amazon", 499.0, "Shopping")[1]]
+
+    subscriptions = {p.details["merchant"]: p.details for p in found["SUBSCRIPTION_TRAP"].values()}
+    assert subscriptions["Netflix"]["frequency"] == "monthly"
+    assert subscriptions["Netflix"]["count"] == 4
+    assert subscriptions["Netflix"]["next_expected"] == "2024-05-06"
+    assert subscriptions["Iron Gym"]["frequency"] == "weekly"
+    assert subscriptions["Iron Gym"]["count"] == 5
+    assert set(subscriptions) == {"Netflix", "Iron Gym"}
+
+
+def test_results_carry_snapshot_and_config():
+    results = detect(from_rows(dataset(), snapshot="5:9:6"))
+    assert all(result.snapshot == "5:9:6" for result in results.values())
+    assert len({result.state["config"] for result in results.values()}) == 1
+
+
+def test_empty_input():
+    assert detect(from_rows([])) == {}
+
+
+def days(*values):
+    return np.array(values, dtype="datetime64[D]")
+
+
+def test_monthly_cadence_tolerates_a_skipped_month():
+    config = DETECTORS["SUBSCRIPTION_TRAP"].config
+    charged = days("2024-01-01", "2024-02-01", "2024-03-01", "2024-05-01", "2024-06-01")
+    assert cadence(charged, config)[0] == "monthly"
+
+
+def test_irregular_charges_are_not_a_subscription():
+    config = DETECTORS["SUBSCRIPTION_TRAP"].config
+    charged = days("2024-01-01", "2024-01-09", "2024-02-20", "2024-02-23", "2024-05-01")
+    assert cadence(charged, config) is None
+
+
+def test_price_change_stays_one_subscription():
+    config = DETECTORS["SUBSCRIPTION_TRAP"].config
+    charged = days("2024-01-01", "2024-02-01", "2024-03-02", "2024-04-01")
+    amounts = np.array([15.49, 15.49, 16.99, 16.99])
+    found = find_subscriptions("Netflix", charged, amounts, config)
+    assert len(found) == 1
+    _, details, positions = found[0]
+    assert details["count"] == 4
+    assert positions.tolist() == [0, 1, 2, 3]
+
+
+def test_cheap_recurring_charges_are_ignored():
+    config = DETECTORS["SUBSCRIPTION_TRAP"].config
+    charged = days("2024-01-01", "2024-02-01", "2024-03-02", "2024-04-01")
+    assert find_subscriptions("iCloud", charged, np.full(4, 0.99), config) == []
@@ -0,0 +1,37 @@
+"""Sliding-window bursts (impulse_clusters), shared by both IMPULSE_CLUSTER scan modes"""
+from datetime import date
+from app.services.impulse import impulse_clusters, impulse_details
+
+
+def test_burst_within_window():
+    # Days 10 and 11 hold 2 + 2 purchases: within a 2-day window
+    assert impulse_clusters([10, 11], [2, 2], [20.0, 20.0], window_days=2, min_count=4) == [(0, 1)]
+
+
+def test_gap_splits_the_window():
+    # Days 10 and 12 are three days apart, so no window holds four purchases
+    assert impulse_clusters([10, 12], [2, 2], [20.0, 20.0], window_days=2, min_count=4) == []
+
+
+def test_overlapping_windows_merge():
+    days = [1, 2, 3, 4]
+    counts = [2, 2, 2, 2]
+    assert impulse_clusters(days, counts, [0.0] * 4, window_days=2, min_count=4) == [(0, 3)]
+
+
+def test_separate_bursts_stay_separate():
+    days = [1, 2, 10, 11]
+    counts = [2, 2, 3, 1]
+    assert impulse_clusters(days, counts, [0.0] * 4, window_days=2, min_count=4) == [(0, 1), (2, 3)]
+
+
+def test_min_total_triggers_on_spend_alone():
+    assert impulse_clusters([5], [1], [900.0], window_days=2, min_count=4) == []
+    assert impulse_clusters([5], [1], [900.0], window_days=2, min_count=4, min_total=500.0) == [(0, 0)]
+
+
+def test_details():
+    assert impulse_details(date(2024, 3, 15), date(2024, 3, 16), 5, 160.0, 2) == {
+        "date": "2024-03-15", "end_date": "2024-03-16", "days": 2, "window_days": 2,
+        "count": 5, "total_spent": 160.0
+    }
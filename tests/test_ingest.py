@@ -0,0 +1,219 @@
+"""Statement upload -> extract -> drafts, with the fake extractor and a recording session"""
+import asyncio
+import io
+import uuid
+import pytest
+from sqlalchemy.sql.dml import Delete, Insert, Update
+from app.models.allmodels import PatternScanState, Snapshot
+from app.schemas.ingest import ExtractedReceipt, TransactionDraft
+from app.services import ingest
+from app.services.categorizer import categorize_merchant
+from app.services.ocr import FakeExtractor, set_extractor
+
+
+class Rows:
+    def __init__(self, values):
+        self.values = values
+
+    def all(self):
+        return list(self.values)
+
+    def scalar_one(self):
+        return self.values[0]
+
+
+class RecordingSession:
+    """Just enough of AsyncSession for the ingest service: one snapshot, statements recorded.
+
+    UPDATE ... RETURNING (through scalars) reports `matched` as the affected ids.
+    """
+
+    def __init__(self, snapshot: Snapshot, matched=()):
+        self.snapshot = snapshot
+        self.matched = list(matched)
+        self.statements = []
+        self.notified = []
+        self.deleted = []
+        self.info = {}
+        self.commits = 0
+
+    async def get(self, model, ident):
+        return self.snapshot if model is Snapshot and ident == self.snapshot.id else None
+
+    async def execute(self, statement, params=None):
+        self.statements.append((statement, params))
+        return Rows([uuid.uuid4()])
+
+    async def scalars(self, statement):
+        self.statements.append((statement, None))
+        return Rows(self.matched)
+
+    async def run_sync(self, fn, *args):
+        return fn(SyncView(self), *args)
+
+    async def commit(self):
+        self.commits += 1
+
+    # mark_changed runs on the sync side of run_sync and only queues a NOTIFY
+    def sync_execute(self, statement):
+        self.notified.append(statement)
+
+    def inserted(self):
+        return [row for statement, params in self.statements if isinstance(statement, Insert) for row in params]
+
+
+class SyncView:
+    def __init__(self, session: RecordingSession):
+        self.session = session
+        self.info = session.info
+        self.execute = session.sync_execute
+
+    def query(self, model):
+        return DeleteQuery(self.session, model)
+
+
+class DeleteQuery:
+    """db.query(Model).filter(...).delete(), as invalidate_scan_state uses it"""
+
+    def __init__(self, session: RecordingSession, model):
+        self.session = session
+        self.model = model
+
+    def filter(self, *criteria):
+        return self
+
+    def delete(self):
+        self.session.deleted.append(self.model)
+
+
+@pytest.fixture(autouse=True)
+def fake_extractor(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_SPOOL_DIR", str(tmp_path))
+    set_extractor(FakeExtractor())
+    yield
+    set_extractor(None)
+
+
+def upload(content: bytes, filename: str = "statement.png") -> Snapshot:
+    snapshot_id = uuid.uuid4()
+    path, size = ingest.spool_upload(io.BytesIO(content), snapshot_id, filename)
+    assert size == len(content)
+    return Snapshot(id=snapshot_id, user_id=uuid.uuid4(), imgpath=path,
+                    ocr_res={"status": "queued", "content_type": "image/png"})
+
+
+def test_upload_extract_drafts():
+    snapshot = upload(b"statement bytes" * 1000)
+    db = RecordingSession(snapshot)
+
+    result = asyncio.run(ingest.extract_snapshot(db, snapshot.id))
+
+    drafts = db.inserted()
+    assert result["transactions"] == len(drafts) > 0
+    assert isinstance(db.statements[0][0], Delete)
+    assert db.commits == 1
+    for row in drafts:
+        assert row["verified"] is False
+        assert row["user_id"] == snapshot.user_id
+        assert row["snapshot_id"] == snapshot.id
+        assert row["merchant"] in FakeExtractor.MERCHANTS
+        assert row["category"] == categorize_merchant(row["merchant"])
+        assert row["amount"] > 0
+
+    assert snapshot.ocr_res["status"] == "done"
+    assert snapshot.ocr_res["extractor"] == "fake"
+    assert snapshot.ocr_res["transactions_found"] == len(drafts)
+    # The user's cached listing is invalidated once this commits
+    assert db.info["read_cache_users"] == {str(snapshot.user_id)}
+    assert len(db.notified) == 1
+
+
+def test_same_bytes_same_drafts():
+    def drafts(content):
+        snapshot = upload(content)
+        db = RecordingSession(snapshot)
+        asyncio.run(ingest.extract_snapshot(db, snapshot.id))
+        return [(row["date"], row["merchant"], row["amount"]) for row in db.inserted()]
+
+    assert drafts(b"same file") == drafts(b"same file")
+    assert drafts(b"same file") != drafts(b"another file")
+
+
+def test_extracted_snapshot_is_not_extracted_again():
+    snapshot = upload(b"statement")
+    db = RecordingSession(snapshot)
+    asyncio.run(ingest.extract_snapshot(db, snapshot.id))
+
+    again = RecordingSession(snapshot)
+    result = asyncio.run(ingest.extract_snapshot(again, snapshot.id))
+    assert result["skipped"] == "already extracted"
+    assert again.statements == []
+
+
+def test_missing_snapshot_is_skipped():
+    db = RecordingSession(upload(b"statement"))
+    assert asyncio.run(ingest.extract_snapshot(db, uuid.uuid4())) == {"skipped": "snapshot no longer exists"}
+
+
+def test_oversized_upload_is_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_MAX_UPLOAD_BYTES", 10)
+    with pytest.raises(ingest.UploadTooLarge):
+        ingest.spool_upload(io.BytesIO(b"x" * 11), uuid.uuid4(), "big.png")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unusable_drafts_are_skipped():
+    receipt = ExtractedReceipt(transactions=[
+        TransactionDraft(date="2024-01-05", merchant="  Starbucks  Reserve ", amount=6.5),
+        TransactionDraft(date="05/01/2024", merchant="Amazon", amount=20.0),
+        TransactionDraft(date="2024-01-06", merchant="   ", amount=20.0),
+        TransactionDraft(date="2024-01-07", merchant="Refund", amount=-20.0),
+    ])
+    rows, skipped = ingest.draft_rows(receipt, uuid.uuid4(), uuid.uuid4())
+    assert [row["merchant"] for row in rows] == ["Starbucks Reserve"]
+    assert rows[0]["category"] == "Food & Dining"
+    assert [entry["index"] for entry in skipped] == [1, 2, 3]
+
+
+def done_snapshot() -> Snapshot:
+    return Snapshot(id=uuid.uuid4(), user_id=uuid.uuid4(), imgpath="", ocr_res={"status": "done"})
+
+
+def test_confirm_verifies_drafts_and_queues_a_rescan():
+    snapshot = done_snapshot()
+    drafts = [uuid.uuid4(), uuid.uuid4()]
+    db = RecordingSession(snapshot, matched=drafts)
+
+    assert asyncio.run(ingest.confirm_drafts(db, snapshot)) == drafts
+
+    update, _ = db.statements[0]
+    assert isinstance(update, Update)
+    sql = str(update.compile())
+    assert "SET verified" in sql and "snapshot_id" in sql and "RETURNING transactions.id" in sql
+    assert " IN " not in sql
+    # Rebuilt from scratch by a queued scan, like other writes to past transactions
+    assert db.deleted == [PatternScanState]
+    jobs = [stmt for stmt, _ in db.statements if isinstance(stmt, Insert) and stmt.table.name == "jobs"]
+    assert len(jobs) == 1
+    assert jobs[0].compile().params["dedupe_key"] == f"pattern_scan:{snapshot.user_id}"
+    assert db.info["read_cache_users"] == {str(snapshot.user_id)}
+    assert db.commits == 1
+
+
+def test_confirm_chosen_drafts():
+    snapshot = done_snapshot()
+    chosen = [uuid.uuid4()]
+    db = RecordingSession(snapshot, matched=chosen)
+
+    assert asyncio.run(ingest.confirm_drafts(db, snapshot, chosen)) == chosen
+    assert " IN " in str(db.statements[0][0].compile())
+
+
+def test_confirm_with_nothing_left_is_a_no_op():
+    snapshot = done_snapshot()
+    db = RecordingSession(snapshot)
+
+    assert asyncio.run(ingest.confirm_drafts(db, snapshot)) == []
+    assert len(db.statements) == 1
+    assert db.deleted == []
+    assert "read_cache_users" not in db.info
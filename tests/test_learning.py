@@ -0,0 +1,100 @@
+"""Question generation: inserts skip patterns that already have an open question"""
+import asyncio
+import uuid
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Insert
+from app.models.allmodels import DetectedPattern
+from app.services import learning_service
+
+CONCEPT = {"id": "loss_aversion", "title": "Loss aversion", "definition": "..."}
+
+
+class Rows:
+    def __init__(self, values):
+        self.values = values
+
+    def all(self):
+        return list(self.values)
+
+    def first(self):
+        return self.values[0] if self.values else None
+
+    def one(self):
+        assert len(self.values) == 1
+        return self.values[0]
+
+
+class ScriptedSession:
+    """Answers each scalars() call with the next scripted result; an INSERT returns
+    its rows, minus those for patterns listed in `conflicts`"""
+
+    def __init__(self, results, conflicts=()):
+        self.results = list(results)
+        self.conflicts = set(conflicts)
+        self.inserts = []
+        self.info = {}
+        self.commits = 0
+
+    async def scalars(self, statement, params=None):
+        if isinstance(statement, Insert):
+            rows = params if params is not None else [statement.compile().params]
+            self.inserts.append((statement, rows))
+            return Rows([SimpleNamespace(**row) for row in rows if row["pattern_id"] not in self.conflicts])
+        return Rows(self.results.pop(0))
+
+    async def run_sync(self, fn, *args):
+        return fn(SimpleNamespace(info=self.info, execute=lambda statement: None), *args)
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    async def generate(pattern, concept):
+        return f"question for {pattern.id}", "explanation"
+
+    monkeypatch.setattr(learning_service, "_generate", generate)
+    monkeypatch.setattr(learning_service.rag_service, "retrieve_many", lambda db, patterns: [CONCEPT] * len(patterns))
+    monkeypatch.setattr(learning_service.rag_service, "retrieve_relevant_concept", lambda db, bias, details: CONCEPT)
+
+
+def pattern(user_id) -> DetectedPattern:
+    return DetectedPattern(id=uuid.uuid4(), user_id=user_id, pattern_code="LATTE_FACTOR",
+                           bias_mapping="present_bias", details={"merchant": "Starbucks"})
+
+
+def test_insert_skips_open_questions():
+    sql = str(learning_service._insert_open_question().compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (pattern_id) WHERE is_answered = false DO NOTHING" in sql
+
+
+def test_batch_drops_patterns_a_concurrent_batch_won():
+    user_id = uuid.uuid4()
+    patterns = [pattern(user_id) for _ in range(3)]
+    lost = patterns[1].id
+    db = ScriptedSession([patterns, [], []], conflicts=[lost])
+
+    created, skipped = asyncio.run(learning_service.generate_questions_for_user(db, user_id))
+
+    assert [p.id for _, p, _ in created] == [patterns[0].id, patterns[2].id]
+    assert all(question.pattern_id == p.id for question, p, _ in created)
+    assert skipped == 1
+    assert len(db.inserts[0][1]) == 3
+    assert db.info["read_cache_users"] == {str(user_id)}
+    assert db.commits == 1
+
+
+def test_single_question_keeps_a_concurrent_writers():
+    p = pattern(uuid.uuid4())
+    theirs = SimpleNamespace(id=uuid.uuid4(), pattern_id=p.id)
+    db = ScriptedSession([[], [theirs]], conflicts=[p.id])
+
+    question, explanation, created = asyncio.run(learning_service.get_or_create_question(db, p))
+
+    assert question is theirs
+    assert created is False
+    assert explanation == "explanation"
+    assert "read_cache_users" not in db.info
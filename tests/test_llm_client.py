@@ -0,0 +1,139 @@
+"""LLMClient retries, concurrency cap and reply dedupe, against benchmarks.llm_stub in-process"""
+import asyncio
+import httpx
+import pytest
+from app.services.llm_cache import LLMCache
+from app.services.llm_client import LLMClient, LLMError
+from benchmarks.llm_stub import create_app
+
+
+class Tracked:
+    """ASGI wrapper that answers the first `fail_first` requests with 503 and tracks concurrency"""
+
+    def __init__(self, app, fail_first: int = 0):
+        self.app = app
+        self.fail_first = fail_first
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.requests += 1
+        if self.requests <= self.fail_first:
+            await send({"type": "http.response.start", "status": 503, "headers": []})
+            await send({"type": "http.response.body", "body": b"busy"})
+            return
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active -= 1
+
+
+def stub_client(**kwargs) -> LLMClient:
+    return LLMClient(base_url="http://stub", api_key="stub", backoff_base=0.0, **kwargs)
+
+
+async def connect(client: LLMClient, app):
+    """Bind the client's pool to the running loop, served by `app` instead of a socket"""
+    client._bind_loop()
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=client.base_url)
+
+
+def test_reply_is_deterministic_per_prompt():
+    stub = create_app(latency_ms=0, jitter_ms=0)
+    client = stub_client()
+
+    async def run():
+        await connect(client, stub)
+        try:
+            return [await client.chat(prompt) for prompt in ("a", "b", "a")]
+        finally:
+            await client.aclose()
+
+    first, _, again = asyncio.run(run())
+    assert first == again
+    assert first
+
+
+def test_retries_retryable_status_then_succeeds():
+    app = Tracked(create_app(latency_ms=0, jitter_ms=0), fail_first=2)
+    client = stub_client(max_retries=2)
+
+    async def run():
+        await connect(client, app)
+        try:
+            return await client.chat("hello")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run())
+    assert app.requests == 3
+
+
+def test_gives_up_after_max_retries():
+    stub = create_app(latency_ms=0, jitter_ms=0, error_rate=1.0)
+    client = stub_client(max_retries=2)
+
+    async def run():
+        await connect(client, stub)
+        try:
+            await client.chat("hello")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMError) as raised:
+        asyncio.run(run())
+    assert raised.value.reason in ("http_429", "http_503")
+    assert stub.state.calls == 3
+
+
+def test_concurrency_is_capped_per_host():
+    app = Tracked(create_app(latency_ms=20, jitter_ms=0))
+    client = stub_client(max_concurrency=3)
+
+    async def run():
+        await connect(client, app)
+        try:
+            return await asyncio.gather(*(client.chat(f"prompt {i}") for i in range(12)))
+        finally:
+            await client.aclose()
+
+    assert len(asyncio.run(run())) == 12
+    assert app.peak == 3
+
+
+def test_concurrent_identical_prompts_share_one_call():
+    stub = create_app(latency_ms=20, jitter_ms=0)
+    client = stub_client()
+    cache = LLMCache(persistent=False)
+
+    async def run():
+        await connect(client, stub)
+        try:
+            return await asyncio.gather(*(
+                cache.get_or_compute("key", "question", lambda: client.chat("same prompt")) for _ in range(5)
+            ))
+        finally:
+            await client.aclose()
+
+    replies = asyncio.run(run())
+    assert len(set(replies)) == 1
+    assert stub.state.calls == 1
+    assert cache.misses == 1
+
+
+def test_client_survives_a_second_event_loop():
+    client = LLMClient(base_url="http://stub", api_key="stub", max_concurrency=2)
+
+    async def run():
+        semaphore = client._semaphore()
+        async with semaphore:
+            pass
+        return semaphore
+
+    # Each asyncio.run is a new loop; the semaphore and pool from the first must not be reused
+    assert asyncio.run(run()) is not asyncio.run(run())
@@ -0,0 +1,151 @@
+"""ReadCache: LRU bounds, per-user versions and content ETags"""
+import asyncio
+from pydantic import TypeAdapter
+from starlette.requests import Request
+from app.services.read_cache import ReadCache
+
+PAYLOAD = TypeAdapter(dict)
+
+
+def request(if_none_match=None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def listening(**kwargs) -> ReadCache:
+    cache = ReadCache(**kwargs)
+    cache.listening = True
+    return cache
+
+
+class View:
+    """compute() for ReadCache.respond that counts how often it was loaded"""
+
+    def __init__(self, content=None, headers=None):
+        self.content = content if content is not None else {"total": 1}
+        self.headers = headers or {}
+        self.loads = 0
+
+    async def __call__(self, headers):
+        self.loads += 1
+        headers.update(self.headers)
+        return self.content
+
+
+def respond(cache, view, user="u1", name=("stats",), if_none_match=None):
+    return asyncio.run(cache.respond(request(if_none_match), user, name, view, PAYLOAD))
+
+
+def test_hit_after_miss():
+    cache, view = listening(), View()
+    first = respond(cache, view)
+    second = respond(cache, view)
+    assert view.loads == 1
+    assert first.body == second.body == b'{"total":1}'
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+def test_matching_etag_is_304_without_loading():
+    cache, view = listening(), View()
+    etag = respond(cache, view).headers["etag"]
+    response = respond(cache, view, if_none_match=f'W/{etag}, "other"')
+    assert response.status_code == 304
+    assert response.body == b""
+    assert view.loads == 1
+
+
+def test_bump_invalidates_only_that_user():
+    cache, view = listening(), View()
+    respond(cache, view, user="u1")
+    respond(cache, view, user="u2")
+    cache.bump(["u1"])
+    respond(cache, view, user="u1")
+    respond(cache, view, user="u2")
+    assert view.loads == 3
+
+
+def test_etag_follows_content():
+    cache = listening()
+    before = respond(cache, View({"total": 1})).headers["etag"]
+    cache.bump(["u1"])
+    changed = respond(cache, View({"total": 2}), if_none_match=before)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != before
+
+    # A write that didn't change this view keeps its tag valid
+    cache.bump(["u1"])
+    unchanged = respond(cache, View({"total": 2}), if_none_match=changed.headers["etag"])
+    assert unchanged.status_code == 304
+
+
+def test_etags_agree_across_processes():
+    # Two workers (or a restart) produce the same tag for the same content
+    first, second = listening(), listening()
+    etag = respond(first, View()).headers["etag"]
+    view = View()
+    assert respond(second, view, if_none_match=etag).status_code == 304
+    assert view.loads == 1
+
+
+def test_view_headers_are_cached_and_tagged():
+    cache = listening()
+    page = respond(cache, View({"rows": []}, {"X-Next-Cursor": "abc"}))
+    again = respond(cache, View())
+    assert again.headers["x-next-cursor"] == "abc"
+    other_cursor = respond(listening(), View({"rows": []}, {"X-Next-Cursor": "def"}))
+    assert other_cursor.headers["etag"] != page.headers["etag"]
+
+
+def test_lru_by_entries():
+    cache, view = listening(max_entries=2), View()
+    for user in ("u1", "u2", "u3"):
+        respond(cache, view, user=user)
+    assert cache.stats()["entries"] == 2
+    assert cache.evictions == 1
+    respond(cache, view, user="u1")
+    assert view.loads == 4
+
+
+def test_lru_by_bytes():
+    cache = listening(max_entries=100, max_bytes=16 * 40)
+    for i in range(25):
+        # 34-byte bodies: the byte budget runs out before the entry budget
+        respond(cache, View({"padding": "x" * 20}), user=f"u{i}")
+    assert cache.stats()["bytes"] <= 16 * 40
+    assert cache.stats()["entries"] == 16 * 40 // 34
+    assert cache.evictions == 25 - 16 * 40 // 34
+
+    # Larger than max_bytes / 16: served, never stored
+    view = View({"padding": "x" * 100})
+    respond(cache, view, user="u4")
+    respond(cache, view, user="u4")
+    assert view.loads == 2
+
+
+def test_write_during_load_is_not_cached():
+    cache = listening()
+
+    class Racing(View):
+        async def __call__(self, headers):
+            cache.bump(["u1"])
+            return await super().__call__(headers)
+
+    view = Racing()
+    respond(cache, view)
+    assert cache.stats()["entries"] == 0
+
+
+def test_bypass_while_not_listening():
+    cache, view = ReadCache(), View()
+    etag = respond(cache, view).headers["etag"]
+    assert respond(cache, view, if_none_match=etag).status_code == 304
+    assert view.loads == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_reset_forgets_entries():
+    cache, view = listening(), View()
+    respond(cache, view)
+    cache.reset(listening=False)
+    assert cache.stats()["entries"] == 0
+    assert not cache.listening
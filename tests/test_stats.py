@@ -0,0 +1,56 @@
+"""Benchmark latency summaries (benchmarks.stats)"""
+import json
+import pytest
+from benchmarks.stats import percentile, summarize, write_json
+
+
+def test_percentile_nearest_rank():
+    ordered = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+    assert percentile(ordered, 50) == 5.0
+    assert percentile(ordered, 90) == 9.0
+    assert percentile(ordered, 99) == 10.0
+    assert percentile(ordered, 100) == 10.0
+    # Rank never drops below the first value
+    assert percentile(ordered, 0) == 1.0
+
+
+def test_percentile_small_and_empty():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.5], 1) == 3.5
+    assert percentile([3.5], 99) == 3.5
+    assert percentile([1.0, 2.0], 50) == 1.0
+    assert percentile([1.0, 2.0], 51) == 2.0
+
+
+def test_summarize_sequential_run():
+    summary = summarize("op", [0.003, 0.001, 0.002, 0.004], items=400)
+    assert summary.count == 4
+    assert summary.p50_ms == pytest.approx(2.0)
+    assert summary.max_ms == pytest.approx(4.0)
+    assert summary.mean_ms == pytest.approx(2.5)
+    # Wall time defaults to the sum of the samples
+    assert summary.seconds == pytest.approx(0.01)
+    assert summary.ops_per_s == pytest.approx(400.0)
+    assert summary.items_per_s == pytest.approx(40000.0)
+
+
+def test_summarize_concurrent_run_uses_wall_time():
+    summary = summarize("op", [0.1] * 10, wall=0.5, errors=2)
+    assert summary.ops_per_s == pytest.approx(20.0)
+    assert summary.errors == 2
+    assert summary.items_per_s is None
+
+
+def test_summarize_nothing():
+    summary = summarize("op", [])
+    assert summary.count == 0
+    assert summary.p99_ms == 0.0
+    assert summary.ops_per_s == 0.0
+
+
+def test_write_json(tmp_path):
+    path = tmp_path / "run.json"
+    write_json(str(path), [summarize("op", [0.001])], {"users": 3})
+    saved = json.loads(path.read_text())
+    assert saved["meta"] == {"users": 3}
+    assert saved["results"][0]["name"] == "op"
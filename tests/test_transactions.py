@@ -0,0 +1,41 @@
+"""GET /transactions/{user_id}: the `format` query parameter and limits on NDJSON streams"""
+import asyncio
+import uuid
+from fastapi.responses import StreamingResponse
+from sqlalchemy.dialects import postgresql
+from app.api.endpoints import transactions
+
+
+def test_format_is_the_query_name():
+    route = next(r for r in transactions.router.routes if r.endpoint is transactions.get_transactions)
+    assert "format" in {param.alias for param in route.dependant.query_params}
+
+
+def test_ndjson_stream_honors_limit(monkeypatch):
+    streamed = []
+
+    async def rows():
+        yield ""
+
+    def stream(filters, limit=None):
+        streamed.append(limit)
+        return rows()
+
+    monkeypatch.setattr(transactions, "_stream_transactions", stream)
+
+    def get(limit):
+        return asyncio.run(transactions.get_transactions(
+            str(uuid.uuid4()), request=None, limit=limit, cursor=None, response_format="ndjson", db=None
+        ))
+
+    assert isinstance(get(5), StreamingResponse)
+    get(None)
+    assert streamed == [5, None]
+
+
+def test_stream_query_limit():
+    def sql(limit):
+        return str(transactions._stream_query([], limit).compile(dialect=postgresql.dialect()))
+
+    assert "LIMIT" in sql(5)
+    assert "LIMIT" not in sql(None)
@@ -0,0 +1,23 @@
+from app.core.config import load_env
+
+load_env()
+
+import asyncio
+from app.services.job_queue import Worker
+from app.services.llm_client import llm_client
+
+async def main():
+    worker = Worker()
+    worker.start()
+    print(f"👷 Job worker running ({worker.concurrency} tasks). Ctrl+C to stop.")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+        await llm_client.aclose()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("👋 Worker stopped")
\ No newline at end of file